@@ -0,0 +1,67 @@
+"""Many clients reserving the same place and day at once.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_booking_contention.py [workers] [attempts] [capacity]
+
+Run from API/. Without DATABASE_URL a temporary SQLite file is used, which serializes
+writers on its database lock; PostgreSQL exercises the row lock taken by the
+conditional UPDATE in inventory_repo.reserve. Prints throughput and checks that
+exactly `capacity` reservations succeeded.
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/bench.db")
+
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+from models.place import Place
+from models.place_inventory import PlaceInventory
+from repositories import inventory_repo
+import database
+import main  # registers every model
+
+IDPLACE, DAY = "BENCH", date(2030, 1, 1)
+
+def attempt(_):
+    with database.sessionLocal() as db:
+        try:
+            inventory_repo.reserve(db, IDPLACE, DAY)
+            db.commit()
+            return "reserved"
+        except HTTPException:
+            db.rollback()
+            return "full"
+        except OperationalError:
+            db.rollback()
+            return "error"
+
+def main(workers: int, attempts: int, capacity: int):
+    database.Base.metadata.create_all(database.engine)
+    with database.sessionLocal() as db:
+        db.query(PlaceInventory).filter(PlaceInventory.idPlace == IDPLACE).delete()
+        if db.get(Place, IDPLACE) is None:
+            db.add(Place(idPlace=IDPLACE, name="Benchmark"))
+            db.flush()
+        db.add(PlaceInventory(idPlace=IDPLACE, day=DAY, capacity=capacity, reserved=0))
+        db.commit()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(attempt, range(attempts)))
+    elapsed = time.perf_counter() - start
+
+    with database.sessionLocal() as db:
+        reserved = db.get(PlaceInventory, (IDPLACE, DAY)).reserved
+    print(f"{database.engine.dialect.name}: {workers} workers, {attempts} attempts on capacity {capacity}")
+    print(f"  {attempts / elapsed:.0f} attempts/s, {elapsed:.2f}s")
+    print(f"  reserved {results.count('reserved')}, full {results.count('full')}, errors {results.count('error')}, row.reserved {reserved}")
+    assert reserved == results.count("reserved") <= capacity, "oversold"
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [32, 2000, 500][len(args):]))
@@ -0,0 +1,45 @@
+"""Build and query time of the in-process place search index.
+
+    python benchmarks/bench_place_search.py [places]
+
+Run from API/. Places are synthetic, with names drawn from a small vocabulary so
+common tokens have long posting lists, as real place names do.
+"""
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from search import PlaceSearchIndex
+
+WORDS = ["Hồ", "Chùa", "Đền", "Phố", "Chợ", "Bãi", "Biển", "Núi", "Động", "Cầu", "Công", "Viên", "Bảo", "Tàng",
+         "Lăng", "Thác", "Đảo", "Vịnh", "Cổ", "Tây", "Bắc", "Nam", "Đông", "Long", "Hoàng", "Kiếm", "Một", "Cột"]
+CITIES = ["Hà Nội", "Đà Nẵng", "Huế", "Hội An", "Sa Pa", "Hạ Long", "Nha Trang", "Đà Lạt", "Cần Thơ", "Phú Quốc"]
+QUERIES = ["ho", "chua mot cot", "bien nha trang", "pho co hoi an", "vinh ha long", "den", "cau rong da nang"]
+
+def places(count: int):
+    rng = random.Random(0)
+    for i in range(count):
+        city = rng.choice(CITIES)
+        yield SimpleNamespace(idPlace=f"P{i:07d}", name=" ".join(rng.sample(WORDS, 3)), city=city, province=city,
+                              country="Việt Nam", address=f"{rng.randint(1, 500)} {rng.choice(WORDS)}", type=rng.randint(0, 5), rating=rng.randint(1, 5))
+
+def main(count: int):
+    index = PlaceSearchIndex()
+    start = time.perf_counter()
+    index.build(places(count))
+    print(f"build  {count} places: {time.perf_counter() - start:.1f}s")
+
+    for query in QUERIES:
+        runs = []
+        for _ in range(5):
+            start = time.perf_counter()
+            index.search(query, limit=20)
+            runs.append(time.perf_counter() - start)
+        runs.sort()
+        print(f"search {query!r:24} median {runs[2] * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
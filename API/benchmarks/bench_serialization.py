@@ -0,0 +1,74 @@
+"""Latency and size of the two heaviest JSON responses, for before/after comparisons.
+
+    python benchmarks/bench_serialization.py [--app-dir PATH] [--runs N]
+
+Run from API/. --app-dir points at another checkout's API/ directory (e.g. a git worktree
+of an older commit) so both versions are measured by the same script. Each run seeds a fresh
+SQLite database with 1000 places and a 500-message conversation, then times
+GET /places/all?limit=1000 and GET /conversations/{id} (with its messages) through
+TestClient, with and without gzip.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--app-dir", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+parser.add_argument("--runs", type=int, default=40)
+args = parser.parse_args()
+
+sys.path.insert(0, os.path.abspath(args.app_dir))
+workdir = tempfile.mkdtemp(prefix="bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+os.environ["BLOB_STORE_DIR"] = os.path.join(workdir, "blobs")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+from fastapi.testclient import TestClient
+from models.conversation import Base as ConversationBase, Conversation, Message
+from models.place import Place
+from models.token import Token
+import auth
+import database
+import main
+
+def seed():
+    database.Base.metadata.create_all(database.engine)
+    ConversationBase.metadata.create_all(database.engine)
+    start = datetime(2026, 1, 1)
+    with database.sessionLocal() as db:
+        db.add(Token(username="bench", hashed_password="!"))
+        db.add_all(Place(
+            idPlace=f"P{i:05d}", name=f"Địa điểm {i}", country="Việt Nam", city="Hà Nội", province="Hà Nội",
+            address=f"{i} Phố Huế", description="Mô tả " * 20, rating=i % 5 + 1, type=i % 6, image=f"https://example.com/{i}.jpg"
+        ) for i in range(1000))
+        db.add(Conversation(id="bench", user_id="US0001", title="Benchmark", created_at=start, updated_at=start))
+        db.add_all(Message(
+            id=f"m{i:04d}", conversation_id="bench", content="Xin chào, tôi muốn đi Đà Nẵng 3 ngày. " * 5,
+            role="user" if i % 2 == 0 else "assistant", created_at=start + timedelta(seconds=i), token_count=40
+        ) for i in range(500))
+        db.commit()
+
+def measure(client, path: str, headers: dict):
+    times = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        times.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return statistics.median(times) * 1000, response.headers.get("content-encoding", "identity"), int(response.headers["content-length"])
+
+def main_():
+    seed()
+    token = auth.create_access_token({"sub": "bench"}, timedelta(minutes=30))
+    with TestClient(main.app) as client:
+        for path in ["/api/v1/places/all?limit=1000", "/api/v1/conversations/bench"]:
+            for encoding in ["identity", "gzip"]:
+                ms, used, size = measure(client, path, {"Authorization": f"Bearer {token}", "Accept-Encoding": encoding})
+                print(f"{path:34} accept {encoding:8} -> {used:8} {ms:7.1f} ms {size:8} B")
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,63 @@
+"""Create millions of rows with allocated IDs and let the primary key catch any duplicate.
+
+    DATABASE_URL=postgresql://... python benchmarks/stress_id_allocator.py [rows] [workers]
+
+Run from API/. Without DATABASE_URL a temporary SQLite file is used. Each worker thread has
+its own IdAllocator, like separate app processes sharing the IdSequences table, and inserts
+its IDs into a scratch table in batches. Prints allocation and insert rates.
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='stress-')}/stress.db")
+
+from sqlalchemy import Column, MetaData, String, Table, func, select
+from id_allocator import IdAllocator
+from models.id_sequence import IdSequence
+import database
+
+PREFIX = "ST"
+BATCH = 10000
+stress_ids = Table("StressIds", MetaData(), Column("id", String(6), primary_key=True))
+
+def worker(rows: int):
+    allocator = IdAllocator()
+    allocating = inserting = 0.0
+    for done in range(0, rows, BATCH):
+        start = time.perf_counter()
+        ids = [{"id": allocator.next_id(PREFIX)} for _ in range(min(BATCH, rows - done))]
+        allocating += time.perf_counter() - start
+
+        start = time.perf_counter()
+        with database.engine.begin() as connection:
+            connection.execute(stress_ids.insert(), ids)
+        inserting += time.perf_counter() - start
+    return allocating, inserting
+
+def main(rows: int, workers: int):
+    IdSequence.__table__.create(database.engine, checkfirst=True)
+    stress_ids.drop(database.engine, checkfirst=True)
+    stress_ids.create(database.engine)
+    with database.engine.begin() as connection:
+        connection.execute(IdSequence.__table__.delete().where(IdSequence.prefix == PREFIX))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        timings = list(pool.map(worker, [rows // workers + (i < rows % workers) for i in range(workers)]))
+    elapsed = time.perf_counter() - start
+
+    with database.engine.connect() as connection:
+        count = connection.scalar(select(func.count()).select_from(stress_ids))
+    allocating = sum(a for a, _ in timings)
+    print(f"{database.engine.dialect.name}: {rows} rows, {workers} workers, {elapsed:.1f}s wall")
+    print(f"  allocation {rows / allocating:,.0f} ids/s per worker, insert {rows / sum(i for _, i in timings):,.0f} rows/s per worker")
+    print(f"  {count} rows in StressIds, all unique")
+    assert count == rows
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [2_000_000, 8][len(args):]))
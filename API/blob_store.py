@@ -0,0 +1,153 @@
+from io import BytesIO
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import requests
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional: without Pillow avatars are served at their original size
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# What making thumbnails of an image with a valid signature can raise
+THUMBNAIL_ERRORS = (OSError, ValueError) + ((Image.DecompressionBombError,) if Image else ())
+
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "local")
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "blobs")
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", str(5 * 1024 * 1024)))
+AVATAR_URL_PREFIX = os.getenv("AVATAR_URL_PREFIX", "/api/v1/avatars/")
+THUMBNAIL_SIZES = (64, 256)
+AVATAR_FETCH_TIMEOUT = int(os.getenv("AVATAR_FETCH_TIMEOUT", "10"))
+
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Leading bytes -> media type of the image formats accepted as avatars
+SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+def sniff(head: bytes):
+    for signature, media_type in SIGNATURES:
+        if head.startswith(signature):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+# Immutable blobs named by the sha256 of their bytes, fanned out as ab/cd/<digest>.
+# Variants (thumbnails) of a blob sit next to it as <digest>.<variant>.
+class LocalBlobStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, digest: str, variant: str = None):
+        name = f"{digest}.{variant}" if variant else digest
+        return os.path.join(self.root, digest[:2], digest[2:4], name)
+
+    def exists(self, digest: str, variant: str = None):
+        return os.path.exists(self.path(digest, variant))
+
+    # Same bytes, same name: writing again is a no-op
+    def put(self, data: bytes, digest: str = None, variant: str = None):
+        digest = digest or hashlib.sha256(data).hexdigest()
+        path = self.path(digest, variant)
+        if os.path.exists(path):
+            return digest
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return digest
+
+    def get(self, digest: str, variant: str = None):
+        with open(self.path(digest, variant), "rb") as f:
+            return f.read()
+
+# Backend name -> factory; anything with path/exists/put/get works
+BACKENDS = {
+    "local": lambda: LocalBlobStore(BLOB_STORE_DIR)
+}
+
+blob_store = BACKENDS[BLOB_STORE_BACKEND]()
+
+# Square WebP thumbnails, one per size not larger than the image
+def thumbnails(data: bytes):
+    if Image is None:
+        return {}
+
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    result = {}
+    for size in THUMBNAIL_SIZES:
+        if size > min(image.size):
+            continue
+        buffer = BytesIO()
+        ImageOps.fit(image, (size, size)).save(buffer, "WEBP", quality=80)
+        result[size] = buffer.getvalue()
+    return result
+
+# Validate and store an avatar with its thumbnails; returns the digest
+def put_avatar(data: bytes):
+    if not data:
+        raise ValueError("Avatar is empty")
+    if len(data) > AVATAR_MAX_BYTES:
+        raise ValueError(f"Avatar is larger than {AVATAR_MAX_BYTES} bytes")
+    if sniff(data[:12]) is None:
+        raise ValueError("Avatar must be a PNG, JPEG, GIF or WebP image")
+
+    digest = blob_store.put(data)
+    try:
+        for size, thumbnail in thumbnails(data).items():
+            blob_store.put(thumbnail, digest, f"{size}.webp")
+    except THUMBNAIL_ERRORS as e:
+        # Signature matched but Pillow can't decode it (or a thumbnail write failed): the original is still served
+        logger.warning("No thumbnails for avatar %s: %s", digest, e)
+    return digest
+
+def avatar_url(digest: str):
+    return f"{AVATAR_URL_PREFIX}{digest}" if digest else None
+
+# Users.avatar from before the blob store holds the image's URL (loaded by clients through
+# proxy_image); that URL, or None when the value is not one
+def legacy_avatar_url(value: bytes):
+    if not value or not value[:8].lower().startswith((b"http://", b"https://")):
+        return None
+    try:
+        return value.decode()
+    except UnicodeDecodeError:
+        return None
+
+# Download an avatar by URL, at most AVATAR_MAX_BYTES; raises requests.RequestException or ValueError
+def fetch_avatar(url: str):
+    with requests.get(url, stream=True, timeout=AVATAR_FETCH_TIMEOUT) as res:
+        res.raise_for_status()
+        data = res.raw.read(AVATAR_MAX_BYTES + 1, decode_content=True)
+    if len(data) > AVATAR_MAX_BYTES:
+        raise ValueError(f"Avatar is larger than {AVATAR_MAX_BYTES} bytes")
+    return data
+
+# (path, media type) of an avatar at the smallest stored size >= size, the original otherwise
+def avatar_file(digest: str, size: int = None):
+    if not DIGEST_RE.match(digest) or not blob_store.exists(digest):
+        return None
+    if size:
+        for candidate in THUMBNAIL_SIZES:
+            if candidate >= size and blob_store.exists(digest, f"{candidate}.webp"):
+                return blob_store.path(digest, f"{candidate}.webp"), "image/webp"
+
+    path = blob_store.path(digest)
+    with open(path, "rb") as f:
+        return path, sniff(f.read(12)) or "application/octet-stream"
@@ -1,18 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from schemas import ai_recommendation_schema
-from repositories import ai_recommendation_repo
+from repositories import ai_recommendation_repo, user_repo
 from database import get_db
 from controllers.auth_ctrl import get_current_user
+from pagination import set_next_cursor
+from trip_generator import trip_generator, QueueFull
+import database
 
 router = APIRouter()
 
 @router.get("/ai_recs", response_model=list[ai_recommendation_schema.AIRecResponse])
-def get_ai_recs(db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100):
+def get_ai_recs(response: Response, db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100, cursor: str = None):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return ai_recommendation_repo.get_aiRec(db, skip, limit)
+    ai_recs = ai_recommendation_repo.get_aiRec(db, skip, limit, cursor)
+    return set_next_cursor(response, ai_recs, limit, "idAIRec")
 
 @router.get("/ai_recs/id/{idAIRec}", response_model=ai_recommendation_schema.AIRecResponse)
 def get_ai_rec_by_id(idAIRec: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
@@ -50,11 +55,49 @@ def delete_ai_rec(idAIRec: str, db: Session = Depends(get_db), current_user = De
     
     return ai_recommendation_repo.delete_aiRec(db, idAIRec)
 
-#TODO:
-# @router.post("/generate")
-# def generate_recommendation(user_id: str, input_text: str, db: Session = Depends(get_db)):
-#     """Generate a new AI recommendation based on user input"""
-#     recommendation = ai_recommendation_repo.generate_recommendation(db, user_id, input_text)
-#     if not recommendation:
-#         raise HTTPException(status_code=400, detail="Could not generate AI recommendation")
-#     return recommendation
+# Enqueue a trip generation, the result is saved as an AI recommendation
+@router.post("/ai_recs/generate-trip", response_model=ai_recommendation_schema.TripJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def generate_trip(request: ai_recommendation_schema.AIRequest, response: Response, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    user = user_repo.get_user_of(db, current_user)
+    try:
+        job = trip_generator.submit(user.idUser, request.model_dump())
+    except QueueFull:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many trip generations in progress", headers={"Retry-After": "5"})
+    
+    response.headers["Location"] = f"/api/v1/ai_recs/jobs/{job['jobId']}"
+    return job
+
+def get_own_job(jobId: str, idUser: str):
+    job = trip_generator.get(jobId)
+    if job is None or job["idUser"] != idUser:
+        raise HTTPException(404, "Generation job not found")
+    
+    return job
+
+# Poll a trip generation
+@router.get("/ai_recs/jobs/{jobId}", response_model=ai_recommendation_schema.TripJobResponse)
+def get_generation_job(jobId: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    user = user_repo.get_user_of(db, current_user)
+    return trip_generator.view(get_own_job(jobId, user.idUser))[0]
+
+# Follow a trip generation with Server-Sent Events
+@router.get("/ai_recs/jobs/{jobId}/stream")
+def stream_generation_job(jobId: str, current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    # Short-lived session: a get_db dependency would hold its connection until the stream ends
+    with database.sessionLocal() as db:
+        user = user_repo.get_user_of(db, current_user)
+    
+    return StreamingResponse(
+        trip_generator.stream(get_own_job(jobId, user.idUser)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -3,15 +3,28 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from jose import jwt
+from sqlalchemy import event
 from database import get_db
 from models.token import Token
+from cache import TTLCache
+from query_counter import uncounted
 import auth
+import database
 
 router = APIRouter()
 
 # Config security with OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login")
 
+# Cache of authenticated principals, keyed by token "sub"
+principal_cache = TTLCache(maxsize=auth.PRINCIPAL_CACHE_SIZE, ttl=auth.PRINCIPAL_CACHE_TTL)
+
+# Drop cached principal when its Token row is deleted or changed (e.g. password)
+@event.listens_for(Token, "after_delete")
+@event.listens_for(Token, "after_update")
+def invalidate_principal(mapper, connection, target):
+    principal_cache.pop(target.username)
+
 # API register user
 @router.post("/register")
 def register(username: str, password: str, db: Session = Depends(get_db)):
@@ -35,7 +48,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     access_token = auth.create_access_token({"sub": user.username}, timedelta(minutes=30))
     return {"access_token": access_token, "token_type": "bearer"}
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -50,9 +63,19 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except jwt.JWTError:
         raise credentials_exception
     
-    user = db.query(Token).filter(Token.username == username).first()
-    if user is None:
-        raise credentials_exception
+    user = principal_cache.get(username)
+    if user is not None:
+        return user
     
+    # Own short-lived session: a get_db dependency would stay checked out until the
+    # response is finished, which for event streams is as long as the client listens
+    with database.sessionLocal() as db, uncounted():
+        user = db.query(Token).filter(Token.username == username).first()
+        if user is None:
+            raise credentials_exception
+        
+        # Detach so the cached row is never expired by another request's commit
+        db.expunge(user)
+    principal_cache.set(username, user, expire_at=payload.get("exp"))
     return user
     
\ No newline at end of file
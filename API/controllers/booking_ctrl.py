@@ -1,20 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from database import get_db
 from schemas.booking_schema import BookingCreate, BookingUpdate, BookingResponse
 from schemas.user_schema import UserResponse
 from schemas.place_schema import PlaceResponse
-from repositories import booking_repo
+from repositories import booking_repo, user_repo
 from controllers.auth_ctrl import get_current_user
+from query_counter import query_budget
+from intervals import resolve_range
+from datetime import datetime
+import fieldsets
 
 router = APIRouter()
 
 @router.get("/bookings/", response_model=list[BookingResponse])
-def get_bookings(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_bookings(response: Response, db: Session = Depends(get_db), current_user = Depends(get_current_user), fields = Depends(fieldsets.BOOKINGS)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
 
-    return booking_repo.get_bookings_by_user(db, current_user.idUser)
+    user = user_repo.get_user_of(db, current_user)
+    bookings = booking_repo.get_bookings_by_user(db, user.idUser, fieldsets.BOOKINGS.options(fields))
+    return fieldsets.BOOKINGS.response(response, fields, bookings) if fields else bookings
 
 @router.get("/bookings", response_model=BookingResponse)
 def get_booking_by_id(idBooking: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
@@ -27,18 +33,27 @@ def get_booking_by_id(idBooking: str, db: Session = Depends(get_db), current_use
     
     return booking
 
+# Bookings of the current user overlapping / within [start, end] or at a moment
+@router.get("/bookings/range", response_model=list[BookingResponse])
+def get_bookings_in_range(mode: str = "overlap", start: datetime = None, end: datetime = None, at: datetime = None, limit: int = Query(100, ge=1, le=1000), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    start, end = resolve_range(mode, start, end, at)
+    return booking_repo.get_bookings_in_range(db, mode, start, end, user_repo.get_user_of(db, current_user), limit)
+
 @router.get("/bookings/{select}", response_model=list[BookingResponse])
 def get_booking_by(select: str, lookup: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    booking = booking_repo.get_booking_by(db, select, lookup, current_user)
+    booking = booking_repo.get_booking_by(db, select, lookup, user_repo.get_user_of(db, current_user))
     if booking == []:
         raise HTTPException(404, "Booking not found")
     
     return booking
 
-@router.get("/bookings/{idBooking}/users/", response_model=list[UserResponse])
+@router.get("/bookings/{idBooking}/users/", response_model=list[UserResponse], dependencies=[query_budget(2)])
 def get_owners_of_booking(idBooking: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -49,7 +64,7 @@ def get_owners_of_booking(idBooking: str, db: Session = Depends(get_db), current
     
     return users
 
-@router.get("/bookings/{idBooking}/places/", response_model=PlaceResponse)
+@router.get("/bookings/{idBooking}/places/", response_model=PlaceResponse, dependencies=[query_budget(2)])
 def get_place_by_booking(idBooking: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -67,18 +82,34 @@ def create_new_booking(booking: BookingCreate, db: Session = Depends(get_db), cu
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
 
     # Tạo booking nếu kiểm tra thành công
-    return booking_repo.create_booking(db, booking, current_user)
+    return booking_repo.create_booking(db, booking, user_repo.get_user_of(db, current_user))
+
+# Pending -> success
+@router.post("/bookings/{idBooking}/confirm", response_model=BookingResponse)
+def confirm_booking(idBooking: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return booking_repo.confirm_booking(db, idBooking, user_repo.get_user_of(db, current_user))
+
+# Cancel and free the place's unit for that day
+@router.post("/bookings/{idBooking}/release", response_model=BookingResponse)
+def release_booking(idBooking: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return booking_repo.release_booking(db, idBooking, user_repo.get_user_of(db, current_user))
 
 @router.put("/bookings/", response_model=BookingResponse)
 def update_booking(idBooking: str, booking: BookingUpdate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return booking_repo.update_booking(db, idBooking, booking)
+    return booking_repo.update_booking(db, idBooking, booking, user_repo.get_user_of(db, current_user))
 
 @router.delete("/bookings/", response_model=BookingResponse)
 def delete_booking(id_booking: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return booking_repo.delete_booking(db, id_booking)
\ No newline at end of file
+    return booking_repo.delete_booking(db, id_booking, user_repo.get_user_of(db, current_user))
\ No newline at end of file
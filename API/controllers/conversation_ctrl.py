@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 from typing import List, Optional
-from API.database import get_db
-from API.repositories.conversation_repo import ConversationRepository, MessageRepository
-from API.schemas.conversation_schema import (
+from database import get_async_db
+from repositories.conversation_repo import AsyncConversationRepository, AsyncMessageRepository
+from pagination import next_cursor
+from schemas.conversation_schema import (
     ConversationCreate, ConversationUpdate, ConversationResponse,
-    ConversationWithMessages, ConversationListResponse,
+    ConversationWithMessages, ConversationListResponse, ConversationContextResponse,
+    MessageBatchCreate, MessageBatchResponse,
     MessageCreate, MessageResponse
 )
 import math
@@ -16,13 +19,13 @@ router = APIRouter(prefix="/conversations", tags=["Conversations"])
 @router.post("/", response_model=ConversationResponse, status_code=status.HTTP_201_CREATED)
 async def create_conversation(
     conversation_data: ConversationCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Tạo cuộc trò chuyện mới"""
     try:
-        repo = ConversationRepository(db)
-        conversation = repo.create_conversation(conversation_data)
-        return ConversationResponse.from_orm(conversation)
+        repo = AsyncConversationRepository(db)
+        conversation = await repo.create_conversation(conversation_data)
+        return conversation
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -36,29 +39,37 @@ async def get_user_conversations(
     limit: int = Query(20, ge=1, le=100, description="Số lượng mỗi trang"),
     include_archived: bool = Query(False, description="Bao gồm cuộc trò chuyện đã lưu trữ"),
     search: Optional[str] = Query(None, description="Tìm kiếm theo tiêu đề"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Cursor của trang tiếp theo (thay cho page)"),
+    include_total: bool = Query(True, description="Bao gồm tổng số (được cache)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Lấy danh sách cuộc trò chuyện của user"""
     try:
-        repo = ConversationRepository(db)
-        conversations, total = repo.get_conversations_by_user(
+        repo = AsyncConversationRepository(db)
+        conversations, total = await repo.get_conversations_by_user(
             user_id=user_id,
             page=page,
             limit=limit,
             include_archived=include_archived,
-            search=search
+            search=search,
+            cursor=cursor,
+            include_total=include_total
         )
         
-        total_pages = math.ceil(total / limit)
+        cursor_next = next_cursor(conversations, limit, "updated_at", "id")
         
-        return ConversationListResponse(
-            conversations=[ConversationResponse.from_orm(conv) for conv in conversations],
-            total=total,
-            page=page,
-            limit=limit,
-            has_next=page < total_pages,
-            has_prev=page > 1
-        )
+        # ORM rows go straight to response_model: one validation pass for the whole page
+        return {
+            "conversations": conversations,
+            "total": total,
+            "page": page,
+            "limit": limit,
+            "has_next": cursor_next is not None if cursor or total is None else page < math.ceil(total / limit),
+            "has_prev": cursor is not None or page > 1,
+            "next_cursor": cursor_next
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -69,12 +80,12 @@ async def get_user_conversations(
 async def get_conversation_detail(
     conversation_id: str,
     include_messages: bool = Query(True, description="Bao gồm tin nhắn"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Lấy chi tiết cuộc trò chuyện"""
     try:
-        repo = ConversationRepository(db)
-        conversation = repo.get_conversation_by_id(conversation_id, include_messages)
+        repo = AsyncConversationRepository(db)
+        conversation = await repo.get_conversation_by_id(conversation_id, include_messages)
         
         if not conversation:
             raise HTTPException(
@@ -82,11 +93,11 @@ async def get_conversation_detail(
                 detail="Không tìm thấy cuộc trò chuyện"
             )
         
-        result = ConversationWithMessages.from_orm(conversation)
-        if include_messages and conversation.messages:
-            result.messages = [MessageResponse.from_orm(msg) for msg in conversation.messages]
+        # Không lazy-load messages trên AsyncSession khi không cần
+        if not include_messages:
+            set_committed_value(conversation, "messages", [])
         
-        return result
+        return conversation
     except HTTPException:
         raise
     except Exception as e:
@@ -95,16 +106,73 @@ async def get_conversation_detail(
             detail=f"Lỗi khi lấy chi tiết cuộc trò chuyện: {str(e)}"
         )
 
+@router.get("/{conversation_id}/context", response_model=ConversationContextResponse)
+async def get_conversation_context(
+    conversation_id: str,
+    max_tokens: int = Query(..., ge=1, description="Ngân sách token tối đa"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Lấy các tin nhắn mới nhất vừa với ngân sách token"""
+    try:
+        repo = AsyncMessageRepository(db)
+        messages = await repo.get_context(conversation_id, max_tokens)
+        
+        if messages is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Không tìm thấy cuộc trò chuyện"
+            )
+        
+        return {
+            "conversation_id": conversation_id,
+            "max_tokens": max_tokens,
+            "total_tokens": sum(msg.token_count for msg in messages),
+            "messages": messages
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Lỗi khi lấy ngữ cảnh cuộc trò chuyện: {str(e)}"
+        )
+
+@router.post("/{conversation_id}/messages:batch", response_model=MessageBatchResponse, status_code=status.HTTP_201_CREATED)
+async def create_messages_batch(
+    conversation_id: str,
+    batch: MessageBatchCreate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Thêm nhiều tin nhắn (ví dụ một lượt chat user + assistant) trong một transaction"""
+    try:
+        repo = AsyncMessageRepository(db)
+        ids = await repo.create_messages(conversation_id, batch.messages)
+        
+        if ids is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Không tìm thấy cuộc trò chuyện"
+            )
+        
+        return MessageBatchResponse(conversation_id=conversation_id, ids=ids)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Lỗi khi tạo tin nhắn: {str(e)}"
+        )
+
 @router.put("/{conversation_id}", response_model=ConversationResponse)
 async def update_conversation(
     conversation_id: str,
     update_data: ConversationUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Cập nhật cuộc trò chuyện"""
     try:
-        repo = ConversationRepository(db)
-        conversation = repo.update_conversation(conversation_id, update_data)
+        repo = AsyncConversationRepository(db)
+        conversation = await repo.update_conversation(conversation_id, update_data)
         
         if not conversation:
             raise HTTPException(
@@ -112,7 +180,7 @@ async def update_conversation(
                 detail="Không tìm thấy cuộc trò chuyện"
             )
         
-        return ConversationResponse.from_orm(conversation)
+        return conversation
     except HTTPException:
         raise
     except Exception as e:
@@ -124,12 +192,12 @@ async def update_conversation(
 @router.delete("/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_conversation(
     conversation_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Xóa cuộc trò chuyện"""
     try:
-        repo = ConversationRepository(db)
-        success = repo.delete_conversation(conversation_id)
+        repo = AsyncConversationRepository(db)
+        success = await repo.delete_conversation(conversation_id)
         
         if not success:
             raise HTTPException(
@@ -147,12 +215,12 @@ async def delete_conversation(
 @router.patch("/{conversation_id}/archive", response_model=ConversationResponse)
 async def archive_conversation(
     conversation_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Lưu trữ cuộc trò chuyện"""
     try:
-        repo = ConversationRepository(db)
-        conversation = repo.archive_conversation(conversation_id)
+        repo = AsyncConversationRepository(db)
+        conversation = await repo.archive_conversation(conversation_id)
         
         if not conversation:
             raise HTTPException(
@@ -160,7 +228,7 @@ async def archive_conversation(
                 detail="Không tìm thấy cuộc trò chuyện"
             )
         
-        return ConversationResponse.from_orm(conversation)
+        return conversation
     except HTTPException:
         raise
     except Exception as e:
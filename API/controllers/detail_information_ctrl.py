@@ -1,18 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from schemas import detail_information_schema
 from repositories import detail_information_repo
 from database import get_db
 from controllers.auth_ctrl import get_current_user
+from pagination import set_next_cursor
+from intervals import resolve_range
+from datetime import datetime
 
 router = APIRouter()
 
 @router.get("/details/all", response_model=list[detail_information_schema.DetailResponse])
-def get_details(db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100):
+def get_details(response: Response, db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100, cursor: str = None):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return detail_information_repo.get_details(db, skip, limit)
+    details = detail_information_repo.get_details(db, skip, limit, cursor)
+    return set_next_cursor(response, details, limit, "idDetail")
 
 @router.get("/details", response_model=detail_information_schema.DetailResponse)
 def get_detail_by_id(idDetail: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
@@ -25,6 +29,15 @@ def get_detail_by_id(idDetail: str, db: Session = Depends(get_db), current_user
     
     return detail
 
+# Stops overlapping / within [start, end] or active at a moment, optionally of one trip
+@router.get("/details/range", response_model=list[detail_information_schema.DetailResponse])
+def get_details_in_range(mode: str = "overlap", start: datetime = None, end: datetime = None, at: datetime = None, idTrip: str = None, limit: int = Query(100, ge=1, le=1000), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    start, end = resolve_range(mode, start, end, at)
+    return detail_information_repo.get_details_in_range(db, mode, start, end, idTrip, limit)
+
 @router.get("/details/{select}", response_model=list[detail_information_schema.DetailResponse])
 def get_detail_by(select: str, lookup: str, db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100):
     if not current_user:
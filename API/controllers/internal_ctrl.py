@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from controllers.auth_ctrl import get_current_user, principal_cache
+from database import engine, pool_stats, get_db
+from repositories import review_repo, user_repo
+from trip_generator import trip_generator
+
+router = APIRouter()
+
+# Hit/miss counters of the principal cache used by get_current_user
+@router.get("/internal/auth-cache")
+def get_auth_cache_stats(current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return principal_cache.stats()
+
+# Live checkout, overflow and wait-time statistics of the connection pool
+@router.get("/internal/db-pool")
+def get_db_pool_stats(current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return pool_stats.snapshot(engine.pool)
+
+# Hit rate of the trip recommendation cache and generations shared in flight
+@router.get("/internal/trip-cache")
+def get_trip_cache_stats(current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return trip_generator.stats()
+
+# Recompute TripRatings from Reviews and reload the trip leaderboard
+@router.post("/internal/trip-ratings/rebuild")
+def rebuild_trip_ratings(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return review_repo.rebuild_trip_ratings(db)
+
+# Move avatars still stored in Users.avatar into the blob store
+@router.post("/internal/avatars/migrate")
+def migrate_avatars(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return user_repo.migrate_avatars(db)
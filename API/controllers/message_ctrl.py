@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from typing import List
-from API.database import get_db
-from API.repositories.conversation_repo import MessageRepository, ConversationRepository
-from API.schemas.conversation_schema import MessageCreate, MessageResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from database import get_async_db
+from repositories.conversation_repo import AsyncMessageRepository, AsyncConversationRepository
+from pagination import next_cursor
+from schemas.conversation_schema import ConversationCreate, ConversationResponse, MessageCreate, MessageResponse, MessageListResponse
 import math
 
 router = APIRouter(prefix="/messages", tags=["Messages"])
@@ -11,13 +12,13 @@ router = APIRouter(prefix="/messages", tags=["Messages"])
 @router.post("/", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 async def create_message(
     message_data: MessageCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Tạo tin nhắn mới"""
     try:
         # Kiểm tra conversation có tồn tại không
-        conv_repo = ConversationRepository(db)
-        conversation = conv_repo.get_conversation_by_id(message_data.conversation_id)
+        conv_repo = AsyncConversationRepository(db)
+        conversation = await conv_repo.get_conversation_by_id(message_data.conversation_id)
         
         if not conversation:
             raise HTTPException(
@@ -26,10 +27,10 @@ async def create_message(
             )
         
         # Tạo message
-        msg_repo = MessageRepository(db)
-        message = msg_repo.create_message(message_data)
+        msg_repo = AsyncMessageRepository(db)
+        message = await msg_repo.create_message(message_data)
         
-        return MessageResponse.from_orm(message)
+        return message
     except HTTPException:
         raise
     except Exception as e:
@@ -38,18 +39,20 @@ async def create_message(
             detail=f"Lỗi khi tạo tin nhắn: {str(e)}"
         )
 
-@router.get("/conversation/{conversation_id}")
+@router.get("/conversation/{conversation_id}", response_model=MessageListResponse)
 async def get_conversation_messages(
     conversation_id: str,
     page: int = Query(1, ge=1, description="Số trang"),
     limit: int = Query(50, ge=1, le=100, description="Số lượng mỗi trang"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Cursor của trang tiếp theo (thay cho page)"),
+    include_total: bool = Query(True, description="Bao gồm tổng số (được cache)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Lấy tin nhắn theo cuộc trò chuyện"""
     try:
         # Kiểm tra conversation có tồn tại không
-        conv_repo = ConversationRepository(db)
-        conversation = conv_repo.get_conversation_by_id(conversation_id)
+        conv_repo = AsyncConversationRepository(db)
+        conversation = await conv_repo.get_conversation_by_id(conversation_id)
         
         if not conversation:
             raise HTTPException(
@@ -58,22 +61,25 @@ async def get_conversation_messages(
             )
         
         # Lấy messages
-        msg_repo = MessageRepository(db)
-        messages, total = msg_repo.get_messages_by_conversation(
+        msg_repo = AsyncMessageRepository(db)
+        messages, total = await msg_repo.get_messages_by_conversation(
             conversation_id=conversation_id,
             page=page,
-            limit=limit
+            limit=limit,
+            cursor=cursor,
+            include_total=include_total
         )
         
-        total_pages = math.ceil(total / limit)
+        cursor_next = next_cursor(messages, limit, "created_at", "id")
         
         return {
-            "messages": [MessageResponse.from_orm(msg) for msg in messages],
+            "messages": messages,
             "total": total,
             "page": page,
             "limit": limit,
-            "has_next": page < total_pages,
-            "has_prev": page > 1
+            "has_next": cursor_next is not None if cursor or total is None else page < math.ceil(total / limit),
+            "has_prev": cursor is not None or page > 1,
+            "next_cursor": cursor_next
         }
     except HTTPException:
         raise
@@ -86,12 +92,12 @@ async def get_conversation_messages(
 @router.get("/{message_id}", response_model=MessageResponse)
 async def get_message_detail(
     message_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Lấy chi tiết tin nhắn"""
     try:
-        repo = MessageRepository(db)
-        message = repo.get_message_by_id(message_id)
+        repo = AsyncMessageRepository(db)
+        message = await repo.get_message_by_id(message_id)
         
         if not message:
             raise HTTPException(
@@ -99,7 +105,7 @@ async def get_message_detail(
                 detail="Không tìm thấy tin nhắn"
             )
         
-        return MessageResponse.from_orm(message)
+        return message
     except HTTPException:
         raise
     except Exception as e:
@@ -111,12 +117,12 @@ async def get_message_detail(
 @router.delete("/{message_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_message(
     message_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Xóa tin nhắn"""
     try:
-        repo = MessageRepository(db)
-        success = repo.delete_message(message_id)
+        repo = AsyncMessageRepository(db)
+        success = await repo.delete_message(message_id)
         
         if not success:
             raise HTTPException(
@@ -138,31 +144,30 @@ async def start_conversation(
     title: str,
     first_message: str,
     role: str = "user",
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Bắt đầu cuộc trò chuyện mới với tin nhắn đầu tiên"""
     try:
         # Tạo conversation
-        conv_repo = ConversationRepository(db)
-        from API.schemas.conversation_schema import ConversationCreate
+        conv_repo = AsyncConversationRepository(db)
         conversation_data = ConversationCreate(
             user_id=user_id,
             title=title
         )
-        conversation = conv_repo.create_conversation(conversation_data)
+        conversation = await conv_repo.create_conversation(conversation_data)
         
         # Tạo message đầu tiên
-        msg_repo = MessageRepository(db)
+        msg_repo = AsyncMessageRepository(db)
         message_data = MessageCreate(
             conversation_id=conversation.id,
             content=first_message,
             role=role
         )
-        message = msg_repo.create_message(message_data)
+        message = await msg_repo.create_message(message_data)
         
         return {
-            "conversation": ConversationResponse.from_orm(conversation),
-            "first_message": MessageResponse.from_orm(message)
+            "conversation": ConversationResponse.model_validate(conversation),
+            "first_message": MessageResponse.model_validate(message)
         }
     except Exception as e:
         raise HTTPException(
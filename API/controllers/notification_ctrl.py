@@ -1,19 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from schemas import notification_schema
 from repositories import notification_repo
 from database import get_db
 from controllers.auth_ctrl import get_current_user
+from pagination import set_next_cursor
+from notification_hub import notification_hub, stream_events
+from serialization import dump_many
+import database
 
 router = APIRouter()
 
 # Get all notifcations
 @router.get("/notifications", response_model=list[notification_schema.NotificationResponse])
-def get_notifications(db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int =0, limit: int = 100):
+def get_notifications(response: Response, db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int =0, limit: int = 100, cursor: str = None):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return notification_repo.get_notifications(db=db, skip=skip, limit=limit)
+    notifications = notification_repo.get_notifications(db=db, skip=skip, limit=limit, cursor=cursor)
+    return set_next_cursor(response, notifications, limit, "idNotf")
 
 # Get notification by id
 @router.get("/notifications", response_model=notification_schema.NotificationResponse)
@@ -54,6 +60,36 @@ def get_unread_notifications(
     notifications = notification_repo.get_unread_notifications(db, user_id, skip=skip, limit=limit)
     return notifications
 
+# Unread badge count, answered from the per-user counter cache
+@router.get("/notifications/unread-count/{idUser}")
+def get_unread_count(idUser: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return {"idUser": idUser, "unread": notification_repo.count_unread_notifications(db, idUser)}
+
+# Push new notifications to the client with Server-Sent Events
+@router.get("/notifications/stream/{idUser}")
+def stream_notifications(idUser: str, last_event_id: str = Header(None), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    # Resume point fell out of the replay buffer: start from the unread rows instead.
+    # Short-lived session: a get_db dependency would hold its connection until the stream ends
+    backlog = []
+    if last_event_id and notification_hub.replay(idUser, last_event_id) is None:
+        with database.sessionLocal() as db:
+            backlog = dump_many(
+                notification_schema.NotificationResponse,
+                notification_repo.get_unread_notifications(db, idUser, skip=0, limit=100)
+            )
+    
+    return StreamingResponse(
+        stream_events(notification_hub, idUser, last_event_id, backlog),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Post a new notification
 @router.post("/notifications/", response_model=notification_schema.NotificationResponse)
 def create_notification(notification: notification_schema.NotificationCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
@@ -71,12 +107,21 @@ def update_notification(idNotify: str, notification: notification_schema.Notific
     return notification_repo.update_notification(db=db, idNotify=idNotify, notification=notification)
 
 # Mark all notifications as read by user
-@router.put("/notifications/mark-all/{idUser}", response_model=list[notification_schema.NotificationResponse])
-def mark_all_notifications_as_read(idUser: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+# compact=true returns only the affected count instead of echoing every row
+@router.put("/notifications/mark-all/{idUser}", response_model=list[notification_schema.NotificationResponse] | notification_schema.NotificationBulkResult)
+def mark_all_notifications_as_read(idUser: str, compact: bool = False, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return notification_repo.mark_all_notifications_as_read(db=db, idUser=idUser)
+    updated = notification_repo.mark_all_notifications_as_read(db=db, idUser=idUser)
+    if compact:
+        return notification_schema.NotificationBulkResult(idUser=idUser, affected=updated)
+    
+    notifications = notification_repo.get_notifications_of_user(db, idUser)
+    if notifications == []:
+        raise HTTPException(404, "Notification not found")
+    
+    return notifications
 
 # Delete a notification
 @router.delete("/notifications/{idNotify}", response_model=notification_schema.NotificationResponse)
@@ -87,9 +132,21 @@ def delete_notification(idNotify: str, db: Session = Depends(get_db), current_us
     return notification_repo.delete_notification(db=db, idNotify=idNotify)
 
 # Delete all notifications by user
-@router.delete("/notifications/delete-all/{idUser}", response_model=list[notification_schema.NotificationResponse])
-def delete_all_notifications_by_user(idUser: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+# compact=true returns only the affected count instead of echoing every row
+@router.delete("/notifications/delete-all/{idUser}", response_model=list[notification_schema.NotificationResponse] | notification_schema.NotificationBulkResult)
+def delete_all_notifications_by_user(idUser: str, compact: bool = False, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return notification_repo.delete_notifications_by_user(db=db, idUser=idUser)
+    # Snapshot rows before the bulk delete expires them
+    notifications = [] if compact else [
+        notification_schema.NotificationResponse.model_validate(notification)
+        for notification in notification_repo.get_notifications_of_user(db, idUser)
+    ]
+    deleted = notification_repo.delete_notifications_by_user(db=db, idUser=idUser)
+    if deleted == 0:
+        raise HTTPException(404, "Notification not found")
+    
+    if compact:
+        return notification_schema.NotificationBulkResult(idUser=idUser, affected=deleted)
+    return notifications
@@ -1,20 +1,95 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from database import get_db
 from schemas import place_schema, booking_schema
 from controllers.auth_ctrl import get_current_user
-from repositories import place_repo
+from query_counter import query_budget
+from http_cache import conditional
+import fieldsets
+from repositories import place_repo, inventory_repo
+from datetime import date
+from pagination import encode_cursor, decode_cursor, set_next_cursor
 
 router = APIRouter()
 
-@router.get("/places/all", response_model=list[place_schema.PlaceResponse])
-def get_places(db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100):
+@router.get("/places/all", response_model=list[place_schema.PlaceResponse], dependencies=[conditional("places")])
+def get_places(response: Response, db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100, cursor: str = None, fields = Depends(fieldsets.PLACES)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return place_repo.get_places(db, skip, limit)
+    places = place_repo.get_places(db, skip, limit, cursor, fieldsets.PLACES.options(fields))
+    set_next_cursor(response, places, limit, "idPlace")
+    return fieldsets.PLACES.response(response, fields, places) if fields else places
 
-@router.get("/places", response_model=place_schema.PlaceResponse)
+@router.get("/places/nearby", response_model=list[place_schema.PlaceDistanceResponse])
+def get_places_nearby(
+    response: Response,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(5, gt=0, le=500, description="km"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Places within radius km of (lat, lon), nearest first.
+
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    places, next_cursor = place_repo.get_places_nearby(db, lat, lon, radius, limit, decode_cursor(cursor) if cursor else None)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = encode_cursor(*next_cursor)
+    return places
+
+@router.get("/places/in-bbox", response_model=list[place_schema.PlaceDistanceResponse])
+def get_places_in_bbox(
+    response: Response,
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: str = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Places inside the viewport, nearest to its center first (distance is from the center)."""
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(400, "Invalid bounding box")
+    
+    places, next_cursor = place_repo.get_places_in_bbox(db, min_lat, min_lon, max_lat, max_lon, limit, decode_cursor(cursor) if cursor else None)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = encode_cursor(*next_cursor)
+    return places
+
+@router.get("/places/clusters", response_model=place_schema.PlaceClusterResponse)
+def get_place_clusters(
+    bbox: str = Query(..., description="west,south,east,north (Leaflet toBBoxString)"),
+    zoom: int = Query(..., ge=0, le=22),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Marker clusters for the map viewport: centroid, count and top-rated places per cell."""
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(400, "Invalid bounding box")
+    
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+        raise HTTPException(400, "Invalid bounding box")
+    
+    return place_repo.get_place_clusters(db, min_lat, min_lon, max_lat, max_lon, zoom)
+
+@router.get("/places", response_model=place_schema.PlaceResponse, dependencies=[conditional("places")])
 def get_place_by_id(idPlace: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -25,7 +100,7 @@ def get_place_by_id(idPlace: str, db: Session = Depends(get_db), current_user =
     
     return place
 
-@router.get("/places/{idPlace}/bookings/", response_model=list[booking_schema.BookingResponse])
+@router.get("/places/{idPlace}/bookings/", response_model=list[booking_schema.BookingResponse], dependencies=[query_budget(2)])
 def get_bookings_by_place(idPlace: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -36,7 +111,29 @@ def get_bookings_by_place(idPlace: str, db: Session = Depends(get_db), current_u
     
     return bookings
 
-@router.get("/places/{select}", response_model=list[place_schema.PlaceResponse])
+# Capacity and reservations of a place per day, start..end inclusive
+@router.get("/places/{idPlace}/availability", response_model=list[place_schema.PlaceAvailability])
+def get_availability(idPlace: str, start: date, end: date, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    if not place_repo.get_place_by_id(db, idPlace):
+        raise HTTPException(404, "Place not found")
+    
+    return inventory_repo.get_availability(db, idPlace, start, end)
+
+# Set how many bookings a place takes on one day
+@router.put("/places/{idPlace}/capacity", response_model=place_schema.PlaceAvailability)
+def set_capacity(idPlace: str, capacity: place_schema.PlaceCapacityUpdate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    if not place_repo.get_place_by_id(db, idPlace):
+        raise HTTPException(404, "Place not found")
+    
+    return inventory_repo.set_capacity(db, idPlace, capacity.day, capacity.capacity)
+
+@router.get("/places/{select}", response_model=list[place_schema.PlaceResponse], dependencies=[conditional("places")])
 def get_place_by(select: str, lookup: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -47,7 +144,7 @@ def get_place_by(select: str, lookup: str, db: Session = Depends(get_db), curren
     
     return places
 
-@router.get("/places/{idPlace}/trips/", response_model=list[place_schema.PlaceResponse])
+@router.get("/places/{idPlace}/trips/", response_model=list[place_schema.PlaceResponse], dependencies=[query_budget(2)])
 def get_trips_by_place(idPlace: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -83,15 +180,25 @@ def delete_place(idPlace: str, db: Session = Depends(get_db), current_user = Dep
 @router.get("/search/", response_model=list[place_schema.PlaceResponse])
 def search_places(
     query: str,
+    response: Response,
     place_type: int = None,
     min_rating: int = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str = None,
     db: Session = Depends(get_db)
 ):
-    """Search places with filters"""
-    places = place_repo.search_places(
+    """Search places with filters, ranked by relevance.
+
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    places, next_cursor = place_repo.search_places(
         db,
         query=query,
         place_type=place_type,
-        min_rating=min_rating
+        min_rating=min_rating,
+        limit=limit,
+        after=decode_cursor(cursor) if cursor else None
     )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = encode_cursor(*next_cursor)
     return places
@@ -1,19 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from schemas import review_schema
 from repositories import review_repo
 from database import get_db
 from controllers.auth_ctrl import get_current_user
+from pagination import set_next_cursor
+from http_cache import conditional
 
 router = APIRouter()
 
 # Get all reviews
-@router.get("/reviews/all", response_model=list[review_schema.ReviewResponse])
-def get_reviews(db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100):
+@router.get("/reviews/all", response_model=list[review_schema.ReviewResponse], dependencies=[conditional("reviews")])
+def get_reviews(response: Response, db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100, cursor: str = None):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return review_repo.get_reviews(db, skip, limit)
+    reviews = review_repo.get_reviews(db, skip, limit, cursor)
+    return set_next_cursor(response, reviews, limit, "idReview")
 
 # Get a review by id
 @router.get("/reviews", response_model=review_schema.ReviewResponse)
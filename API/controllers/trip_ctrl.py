@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from schemas import trip_schema, user_schema, place_schema
-from repositories import trip_repo
+from repositories import trip_repo, detail_information_repo, review_repo
 from database import get_db
 from controllers.auth_ctrl import get_current_user
+from query_counter import query_budget
+from http_cache import conditional
+import fieldsets
+from intervals import resolve_range
+from datetime import datetime
 
 router = APIRouter()
 
@@ -15,13 +20,23 @@ def create_trip(trip: trip_schema.TripCreate, db: Session = Depends(get_db), cur
     
     return trip_repo.create_trip(db=db, trip=trip)
 
+# Reorder the trip's places to shorten travel and re-time them
+@router.post("/trips/{idTrip}/optimize", response_model=trip_schema.TripOptimizeResponse)
+def optimize_trip(idTrip: str, options: trip_schema.TripOptimize = None, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    options = options or trip_schema.TripOptimize()
+    return detail_information_repo.optimize_trip(db, idTrip, options.fixed, options.speed)
+
 # Get all trips
 @router.get("/trips/", response_model=list[trip_schema.TripResponse])
-def get_trips(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_trips(response: Response, db: Session = Depends(get_db), current_user = Depends(get_current_user), fields = Depends(fieldsets.TRIPS)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return trip_repo.get_trips(db)
+    trips = trip_repo.get_trips(db, options=fieldsets.TRIPS.options(fields))
+    return fieldsets.TRIPS.response(response, fields, trips) if fields else trips
 
 # Get a trip by id
 @router.get("/trips", response_model=trip_schema.TripResponse)
@@ -35,32 +50,57 @@ def get_trip_by_id(idTrip: str, db: Session = Depends(get_db), current_user = De
     
     return trip
 
-# Get a trip by
-@router.get("/trips/{select}", response_model=list[trip_schema.TripResponse])
-def get_trip_by(select: str, lookup: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+# Get trips by date and keyword
+@router.get("/trips/date-key", response_model=list[trip_schema.TripResponse])
+def get_trips_date_key(start_date: str = None, end_date: str = None, keyword: str = None, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    trip = trip_repo.get_trip_by(db=db, select=select, lookup=lookup)
+    trip = trip_repo.get_trips(db, start_date, end_date, keyword)
     if trip == []:
         raise HTTPException(status_code=404, detail="Trip not found")
     
     return trip
 
-# Get trips by date and keyword
-@router.get("/trips/date-key", response_model=list[trip_schema.TripResponse])
-def get_trips_date_key(start_date: str = None, end_date: str = None, keyword: str = None, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+# Trips overlapping / within [start, end] or active at a moment
+@router.get("/trips/range", response_model=list[trip_schema.TripResponse])
+def get_trips_in_range(mode: str = "overlap", start: datetime = None, end: datetime = None, at: datetime = None, limit: int = Query(100, ge=1, le=1000), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    trip = trip_repo.get_trips(db, start_date, end_date, keyword)
+    start, end = resolve_range(mode, start, end, at)
+    return trip_repo.get_trips_in_range(db, mode, start, end, limit)
+
+# Best rated trips, overall or with a place in the province
+@router.get("/trips/top", response_model=list[trip_schema.TopTripResponse])
+def get_top_trips(province: str = None, limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return review_repo.get_top_trips(db, province, limit)
+
+# Get a trip by
+@router.get("/trips/{select}", response_model=list[trip_schema.TripResponse])
+def get_trip_by(select: str, lookup: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    trip = trip_repo.get_trip_by(db=db, select=select, lookup=lookup)
     if trip == []:
         raise HTTPException(status_code=404, detail="Trip not found")
     
     return trip
 
+# Review count, average and star histogram of a trip
+@router.get("/trips/{idTrip}/rating", response_model=trip_schema.TripRatingResponse)
+def get_trip_rating(idTrip: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return review_repo.get_trip_rating(db, idTrip)
+
 # Get members by trip
-@router.get("/trips/{idTrip}/members/", response_model=list[user_schema.UserResponse])
+@router.get("/trips/{idTrip}/members/", response_model=list[user_schema.UserResponse], dependencies=[query_budget(2)])
 def get_members_by_trip(idTrip: str = None, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -71,7 +111,7 @@ def get_members_by_trip(idTrip: str = None, db: Session = Depends(get_db), curre
     
     return members
 
-@router.get("/trips/{idTrip}/reviewed/", response_model=list[user_schema.UserResponse])
+@router.get("/trips/{idTrip}/reviewed/", response_model=list[user_schema.UserResponse], dependencies=[query_budget(2)])
 def get_users_reviewed_trip(idTrip: str = None, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -82,7 +122,7 @@ def get_users_reviewed_trip(idTrip: str = None, db: Session = Depends(get_db), c
     
     return users
 
-@router.get("/trips/{idTrip}/places/", response_model=list[place_schema.PlaceResponse])
+@router.get("/trips/{idTrip}/places/", response_model=list[place_schema.PlaceResponse], dependencies=[query_budget(3), conditional("trips", "details", "places")])
 def get_places_of_trip(idTrip: str = None, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
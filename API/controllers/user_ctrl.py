@@ -1,19 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File, status
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from schemas import user_schema, trip_schema, booking_schema
 from repositories import user_repo
 from database import get_db
 from controllers.auth_ctrl import get_current_user
+from query_counter import query_budget
+from blob_store import avatar_file, AVATAR_MAX_BYTES
+import fieldsets
+import os
 
 router = APIRouter()
 
 # Get all users
 @router.get("/users/", response_model=list[user_schema.UserResponse])
-def get_users(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_users(response: Response, db: Session = Depends(get_db), current_user = Depends(get_current_user), fields = Depends(fieldsets.USERS)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return user_repo.get_users(db)
+    users = user_repo.get_users(db, fieldsets.USERS.options(fields)).all()
+    return fieldsets.USERS.response(response, fields, users) if fields else users
 
 # Get a user by
 @router.get("/users/{select}", response_model=user_schema.UserResponse)
@@ -27,7 +33,7 @@ def get_user_by(select: str, lookup: str, db: Session = Depends(get_db), current
     
     return user
 
-@router.get("/users/{idUser}/trips", response_model=list[trip_schema.TripResponse])
+@router.get("/users/{idUser}/trips", response_model=list[trip_schema.TripResponse], dependencies=[query_budget(2)])
 def get_trips_of_user(idUser: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -38,7 +44,23 @@ def get_trips_of_user(idUser: str, db: Session = Depends(get_db), current_user =
     
     return trips
 
-@router.get("/users/{idUser}/bookings", response_model=list[booking_schema.BookingResponse])
+# Trips, bookings and trip stops of a user in one month
+@router.get("/users/{idUser}/calendar", response_model=list[user_schema.CalendarEntry], dependencies=[query_budget(2)])
+def get_calendar_of_user(idUser: str, year: int = Query(ge=1, le=9998), month: int = Query(ge=1, le=12), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return user_repo.get_calendar(db, idUser, year, month)
+
+# Overlapping trips, bookings and stops of a user
+@router.get("/users/{idUser}/conflicts", response_model=list[user_schema.ScheduleConflict])
+def get_conflicts_of_user(idUser: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return user_repo.get_conflicts(db, idUser)
+
+@router.get("/users/{idUser}/bookings", response_model=list[booking_schema.BookingResponse], dependencies=[query_budget(2)])
 def get_bookings_of_user(idUser: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -49,7 +71,7 @@ def get_bookings_of_user(idUser: str, db: Session = Depends(get_db), current_use
     
     return bookings
 
-@router.get("/users/{idUser}/friend_requests_of", response_model=list[user_schema.UserResponse])
+@router.get("/users/{idUser}/friend_requests_of", response_model=list[user_schema.UserResponse], dependencies=[query_budget(2)])
 def get_friend_requests_of_user(idUser: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -60,7 +82,7 @@ def get_friend_requests_of_user(idUser: str, db: Session = Depends(get_db), curr
     
     return friend_requests
 
-@router.get("/users/{idUser}/friend_requests_to", response_model=list[user_schema.UserResponse])
+@router.get("/users/{idUser}/friend_requests_to", response_model=list[user_schema.UserResponse], dependencies=[query_budget(2)])
 def get_friend_requests_to_user(idUser: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -71,7 +93,7 @@ def get_friend_requests_to_user(idUser: str, db: Session = Depends(get_db), curr
     
     return friend_requests
 
-@router.get("/users/{idUser}/reviewed_trips", response_model=list[trip_schema.TripResponse])
+@router.get("/users/{idUser}/reviewed_trips", response_model=list[trip_schema.TripResponse], dependencies=[query_budget(2)])
 def get_reviewed_trips_of_user(idUser: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -104,4 +126,38 @@ def delete_user(idUser: str, db: Session = Depends(get_db), current_user = Depen
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return user_repo.delete_user(db=db, idUser=idUser)
\ No newline at end of file
+    return user_repo.delete_user(db=db, idUser=idUser)
+
+# Upload a new avatar (PNG, JPEG, GIF or WebP); PATCH is what the web client sends
+@router.put("/users/{idUser}/avatar", response_model=user_schema.UserResponse)
+@router.patch("/users/{idUser}/avatar", response_model=user_schema.UserResponse)
+def set_avatar(idUser: str, file: UploadFile = File(...), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    data = file.file.read(AVATAR_MAX_BYTES + 1)
+    return user_repo.set_avatar(db=db, idUser=idUser, data=data)
+
+# Remove a user's avatar
+@router.delete("/users/{idUser}/avatar", response_model=user_schema.UserResponse)
+def delete_avatar(idUser: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return user_repo.set_avatar(db=db, idUser=idUser, data=None)
+
+# Avatar image by content hash, optionally as the thumbnail for size px. Public so it works
+# in <img> tags; the bytes behind a hash never change, so it can be cached forever
+@router.get("/avatars/{digest}")
+def get_avatar(digest: str, request: Request, size: int = Query(None, ge=1)):
+    found = avatar_file(digest, size)
+    if found is None:
+        raise HTTPException(404, "Avatar not found")
+    
+    path, media_type = found
+    headers = {"ETag": f'"{os.path.basename(path)}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if headers["ETag"] in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    return FileResponse(path, media_type=media_type, headers=headers)
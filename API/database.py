@@ -1,28 +1,156 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import QueuePool
+from threading import Lock, local
 from dotenv import load_dotenv
 import os
+import time
 import logging
 
 # Connect to SQL Server by using SQL Server Authentication
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL) # Create connection to database with SQLAlchemy
-sessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine) # Create a new session
+
+# Async driver URL, derived from DATABASE_URL unless set explicitly
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "mssql+pyodbc": "mssql+aioodbc",
+    "sqlite": "sqlite+aiosqlite"
+}
+
+def to_async_url(url: str):
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# Config for connection pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
 
 # Cấu hình log
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Pool telemetry, fed by SQLAlchemy pool and session events
+class PoolStats:
+    def __init__(self):
+        self._lock = Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def incr(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self, pool):
+        with self._lock:
+            stats = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "wait_count": self.waits,
+                "wait_avg_ms": self.wait_total / self.waits * 1000 if self.waits else 0.0,
+                "wait_max_ms": self.wait_max * 1000
+            }
+
+        stats["status"] = pool.status()
+        # QueuePool exposes live sizing, other pools (e.g. SQLite) do not
+        if isinstance(pool, QueuePool):
+            stats["size"] = pool.size()
+            stats["checked_out"] = pool.checkedout()
+            stats["checked_in"] = pool.checkedin()
+            stats["overflow"] = pool.overflow()
+        return stats
+
+pool_stats = PoolStats()
+
+def pool_options(url: str):
+    if url.startswith("sqlite"):
+        return {}
+
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING
+    }
+
+def build_engine(url: str):
+    return create_engine(url, **pool_options(url))
+
 try:
-    engine = create_engine(DATABASE_URL)
-    sessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine = build_engine(DATABASE_URL) # Create connection to database with SQLAlchemy
+    sessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine) # Create a new session
     logger.info("✅ Đã kết nối đến database thành công.")
 except Exception as e:
     logger.error("❌ Kết nối đến database thất bại.")
     logger.exception(e)
     raise e  # bắt buộc raise để FastAPI biết lỗi
 
+# Async engine beside the sync one; stays None if the async driver is missing
+try:
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL))
+    asyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+except ImportError as e:
+    async_engine = None
+    asyncSessionLocal = None
+    logger.warning("⚠️ Không tìm thấy async driver cho %s: %s", ASYNC_DATABASE_URL, e)
+
+@event.listens_for(engine, "connect")
+def on_connect(dbapi_connection, connection_record):
+    pool_stats.incr("connects")
+
+# Pool wait: from a session starting its transaction, which asks the pool for a connection,
+# to the checkout event (a new connection's connect time included). Checkout stays lazy,
+# requests that never touch the database take no connection
+_pending_checkout = local()
+
+@event.listens_for(sessionLocal, "after_transaction_create")
+def on_transaction_create(session, transaction):
+    if transaction.parent is None:
+        _pending_checkout.start = time.perf_counter()
+
+@event.listens_for(sessionLocal, "after_transaction_end")
+def on_transaction_end(session, transaction):
+    if transaction.parent is None:
+        _pending_checkout.start = None
+
+@event.listens_for(engine, "checkout")
+def on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats.incr("checkouts")
+    start = getattr(_pending_checkout, "start", None)
+    if start is not None:
+        _pending_checkout.start = None
+        pool_stats.record_wait(time.perf_counter() - start)
+
+@event.listens_for(engine, "checkin")
+def on_checkin(dbapi_connection, connection_record):
+    pool_stats.incr("checkins")
+
+@event.listens_for(engine, "invalidate")
+def on_invalidate(dbapi_connection, connection_record, exception):
+    pool_stats.incr("invalidations")
+
 Base = declarative_base() # Create a new base class for models
 
 # Get session and work with database
@@ -31,4 +159,12 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Get async session for async controllers
+async def get_async_db():
+    if asyncSessionLocal is None:
+        raise RuntimeError("Async database driver is not installed")
+
+    async with asyncSessionLocal() as db:
+        yield db
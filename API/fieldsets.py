@@ -0,0 +1,69 @@
+from fastapi import HTTPException, Query, Response
+from pydantic import ConfigDict, Field, TypeAdapter, computed_field, create_model
+from sqlalchemy.orm import load_only
+from schemas.place_schema import PlaceResponse
+from schemas.user_schema import UserResponse
+from schemas.trip_schema import TripResponse
+from schemas.booking_schema import BookingResponse
+from models.place import Place
+from models.user import User
+from models.trip import Trip
+from models.booking import Booking
+
+# ?fields=a,b,c on a list endpoint: only the matching columns are read (load_only)
+# and only those keys serialized, through a response model built for that set
+class Fieldset:
+    def __init__(self, schema, model, depends: dict = None):
+        self.schema = schema
+        self.model = model
+        self.depends = depends or {}  # computed field -> fields it is built from
+        self.computed = schema.__pydantic_decorators__.computed_fields
+        self.names = [*(name for name, field in schema.model_fields.items() if not field.exclude), *self.computed]
+        self._adapters = {}
+
+    # Route dependency: requested names in schema order, None for the full entity
+    def __call__(self, fields: str = Query(None, description="Comma-separated fields to return, e.g. idPlace,name,image")):
+        if not fields:
+            return None
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested - set(self.names)
+        if unknown:
+            raise HTTPException(400, f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(self.names)}")
+        return tuple(name for name in self.names if name in requested)
+
+    # Loader options reading only the columns behind the fields (the primary key always comes along)
+    def options(self, names):
+        if names is None:
+            return []
+        needed = {dep for name in names for dep in self.depends.get(name, [name])}
+        return [load_only(*(getattr(self.model, name) for name in self.schema.model_fields if name in needed))]
+
+    def adapter(self, names):
+        adapter = self._adapters.get(names)
+        if adapter is None:
+            fields = {
+                name: (self.schema.model_fields[name].annotation, self.schema.model_fields[name])
+                for name in names if name in self.schema.model_fields
+            }
+            # Inputs of computed fields are loaded but left out of the output unless asked for
+            for name in names:
+                for dep in self.depends.get(name, ()):
+                    fields.setdefault(dep, (self.schema.model_fields[dep].annotation, Field(None, exclude=True)))
+            computed = {name: computed_field(self.computed[name].info.wrapped_property) for name in names if name in self.computed}
+            sparse = create_model(
+                f"{self.schema.__name__}Fields", __config__=ConfigDict(from_attributes=True), __validators__=computed, **fields
+            )
+            adapter = self._adapters[names] = TypeAdapter(list[sparse])
+        return adapter
+
+    # JSON response of rows in the sparse model; headers already set on response are kept
+    def response(self, response: Response, names, rows):
+        adapter = self.adapter(names)
+        sparse = Response(adapter.dump_json(adapter.validate_python(rows, from_attributes=True)), media_type="application/json")
+        sparse.headers.raw.extend(response.headers.raw)
+        return sparse
+
+PLACES = Fieldset(PlaceResponse, Place)
+USERS = Fieldset(UserResponse, User, depends={"avatar": ["avatarHash", "avatarLink"]})
+TRIPS = Fieldset(TripResponse, Trip)
+BOOKINGS = Fieldset(BookingResponse, Booking)
@@ -0,0 +1,215 @@
+from math import radians, degrees, sin, cos, asin, sqrt
+from bisect import insort
+from threading import Lock
+import heapq
+import os
+import time
+
+# Places are indexed by a Z-order (Morton) cell code: GEO_BITS bits per axis, interleaved.
+# Every geohash-style prefix is an integer range, so a plain B-tree on the code
+# answers "all places in this cell" on any database.
+GEO_BITS = 26
+EARTH_RADIUS_KM = 6371.0
+MAX_COVER_CELLS = 16
+
+def _spread(v: int):
+    v &= 0x3FFFFFF
+    v = (v | (v << 16)) & 0x0000FFFF0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F0F0F0F0F
+    v = (v | (v << 2)) & 0x3333333333333333
+    v = (v | (v << 1)) & 0x5555555555555555
+    return v
+
+def _grid(lat: float, lon: float, level: int = GEO_BITS):
+    size = 1 << level
+    x = min(int((lon + 180.0) / 360.0 * size), size - 1)
+    y = min(int((lat + 90.0) / 180.0 * size), size - 1)
+    return max(x, 0), max(y, 0)
+
+def interleave(x: int, y: int):
+    return (_spread(x) << 1) | _spread(y)
+
+def encode_cell(lat: float, lon: float):
+    return interleave(*_grid(lat, lon))
+
+# [start, end) of codes inside cell (x, y) of a coarser level
+def cell_range(x: int, y: int, level: int):
+    shift = 2 * (GEO_BITS - level)
+    start = interleave(x, y) << shift
+    return start, start + (1 << shift)
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float):
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+# Bounding box (min_lat, min_lon, max_lat, max_lon) of a circle
+def circle_bbox(lat: float, lon: float, radius_km: float):
+    dlat = degrees(radius_km / EARTH_RADIUS_KM)
+    dlon = 180.0 if abs(lat) + dlat >= 90 else degrees(radius_km / (EARTH_RADIUS_KM * cos(radians(lat))))
+    return max(lat - dlat, -90.0), max(lon - dlon, -180.0), min(lat + dlat, 90.0), min(lon + dlon, 180.0)
+
+# Code ranges covering a bbox with at most max_cells cells, adjacent ranges merged
+def cover_bbox(min_lat: float, min_lon: float, max_lat: float, max_lon: float, max_cells: int = MAX_COVER_CELLS):
+    for level in range(GEO_BITS, -1, -1):
+        x0, y0 = _grid(min_lat, min_lon, level)
+        x1, y1 = _grid(max_lat, max_lon, level)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= max_cells:
+            break
+
+    ranges = sorted(cell_range(x, y, level) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+    merged = [list(ranges[0])]
+    for start, end in ranges[1:]:
+        if start == merged[-1][1]:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+# Marker clusters: per grid level, (x, y) -> [count, sum_lat, sum_lon, top places].
+# Level L has 2^L columns and 2^L rows, map zoom z clusters at level z + 1 (cells about 128x64px).
+CLUSTER_MAX_LEVEL = int(os.getenv("CLUSTER_MAX_LEVEL", "12"))
+CLUSTER_TOP_K = int(os.getenv("CLUSTER_TOP_K", "3"))
+CLUSTER_MAX_CELLS = 4096
+CLUSTER_INDEX_TTL = int(os.getenv("CLUSTER_INDEX_TTL", "300"))
+
+class PlaceClusterIndex:
+    def __init__(self, max_level: int = CLUSTER_MAX_LEVEL, top_k: int = CLUSTER_TOP_K, ttl: int = CLUSTER_INDEX_TTL):
+        self.max_level = max_level
+        self.top_k = top_k
+        self.ttl = ttl
+        self._built_at = None
+        self._lock = Lock()
+        self._levels = [{} for _ in range(max_level + 1)]
+        self._members = {}  # finest cell -> {idPlace: rating}
+        self._docs = {}     # idPlace -> (lat, lon, rating)
+
+    # Rebuilt after ttl so writes from other workers show up
+    @property
+    def loaded(self):
+        return self._built_at is not None and time.time() - self._built_at < self.ttl
+
+    # Fill the finest level, then merge each level into its parent
+    def build(self, places):
+        levels = [{} for _ in range(self.max_level + 1)]
+        members, docs = {}, {}
+        for place in places:
+            lat, lon, rating = place.latitude, place.longitude, place.rating or 0
+            if lat is None or lon is None:
+                continue
+            docs[place.idPlace] = (lat, lon, rating)
+            key = _grid(lat, lon, self.max_level)
+            members.setdefault(key, {})[place.idPlace] = rating
+            cell = levels[self.max_level].setdefault(key, [0, 0.0, 0.0, []])
+            cell[0] += 1
+            cell[1] += lat
+            cell[2] += lon
+
+        for key, cell in levels[self.max_level].items():
+            cell[3] = heapq.nsmallest(self.top_k, ((-r, i) for i, r in members[key].items()))
+        for level in range(self.max_level - 1, -1, -1):
+            for (x, y), child in levels[level + 1].items():
+                cell = levels[level].setdefault((x >> 1, y >> 1), [0, 0.0, 0.0, []])
+                cell[0] += child[0]
+                cell[1] += child[1]
+                cell[2] += child[2]
+                cell[3].extend(child[3])
+            for cell in levels[level].values():
+                cell[3] = heapq.nsmallest(self.top_k, cell[3])
+
+        with self._lock:
+            self._levels, self._members, self._docs = levels, members, docs
+            self._built_at = time.time()
+
+    def add(self, place):
+        with self._lock:
+            self._remove(place.idPlace)
+            self._add(place)
+
+    def remove(self, idPlace: str):
+        with self._lock:
+            self._remove(idPlace)
+
+    def _add(self, place):
+        lat, lon, rating = place.latitude, place.longitude, place.rating or 0
+        if lat is None or lon is None:
+            return
+
+        self._docs[place.idPlace] = (lat, lon, rating)
+        x, y = _grid(lat, lon, self.max_level)
+        self._members.setdefault((x, y), {})[place.idPlace] = rating
+
+        # Best rating first, then idPlace
+        key = (-rating, place.idPlace)
+        for level in range(self.max_level, -1, -1):
+            cell = self._levels[level].setdefault((x, y), [0, 0.0, 0.0, []])
+            cell[0] += 1
+            cell[1] += lat
+            cell[2] += lon
+            if len(cell[3]) < self.top_k or key < cell[3][-1]:
+                insort(cell[3], key)
+                del cell[3][self.top_k:]
+            x >>= 1
+            y >>= 1
+
+    def _remove(self, idPlace: str):
+        doc = self._docs.pop(idPlace, None)
+        if doc is None:
+            return
+
+        lat, lon, rating = doc
+        x, y = _grid(lat, lon, self.max_level)
+        members = self._members[(x, y)]
+        del members[idPlace]
+        if not members:
+            del self._members[(x, y)]
+
+        key = (-rating, idPlace)
+        for level in range(self.max_level, -1, -1):
+            cells = self._levels[level]
+            cell = cells[(x, y)]
+            cell[0] -= 1
+            cell[1] -= lat
+            cell[2] -= lon
+            if cell[0] == 0:
+                del cells[(x, y)]
+            elif key in cell[3]:
+                # Refill the top list from the finest members or from the four child cells
+                if level == self.max_level:
+                    candidates = ((-r, i) for i, r in members.items())
+                else:
+                    children = self._levels[level + 1]
+                    candidates = (k for dx in (0, 1) for dy in (0, 1) for k in children.get((2 * x + dx, 2 * y + dy), (0, 0, 0, ()))[3])
+                cell[3] = heapq.nsmallest(self.top_k, candidates)
+            x >>= 1
+            y >>= 1
+
+    def level_for(self, zoom: int):
+        return max(0, min(zoom + 1, self.max_level))
+
+    # Clusters intersecting the bbox: (level, [(lat, lon, count, [idPlace...])])
+    def clusters(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, zoom: int):
+        level = self.level_for(zoom)
+        while True:
+            x0, y0 = _grid(min_lat, min_lon, level)
+            x1, y1 = _grid(max_lat, max_lon, level)
+            if level == 0 or (x1 - x0 + 1) * (y1 - y0 + 1) <= CLUSTER_MAX_CELLS:
+                break
+            level -= 1
+
+        with self._lock:
+            cells = self._levels[level]
+            if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(cells):
+                found = ((x, y, cells.get((x, y))) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+            else:
+                found = ((x, y, cell) for (x, y), cell in cells.items() if x0 <= x <= x1 and y0 <= y <= y1)
+
+            result = [
+                (cell[1] / cell[0], cell[2] / cell[0], cell[0], [idPlace for _, idPlace in cell[3]])
+                for x, y, cell in found if cell
+            ]
+        return level, result
+
+cluster_index = PlaceClusterIndex()
@@ -0,0 +1,97 @@
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import event, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timezone
+from cache import TTLCache
+from database import get_db
+from controllers.auth_ctrl import get_current_user
+from models.entity_version import EntityVersion
+import hashlib
+import os
+
+# Versions are re-read from the database at most every VERSION_CACHE_TTL seconds per worker;
+# this worker's own writes are visible right after commit
+VERSION_CACHE_TTL = float(os.getenv("VERSION_CACHE_TTL", "2"))
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "0"))
+
+versions = TTLCache(maxsize=100, ttl=VERSION_CACHE_TTL)  # name -> (version, updatedAt)
+
+# Count a change of each catalog in the caller's transaction
+def bump(db: Session, *names: str):
+    for name in names:
+        _bump(db, name)
+
+def _bump(db: Session, name: str):
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    result = db.execute(
+        update(EntityVersion).where(EntityVersion.name == name)
+        .values(version=EntityVersion.version + 1, updatedAt=now)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        try:
+            with db.begin_nested():
+                db.add(EntityVersion(name=name, version=1, updatedAt=now))
+        except IntegrityError:
+            _bump(db, name)  # Created by a concurrent writer
+            return
+    db.info.setdefault("version_bumps", set()).add(name)
+
+@event.listens_for(Session, "after_commit")
+def drop_cached_versions(session):
+    for name in session.info.pop("version_bumps", ()):
+        versions.pop(name)
+
+@event.listens_for(Session, "after_soft_rollback")
+def discard_version_bumps(session, previous_transaction):
+    session.info.pop("version_bumps", None)
+
+def get_versions(db: Session, names: tuple):
+    found = {name: versions.get(name) for name in names}
+    missing = [name for name, value in found.items() if value is None]
+    if missing:
+        rows = db.query(EntityVersion.name, EntityVersion.version, EntityVersion.updatedAt).filter(EntityVersion.name.in_(missing))
+        loaded = {name: (version, updatedAt) for name, version, updatedAt in rows}
+        for name in missing:
+            found[name] = loaded.get(name, (0, None))
+            versions.set(name, found[name])
+    return found
+
+def _etag_matches(header: str, etag: str):
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+# Route dependency: ETag / Last-Modified from the catalogs the response is built from,
+# 304 when the client's copy is still current, so the endpoint never runs
+def conditional(*names: str):
+    def check(request: Request, response: Response, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+        if not current_user:
+            return
+
+        found = get_versions(db, names)
+        key = f"{request.url.path}?{request.url.query}|" + "|".join(f"{name}:{found[name][0]}" for name in names)
+        etag = f'W/"{hashlib.sha1(key.encode()).hexdigest()[:20]}"'
+        modified = [updatedAt for _, updatedAt in found.values() if updatedAt is not None]
+
+        headers = {"ETag": etag, "Cache-Control": f"private, max-age={CATALOG_MAX_AGE}, must-revalidate"}
+        if modified:
+            headers["Last-Modified"] = format_datetime(max(modified).replace(tzinfo=timezone.utc), usegmt=True)
+
+        if_none_match = request.headers.get("if-none-match")
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_none_match is not None:
+            fresh = _etag_matches(if_none_match, etag)
+        elif if_modified_since and modified:
+            try:
+                fresh = max(modified).replace(tzinfo=timezone.utc) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                fresh = False
+        else:
+            fresh = False
+
+        if fresh:
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return Depends(check)
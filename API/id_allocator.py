@@ -0,0 +1,68 @@
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+from threading import Lock
+from models.id_sequence import IdSequence
+import database
+import os
+import string
+
+# IDs are prefix (2 chars) + 4 chars, e.g. "PLgA0z". The first of the 4 chars is never
+# a hex digit, so allocated IDs cannot collide with legacy uuid4()[:4] IDs.
+LEAD = "ghijklmnopqrstuvwxyzGHIJKLMNOPQRSTUVWXYZ"
+DIGITS = string.digits + string.ascii_letters
+CAPACITY = len(LEAD) * len(DIGITS) ** 3
+
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "1000"))
+
+def encode_id(prefix: str, value: int):
+    lead, value = divmod(value, len(DIGITS) ** 3)
+    tail = ""
+    for _ in range(3):
+        value, digit = divmod(value, len(DIGITS))
+        tail = DIGITS[digit] + tail
+    return prefix + LEAD[lead] + tail
+
+# Hands out IDs from blocks reserved in IdSequences, one DB round-trip per block
+class IdAllocator:
+    def __init__(self, block_size: int = ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = Lock()
+        self._blocks = {}  # prefix -> [next, end)
+
+    def next_id(self, prefix: str):
+        with self._lock:
+            block = self._blocks.get(prefix)
+            if block is None or block[0] >= block[1]:
+                block = self._blocks[prefix] = list(self._reserve(prefix))
+            value = block[0]
+            block[0] += 1
+        return encode_id(prefix, value)
+
+    def _reserve(self, prefix: str):
+        # Own transaction, so a block is never rolled back with a request's session. The UPDATE
+        # only moves nextValue from the value read, so two workers can't take the same block
+        # even where SELECT ... FOR UPDATE is a no-op (SQLite)
+        while True:
+            try:
+                with database.engine.begin() as conn:
+                    start = conn.execute(
+                        select(IdSequence.nextValue).where(IdSequence.prefix == prefix).with_for_update()
+                    ).scalar()
+                    if start is None:
+                        start = 0
+                        conn.execute(insert(IdSequence).values(prefix=prefix, nextValue=self.block_size))
+                    else:
+                        result = conn.execute(
+                            update(IdSequence).where(IdSequence.prefix == prefix, IdSequence.nextValue == start)
+                            .values(nextValue=start + self.block_size)
+                        )
+                        if result.rowcount != 1:
+                            continue  # Another worker took this block
+            except IntegrityError:
+                continue  # Another worker created the row first
+
+            if start >= CAPACITY:
+                raise RuntimeError(f"ID space for prefix {prefix} is exhausted")
+            return start, min(start + self.block_size, CAPACITY)
+
+id_allocator = IdAllocator()
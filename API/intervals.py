@@ -0,0 +1,197 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from threading import Lock
+from fastapi import HTTPException
+from sqlalchemy import event, func, literal_column
+from sqlalchemy.orm import Session, load_only
+from models.trip import Trip
+from models.booking import Booking
+from models.detail_information import DetailInformation
+import os
+import time
+
+INTERVAL_INDEX_TTL = int(os.getenv("INTERVAL_INDEX_TTL", "300"))
+MODES = ("overlap", "within", "active")
+
+# Closed intervals [start, end] sorted by start. Anything overlapping [a, b] starts in
+# [a - longest, b], so a query is a bisect plus a scan of that slice.
+class IntervalIndex:
+    def __init__(self, ttl: int = INTERVAL_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = Lock()
+        self._built_at = None
+        self._starts = []  # sorted starts
+        self._keys = []    # key of each start
+        self._spans = {}   # key -> (start, end)
+        self._longest = timedelta(0)
+
+    # Rebuilt after ttl so writes from other workers show up
+    @property
+    def loaded(self):
+        return self._built_at is not None and time.time() - self._built_at < self.ttl
+
+    def build(self, spans):
+        entries, all_spans, longest = [], {}, timedelta(0)
+        for key, start, end in spans:
+            if start is None:
+                continue
+            end = max(end or start, start)
+            all_spans[key] = (start, end)
+            entries.append((start, key))
+            longest = max(longest, end - start)
+        entries.sort(key=lambda entry: entry[0])
+
+        with self._lock:
+            self._starts = [start for start, _ in entries]
+            self._keys = [key for _, key in entries]
+            self._spans, self._longest = all_spans, longest
+            self._built_at = time.time()
+
+    def add(self, key, start, end):
+        with self._lock:
+            self._remove(key)
+            if start is None:
+                return
+            end = max(end or start, start)
+            self._spans[key] = (start, end)
+            i = bisect_right(self._starts, start)
+            self._starts.insert(i, start)
+            self._keys.insert(i, key)
+            self._longest = max(self._longest, end - start)
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        span = self._spans.pop(key, None)
+        if span is not None:
+            i = self._keys.index(key, bisect_left(self._starts, span[0]))
+            del self._starts[i]
+            del self._keys[i]
+
+    def search(self, mode: str, start: datetime, end: datetime):
+        with self._lock:
+            low = start if mode == "within" else start - self._longest
+            i = bisect_left(self._starts, low)
+            j = bisect_right(self._starts, end)
+            return [key for key in self._keys[i:j] if matches(mode, self._spans[key], start, end)]
+
+def matches(mode: str, span: tuple, start: datetime, end: datetime):
+    if span[0] is None:
+        return False
+    s, e = span[0], max(span[1] or span[0], span[0])
+    if mode == "within":
+        return start <= s and e <= end
+    return s <= end and e >= start
+
+# Validate query parameters into (start, end); "active" is an overlap with the instant at
+def resolve_range(mode: str, start: datetime = None, end: datetime = None, at: datetime = None):
+    if mode not in MODES:
+        raise HTTPException(400, f"mode must be one of {', '.join(MODES)}")
+    if mode == "active":
+        if at is None:
+            raise HTTPException(400, "at is required for mode=active")
+        return at, at
+    if start is None or end is None or start > end:
+        raise HTTPException(400, "start and end are required, start <= end")
+    return start, end
+
+# Time span of a model: SQL start/end expressions (matching its GiST tsrange index on PostgreSQL),
+# span(row) -> (start, end) in Python and the columns span reads
+class Period:
+    def __init__(self, model, key, start, end, span, columns):
+        self.model = model
+        self.key = key
+        self.start = start
+        self.end = end
+        self.span = span
+        self.columns = columns
+        self.index = IntervalIndex()
+        tracked[model] = self
+
+    def tsrange(self):
+        return func.tsrange(self.start, self.end, literal_column("'[]'"))
+
+    # SQL filter; PostgreSQL gets range operators so the GiST index is used
+    def filter(self, db: Session, mode: str, start: datetime, end: datetime):
+        if db.bind.dialect.name == "postgresql":
+            query_range = func.tsrange(start, end, literal_column("'[]'"))
+            return self.tsrange().op("<@" if mode == "within" else "&&")(query_range)
+        if mode == "within":
+            return (self.start >= start) & (self.end <= end)
+        return (self.start <= end) & (self.end >= start)
+
+    # Rows in range ordered by start; base narrows the rows (e.g. one user's), limit caps the result
+    def query(self, db: Session, mode: str, start: datetime, end: datetime, base=None, limit: int = None):
+        base = base if base is not None else db.query(self.model)
+        if db.bind.dialect.name == "postgresql":
+            query = base.filter(self.filter(db, mode, start, end)).order_by(self.start, self.key)
+            return (query.limit(limit) if limit else query).all()
+
+        if not self.index.loaded:
+            self.index.build(
+                (getattr(row, self.key.key), *self.span(row))
+                for row in db.query(self.model).options(load_only(self.key, *self.columns)).yield_per(10000)
+            )
+
+        # Keys come in start order, so batches are loaded only until limit rows match.
+        # The index only narrows candidates; the rows as loaded decide
+        keys = self.index.search(mode, start, end)
+        rows = []
+        for i in range(0, len(keys), 500):
+            rows += [row for row in base.filter(self.key.in_(keys[i:i + 500])).all() if matches(mode, self.span(row), start, end)]
+            if limit and len(rows) >= limit:
+                break
+
+        rows.sort(key=lambda row: (self.span(row)[0], getattr(row, self.key.key)))
+        return rows[:limit] if limit else rows
+
+# Keep in-process indexes in step with committed writes
+tracked = {}
+
+@event.listens_for(Session, "after_flush")
+def collect_interval_changes(session, flush_context):
+    changes = session.info.setdefault("interval_changes", [])
+    for obj in session.new | session.dirty:
+        period = tracked.get(type(obj))
+        if period is not None:
+            changes.append((period, getattr(obj, period.key.key), period.span(obj)))
+    for obj in session.deleted:
+        period = tracked.get(type(obj))
+        if period is not None:
+            changes.append((period, getattr(obj, period.key.key), None))
+
+@event.listens_for(Session, "after_commit")
+def apply_interval_changes(session):
+    for period, key, span in session.info.pop("interval_changes", []):
+        if not period.index.loaded:
+            continue
+        if span is None:
+            period.index.remove(key)
+        else:
+            period.index.add(key, *span)
+
+@event.listens_for(Session, "after_soft_rollback")
+def discard_interval_changes(session, previous_transaction):
+    session.info.pop("interval_changes", None)
+
+# Trip spans startDate..endDate, a trip without endDate is a single instant
+trip_period = Period(
+    Trip, Trip.idTrip, Trip.startDate, func.coalesce(Trip.endDate, Trip.startDate),
+    lambda trip: (trip.startDate, trip.endDate or trip.startDate), [Trip.startDate, Trip.endDate]
+)
+
+# A booking is the instant it is booked for
+booking_period = Period(
+    Booking, Booking.idBooking, Booking.date, Booking.date,
+    lambda booking: (booking.date, booking.date), [Booking.date]
+)
+
+# A stop spans startTime..endTime, a stop without endTime is a single instant
+detail_period = Period(
+    DetailInformation, DetailInformation.idDetail, DetailInformation.startTime,
+    func.coalesce(DetailInformation.endTime, DetailInformation.startTime),
+    lambda detail: (detail.startTime, detail.endTime or detail.startTime),
+    [DetailInformation.startTime, DetailInformation.endTime]
+)
@@ -0,0 +1,84 @@
+from bisect import insort
+from threading import Lock
+import heapq
+import os
+import time
+
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "100"))
+LEADERBOARD_TTL = int(os.getenv("LEADERBOARD_TTL", "600"))
+# Bayesian average: every trip starts with PRIOR_COUNT reviews of PRIOR_MEAN,
+# so one 5-star review doesn't outrank a hundred 4.8s
+LEADERBOARD_PRIOR_COUNT = float(os.getenv("LEADERBOARD_PRIOR_COUNT", "5"))
+LEADERBOARD_PRIOR_MEAN = float(os.getenv("LEADERBOARD_PRIOR_MEAN", "3"))
+
+def trip_score(count: int, total: int):
+    return (LEADERBOARD_PRIOR_COUNT * LEADERBOARD_PRIOR_MEAN + total) / (LEADERBOARD_PRIOR_COUNT + count)
+
+# Top trips by score, globally (scope None) and per province of the trip's places.
+# Each scope keeps its best `size` entries sorted as (-score, -count, idTrip); an update only
+# rescans a scope when one of its top entries drops below the rest.
+class TripLeaderboard:
+    def __init__(self, size: int = LEADERBOARD_SIZE, ttl: int = LEADERBOARD_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._lock = Lock()
+        self._built_at = None
+        self._ratings = {}    # idTrip -> (count, total)
+        self._provinces = {}  # idTrip -> provinces
+        self._members = {}    # province -> idTrips
+        self._top = {}        # scope -> sorted keys
+
+    # Rebuilt after ttl so other workers' reviews and changed trip places show up
+    @property
+    def loaded(self):
+        return self._built_at is not None and time.time() - self._built_at < self.ttl
+
+    def _key(self, idTrip: str):
+        count, total = self._ratings[idTrip]
+        return (-trip_score(count, total), -count, idTrip)
+
+    def _rank(self, scope):
+        trips = self._ratings if scope is None else self._members.get(scope, ())
+        return heapq.nsmallest(self.size, (self._key(idTrip) for idTrip in trips if idTrip in self._ratings))
+
+    # ratings: (idTrip, count, total), provinces: (idTrip, province)
+    def build(self, ratings, provinces):
+        with self._lock:
+            self._ratings = {idTrip: (count, total) for idTrip, count, total in ratings if count}
+            self._provinces, self._members = {}, {}
+            for idTrip, province in provinces:
+                if province:
+                    self._provinces.setdefault(idTrip, set()).add(province)
+                    self._members.setdefault(province, set()).add(idTrip)
+            self._top = {scope: self._rank(scope) for scope in [None, *self._members]}
+            self._built_at = time.time()
+
+    def update(self, idTrip: str, count: int, total: int):
+        with self._lock:
+            if count:
+                self._ratings[idTrip] = (count, total)
+            else:
+                self._ratings.pop(idTrip, None)
+
+            for scope in [None, *self._provinces.get(idTrip, ())]:
+                top = self._top.setdefault(scope, [])
+                old = next((i for i, key in enumerate(top) if key[2] == idTrip), None)
+                if old is not None:
+                    del top[old]
+                    # A top entry that got worse may now rank below trips outside the list
+                    if len(top) + 1 >= self.size:
+                        self._top[scope] = self._rank(scope)
+                        continue
+                if count:
+                    key = self._key(idTrip)
+                    if len(top) < self.size or key < top[-1]:
+                        insort(top, key)
+                        del top[self.size:]
+
+    # [(idTrip, count, total, score)], best first
+    def top(self, province: str = None, limit: int = 10):
+        with self._lock:
+            return [(idTrip, -negcount, self._ratings[idTrip][1], -negscore)
+                    for negscore, negcount, idTrip in self._top.get(province, [])[:limit]]
+
+trip_leaderboard = TripLeaderboard()
@@ -0,0 +1,26 @@
+from sqlalchemy.orm import joinedload
+from models.user import User
+from models.trip import Trip
+from models.place import Place
+from models.booking import Booking
+# Building an option configures every mapper, so each model their relationships
+# name (classes and secondary tables) has to be imported first
+from models import ai_recommendation, detail_booking, detail_information, friend, notification, review, trip_member
+
+# Loader options per endpoint, so the parent and the relationship it
+# returns come back in a single query instead of parent + lazy load
+USER_TRIPS = [joinedload(User.trips)]
+USER_BOOKINGS = [joinedload(User.bookings)]
+USER_FRIEND_REQUESTS_OF = [joinedload(User.sent_friends)]
+USER_FRIEND_REQUESTS_TO = [joinedload(User.received_friends)]
+USER_REVIEWED_TRIPS = [joinedload(User.reviewed)]
+
+TRIP_MEMBERS = [joinedload(Trip.members)]
+TRIP_REVIEWERS = [joinedload(Trip.reviewed_by)]
+TRIP_PLACES = [joinedload(Trip.place_contain)]
+
+PLACE_BOOKINGS = [joinedload(Place.books)]
+PLACE_TRIPS = [joinedload(Place.trip_belong)]
+
+BOOKING_OWNERS = [joinedload(Booking.owner_booking)]
+BOOKING_PLACE = [joinedload(Booking.place)]
@@ -1,7 +1,18 @@
 from fastapi import FastAPI
-from controllers import review_ctrl, trip_ctrl, trip_member_ctrl, user_ctrl, auth_ctrl, booking_ctrl, notification_ctrl, friend_ctrl, ai_recommendation_ctrl, detail_information_ctrl, place_ctrl, detail_booking_ctrl, social_auth_ctrl, conversation_ctrl, message_ctrl
+from fastapi.datastructures import Default
+from query_counter import QUERY_BUDGET_ENFORCE, enforce_query_budget
+from serialization import FastJSONResponse
+from compression import CompressionMiddleware
+from controllers import review_ctrl, trip_ctrl, trip_member_ctrl, user_ctrl, auth_ctrl, booking_ctrl, notification_ctrl, friend_ctrl, ai_recommendation_ctrl, detail_information_ctrl, place_ctrl, detail_booking_ctrl, social_auth_ctrl, conversation_ctrl, message_ctrl, internal_ctrl
 
-app = FastAPI()
+# Wrapped in Default so endpoints with a response_model keep FastAPI's direct
+# pydantic-to-JSON path; only plain dict/list results are rendered by orjson
+app = FastAPI(default_response_class=Default(FastJSONResponse))
+app.add_middleware(CompressionMiddleware)
+
+# Test mode: fail requests that run more queries than their declared budget
+if QUERY_BUDGET_ENFORCE:
+    app.middleware("http")(enforce_query_budget)
 
 app.include_router(auth_ctrl.router, prefix="/api/v1", tags=["auth"])
 app.include_router(social_auth_ctrl.router, prefix="/api/v1", tags=["auth"])
@@ -17,4 +28,5 @@ app.include_router(booking_ctrl.router, prefix="/api/v1", tags=["bookings"])
 app.include_router(detail_booking_ctrl.router, prefix="/api/v1", tags=["detail_bookings"])
 app.include_router(ai_recommendation_ctrl.router, prefix="/api/v1", tags=["ai_recommendations"])
 app.include_router(conversation_ctrl.router, prefix="/api/v1", tags=["conversations"])
-app.include_router(message_ctrl.router, prefix="/api/v1", tags=["messages"])
\ No newline at end of file
+app.include_router(message_ctrl.router, prefix="/api/v1", tags=["messages"])
+app.include_router(internal_ctrl.router, prefix="/api/v1", tags=["internal"])
\ No newline at end of file
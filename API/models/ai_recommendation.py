@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, String, Text, ForeignKey
 from database import Base
 from sqlalchemy.orm import relationship
 
@@ -7,7 +7,7 @@ class AIRecommendation(Base):
 
     idAIRec = Column(String(6), primary_key=True, index=True)
     idUser = Column(String(6), ForeignKey("Users.idUser"), index=True)
-    input = Column(String(1000))
-    output = Column(String(1000))
+    input = Column(Text)
+    output = Column(Text)
     
     owner_ai_rec = relationship("User", back_populates="ai_recs")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, func, literal_column
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -13,4 +13,7 @@ class Booking(Base):
     
     owner_booking = relationship("User", secondary="DetailBookings", back_populates="bookings")
     
-    place = relationship("Place", back_populates="books")
\ No newline at end of file
+    place = relationship("Place", back_populates="books")
+
+# Range queries (&&, <@) on PostgreSQL; same expression as intervals.booking_period
+Index("ix_bookings_period", func.tsrange(Booking.date, Booking.date, literal_column("'[]'")), postgresql_using="gist").ddl_if(dialect="postgresql")
\ No newline at end of file
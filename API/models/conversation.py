@@ -1,8 +1,11 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Text, Integer, ForeignKey, Index
+from sqlalchemy import Column, String, DateTime, Boolean, Text, Integer, ForeignKey, Index, JSON
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
+
+# JSONB on PostgreSQL, plain JSON elsewhere (e.g. the sqlite test database)
+JSONData = JSON().with_variant(JSONB(), "postgresql")
 import uuid
 
 Base = declarative_base()
@@ -16,7 +19,8 @@ class Conversation(Base):
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_archived = Column(Boolean, nullable=False, default=False)
-    metadata = Column(JSONB)
+    meta = Column("metadata", JSONData)  # "metadata" is reserved on declarative models
+    message_version = Column(Integer, nullable=False, default=0, server_default="0")  # bumped by every message write
     
     # Relationship với messages
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
@@ -29,7 +33,7 @@ class Conversation(Base):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'is_archived': self.is_archived,
-            'metadata': self.metadata
+            'metadata': self.meta
         }
 
 class Message(Base):
@@ -40,7 +44,7 @@ class Message(Base):
     content = Column(Text, nullable=False)
     role = Column(String, nullable=False)  # 'user' hoặc 'assistant'
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
-    metadata = Column(JSONB)
+    meta = Column("metadata", JSONData)
     token_count = Column(Integer, nullable=False, default=0)
     
     # Relationship với conversation
@@ -53,7 +57,7 @@ class Message(Base):
             'content': self.content,
             'role': self.role,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'metadata': self.metadata,
+            'metadata': self.meta,
             'token_count': self.token_count
         }
 
@@ -62,3 +66,4 @@ Index('idx_conversations_user_id', Conversation.user_id)
 Index('idx_conversations_created_at', Conversation.created_at)
 Index('idx_messages_conversation_id', Message.conversation_id)
 Index('idx_messages_created_at', Message.created_at)
+Index('idx_messages_conversation_created', Message.conversation_id, Message.created_at.desc())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, func, literal_column
 from database import Base
 
 class DetailInformation(Base):
@@ -11,4 +11,7 @@ class DetailInformation(Base):
     startTime = Column(DateTime)
     endTime = Column(DateTime)
     note = Column(String(1000))
+
+# Range queries (&&, <@) on PostgreSQL; same expression as intervals.detail_period
+Index("ix_details_period", func.tsrange(DetailInformation.startTime, func.coalesce(DetailInformation.endTime, DetailInformation.startTime), literal_column("'[]'")), postgresql_using="gist").ddl_if(dialect="postgresql")
     
\ No newline at end of file
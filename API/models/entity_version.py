@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, Integer, DateTime
+from database import Base
+
+# Change counter of a catalog (places, trips, ...), bumped in the writing transaction
+class EntityVersion(Base):
+    __tablename__ = "EntityVersions"
+
+    name = Column(String(20), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updatedAt = Column(DateTime, nullable=False)
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, String, Integer
+from database import Base
+
+# Next free value of each ID prefix, reserved in blocks by id_allocator
+class IdSequence(Base):
+    __tablename__ = "IdSequences"
+
+    prefix = Column(String(2), primary_key=True)
+    nextValue = Column(Integer, nullable=False, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey
+from sqlalchemy import Column, String, Boolean, ForeignKey, Index
 from database import Base
 from sqlalchemy.orm import relationship
 
@@ -10,4 +10,7 @@ class Notification(Base):
     content = Column(String(1000))
     isRead = Column(Boolean)
     
-    owner_notify = relationship("User", back_populates="notifies")
\ No newline at end of file
+    owner_notify = relationship("User", back_populates="notifies")
+
+# Serves unread lookups and counts per user
+Index("ix_notifications_user_read", Notification.idUser, Notification.isRead)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, Float, BigInteger, Index
 from database import Base
 from sqlalchemy.orm import relationship
 
@@ -16,7 +16,14 @@ class Place(Base):
     image = Column(String(1000))  # URL
     rating = Column(Integer)
     type = Column(Integer)
+    searchText = Column(String(2500))  # Folded name/city/province/country/address for search
+    latitude = Column(Float)
+    longitude = Column(Float)
+    geoCell = Column(BigInteger, index=True)  # Z-order cell of (latitude, longitude), see geo.py
     
     books = relationship("Booking", back_populates="place", cascade="all, delete-orphan")
     
-    trip_belong = relationship("Trip", secondary="DetailInformations", back_populates="place_contain", cascade="all, delete")
\ No newline at end of file
+    trip_belong = relationship("Trip", secondary="DetailInformations", back_populates="place_contain", cascade="all, delete")
+
+# Trigram index for search on PostgreSQL (requires: CREATE EXTENSION pg_trgm)
+Index("ix_places_search_trgm", Place.searchText, postgresql_using="gin", postgresql_ops={"searchText": "gin_trgm_ops"})
\ No newline at end of file
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, Integer, Date, ForeignKey
+from database import Base
+
+# Bookable units of a place on one day; reserved counts pending and confirmed bookings
+class PlaceInventory(Base):
+    __tablename__ = "PlaceInventories"
+
+    idPlace = Column(String(6), ForeignKey("Places.idPlace"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    capacity = Column(Integer, nullable=False)
+    reserved = Column(Integer, nullable=False, default=0)
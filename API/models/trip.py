@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Index, func, literal_column
 from sqlalchemy.orm import relationship 
 from database import Base
 # from models.trip_member import TripMember
@@ -16,3 +16,6 @@ class Trip(Base):
     reviewed_by = relationship("User", secondary="Reviews", back_populates="reviewed", cascade="all, delete")
     
     place_contain = relationship("Place", secondary="DetailInformations", back_populates="trip_belong", cascade="all, delete")
+
+# Range queries (&&, <@) on PostgreSQL; same expression as intervals.trip_period
+Index("ix_trips_period", func.tsrange(Trip.startDate, func.coalesce(Trip.endDate, Trip.startDate), literal_column("'[]'")), postgresql_using="gist").ddl_if(dialect="postgresql")
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, Integer, ForeignKey
+from database import Base
+
+# Review aggregate of a trip, kept in step by review_repo
+class TripRating(Base):
+    __tablename__ = "TripRatings"
+
+    idTrip = Column(String(6), ForeignKey("Trips.idTrip"), primary_key=True)
+    reviewCount = Column(Integer, nullable=False, default=0)
+    ratingSum = Column(Integer, nullable=False, default=0)
+    star1 = Column(Integer, nullable=False, default=0)
+    star2 = Column(Integer, nullable=False, default=0)
+    star3 = Column(Integer, nullable=False, default=0)
+    star4 = Column(Integer, nullable=False, default=0)
+    star5 = Column(Integer, nullable=False, default=0)
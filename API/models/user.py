@@ -12,7 +12,8 @@ class User(Base):
     gender = Column(Integer, nullable=True)
     email = Column(String(50), unique=True, nullable=True, index=True)
     phoneNumber = Column(String(10), nullable=True, index=True)
-    avatar = Column(LargeBinary, nullable=True)
+    avatarHash = Column(String(64), nullable=True)  # sha256 of the avatar in the blob store
+    avatarLink = Column("avatar", LargeBinary, nullable=True)  # pre-blob-store avatar: an image URL, served until migrated
     theme = Column(Integer, nullable=True)
     language = Column(Integer, nullable=True)
     
@@ -23,10 +24,18 @@ class User(Base):
         secondary="Friends",
         primaryjoin="User.idUser == Friend.idSelf",
         secondaryjoin="User.idUser == Friend.idFriend",
-        backref="received_friends",
+        back_populates="received_friends",
         cascade="all, delete"
     )
     
+    received_friends = relationship(
+        "User",
+        secondary="Friends",
+        primaryjoin="User.idUser == Friend.idFriend",
+        secondaryjoin="User.idUser == Friend.idSelf",
+        back_populates="sent_friends"
+    )
+    
     notifies = relationship("Notification", back_populates="owner_notify", cascade="all, delete-orphan")
     
     trips = relationship("Trip", secondary="TripMembers", back_populates="members", cascade="all, delete")
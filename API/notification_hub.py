@@ -0,0 +1,125 @@
+from collections import deque
+from threading import Lock
+from cache import TTLCache
+from serialization import dumps
+import asyncio
+import itertools
+import os
+import uuid
+
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "100"))
+NOTIFY_BUFFER_SIZE = int(os.getenv("NOTIFY_BUFFER_SIZE", "100"))
+NOTIFY_HEARTBEAT = int(os.getenv("NOTIFY_HEARTBEAT", "15"))
+
+# One connected stream; events are pushed on its own event loop
+class Subscriber:
+    def __init__(self, loop, maxsize: int):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def push(self, event):
+        # Slow client: stop queueing, it resumes from Last-Event-ID after reconnecting
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+# In-process pub/sub with a short replay buffer per channel.
+# A Redis-backed hub only needs the same publish/subscribe/unsubscribe/replay methods.
+class InMemoryHub:
+    def __init__(self, queue_size: int = NOTIFY_QUEUE_SIZE, buffer_size: int = NOTIFY_BUFFER_SIZE):
+        self.id = uuid.uuid4().hex[:8]
+        self.queue_size = queue_size
+        self.buffer_size = buffer_size
+        self._seq = itertools.count(1)
+        self._lock = Lock()
+        self._subscribers = {}  # channel -> set of Subscriber
+        self._buffers = TTLCache(maxsize=100000, ttl=3600)  # channel -> [deque of (seq, data), last evicted seq]
+
+    def event_id(self, seq: int):
+        return f"{self.id}-{seq}"
+
+    # Safe to call from worker threads
+    def publish(self, channel: str, data: dict):
+        with self._lock:
+            seq = next(self._seq)
+            buffer = self._buffers.get(channel)
+            if buffer is None:
+                buffer = [deque(), 0]
+                self._buffers.set(channel, buffer)
+            if len(buffer[0]) >= self.buffer_size:
+                buffer[1] = buffer[0].popleft()[0]
+            buffer[0].append((seq, data))
+            subscribers = list(self._subscribers.get(channel, ()))
+
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber.push, (seq, data))
+        return self.event_id(seq)
+
+    # Must be called on the event loop that will consume the stream
+    def subscribe(self, channel: str):
+        subscriber = Subscriber(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel: str, subscriber: Subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    # Events after last_event_id, or None when they can no longer be served from the buffer
+    def replay(self, channel: str, last_event_id: str):
+        hub_id, _, seq = last_event_id.partition("-")
+        if hub_id != self.id or not seq.isdigit():
+            return None
+
+        seq = int(seq)
+        with self._lock:
+            # No buffer: either nothing was published or it was evicted, so let the caller fall back
+            buffer = self._buffers.get(channel)
+            if buffer is None or seq < buffer[1]:
+                return None
+            return [event for event in buffer[0] if event[0] > seq]
+
+def format_event(data: dict, event_id: str = None, event: str = "notification"):
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}event: {event}\ndata: {dumps(data)}\n\n"
+
+# Server-Sent Events stream for one channel
+async def stream_events(hub: InMemoryHub, channel: str, last_event_id: str = None, backlog: list = ()):
+    subscriber = hub.subscribe(channel)
+    try:
+        last_seq = 0
+        for data in backlog:
+            yield format_event(data)
+
+        replayed = hub.replay(channel, last_event_id) if last_event_id else None
+        for seq, data in replayed or []:
+            last_seq = seq
+            yield format_event(data, hub.event_id(seq))
+
+        while True:
+            if subscriber.overflowed and subscriber.queue.empty():
+                break
+            try:
+                seq, data = await asyncio.wait_for(subscriber.queue.get(), NOTIFY_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+
+            # Already sent during replay
+            if seq <= last_seq:
+                continue
+            last_seq = seq
+            yield format_event(data, hub.event_id(seq))
+    finally:
+        hub.unsubscribe(channel, subscriber)
+
+notification_hub = InMemoryHub()
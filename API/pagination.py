@@ -0,0 +1,62 @@
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_, DateTime
+from datetime import datetime
+from cache import TTLCache
+import base64
+import json
+import os
+
+# Cached totals for list endpoints, so COUNT(*) does not run on every page
+COUNT_CACHE_TTL = int(os.getenv("COUNT_CACHE_TTL", "30"))
+count_cache = TTLCache(maxsize=10000, ttl=COUNT_CACHE_TTL)
+
+# Opaque cursor tokens for keyset pagination
+def encode_cursor(*values):
+    raw = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+# Filter for rows strictly after the cursor position in (columns...) order
+def after_cursor(columns, cursor: str, descending: bool = False):
+    values = decode_cursor(cursor)
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise HTTPException(400, "Invalid cursor")
+
+    try:
+        values = [datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+                  for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+    clauses = []
+    for i, column in enumerate(columns):
+        ahead = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*[c == v for c, v in zip(columns[:i], values[:i])], ahead))
+    return or_(*clauses)
+
+# Order by (sort_key, pk) and page by cursor when given, else by offset
+def keyset_page(query, columns, limit: int, skip: int = 0, cursor: str = None, descending: bool = False):
+    if cursor:
+        query = query.filter(after_cursor(columns, cursor, descending))
+        skip = 0
+
+    order = [column.desc() if descending else column for column in columns]
+    return query.order_by(*order).offset(skip).limit(limit)
+
+# Cursor of the last row, or None when this is the last page
+def next_cursor(rows, limit: int, *keys):
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor(*[getattr(rows[-1], key) for key in keys])
+
+def set_next_cursor(response: Response, rows, limit: int, *keys):
+    cursor = next_cursor(rows, limit, *keys)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+    return rows
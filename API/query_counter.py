@@ -0,0 +1,67 @@
+from fastapi import Depends, Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+
+# Test mode: count SQL statements per request and fail requests over their budget
+QUERY_BUDGET_ENFORCE = os.getenv("QUERY_BUDGET_ENFORCE", "false").lower() in ("1", "true", "yes")
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+class QueryCount:
+    def __init__(self):
+        self.count = 0
+        self.budget = None
+        self.statements = []
+
+_current = ContextVar("query_count", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _current.get()
+    if counter is not None:
+        counter.count += 1
+        counter.statements.append(statement)
+
+@contextmanager
+def count_queries():
+    counter = QueryCount()
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
+
+# Statements run inside are not charged to the request's budget, e.g. the principal
+# lookup get_current_user does on a cache miss, which budgets don't account for
+@contextmanager
+def uncounted():
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+# Route dependency declaring how many statements the endpoint may run
+def query_budget(limit: int):
+    def set_budget():
+        counter = _current.get()
+        if counter is not None:
+            counter.budget = limit
+    return Depends(set_budget)
+
+async def enforce_query_budget(request: Request, call_next):
+    with count_queries() as counter:
+        response = await call_next(request)
+
+    if counter.budget is not None and counter.count > counter.budget:
+        raise QueryBudgetExceeded(
+            f"{request.method} {request.url.path} ran {counter.count} queries, budget is {counter.budget}:\n"
+            + "\n".join(counter.statements)
+        )
+
+    response.headers["X-Query-Count"] = str(counter.count)
+    return response
@@ -3,11 +3,12 @@ from models.ai_recommendation import AIRecommendation
 from schemas.ai_recommendation_schema import AIRecCreate
 from repositories import user_repo
 from fastapi import HTTPException
-import uuid
+from pagination import keyset_page
+from id_allocator import id_allocator
 
 # Get all AI recommendations
-def get_aiRec(db: Session, skip: int, limit: int):
-    return db.query(AIRecommendation).order_by(AIRecommendation.idAIRec).offset(skip).limit(limit).all()
+def get_aiRec(db: Session, skip: int, limit: int, cursor: str = None):
+    return keyset_page(db.query(AIRecommendation), [AIRecommendation.idAIRec], limit, skip, cursor).all()
 
 # Get AI recommendation by
 def get_aiRec_by_id(db: Session, idAIRec: str):
@@ -20,15 +21,13 @@ def get_aiRec_by_user(db: Session, idUser: str, skip: int, limit: int):
     return db.query(AIRecommendation).filter(AIRecommendation.idUser == idUser).order_by(AIRecommendation.idAIRec).offset(skip).limit(limit).all()
 
 # Post new AI recommendation
-def create_aiRec(db: Session, aiRecommendation: AIRecCreate):
+def create_aiRec(db: Session, aiRecommendation: AIRecCreate, output: str = ""):
     if not user_repo.get_user_by(db, "idUser", aiRecommendation.idUser):
         raise HTTPException(404, "User not found")
     
-    idAIRec = ""
-    while not idAIRec or get_aiRec_by_id(db, idAIRec):
-        idAIRec = f"AI{str(uuid.uuid4())[:4]}"
+    idAIRec = id_allocator.next_id("AI")
 
-    db_AIRecommendation = AIRecommendation(idAIRec = idAIRec, idUser = aiRecommendation.idUser, input = aiRecommendation.input, output = "")
+    db_AIRecommendation = AIRecommendation(idAIRec = idAIRec, idUser = aiRecommendation.idUser, input = aiRecommendation.input, output = output)
     db.add(db_AIRecommendation)
     db.commit()
     db.refresh(db_AIRecommendation)
@@ -5,8 +5,18 @@ from models.detail_booking import DetailBooking
 from schemas.booking_schema import BookingCreate, BookingUpdate
 from datetime import datetime, timedelta
 from fastapi import HTTPException
-from repositories import place_repo
-import uuid
+from repositories import place_repo, inventory_repo
+from sqlalchemy import update
+from id_allocator import id_allocator
+from intervals import booking_period
+import schedule
+import loader_profiles
+
+# Booking.status values; every status except FAILED holds a unit of the place's day
+PENDING, SUCCESS, FAILED = "0", "1", "2"
+
+def holds(status):
+    return str(status) != FAILED
 
 def get_bookings(db: Session, current_user: User):
     """
@@ -18,8 +28,15 @@ def get_bookings(db: Session, current_user: User):
         DetailBooking.idUser == current_user.idUser
     ).all()
 
-def get_booking_by_id(db: Session, idBooking: str):
-    return db.query(Booking).filter(Booking.idBooking == idBooking).first()
+# Bookings of the current user overlapping / within [start, end], ordered by date
+def get_bookings_in_range(db: Session, mode: str, start: datetime, end: datetime, current_user: User, limit: int = 100):
+    base_query = db.query(Booking).join(DetailBooking, Booking.idBooking == DetailBooking.idBooking).filter(
+        DetailBooking.idUser == current_user.idUser
+    )
+    return booking_period.query(db, mode, start, end, base=base_query, limit=limit)
+
+def get_booking_by_id(db: Session, idBooking: str, options: list = ()):
+    return db.query(Booking).options(*options).filter(Booking.idBooking == idBooking).first()
 
 def get_booking_by(db: Session, select: str, lookup: str, current_user: User):
     """
@@ -47,15 +64,15 @@ def get_booking_by(db: Session, select: str, lookup: str, current_user: User):
     else:
         raise HTTPException(400, "Bad Request: Invalid selection criteria")
     
-def get_owners_of_booking(db: Session, idBooking: str):
-    booking = get_booking_by_id(db, idBooking)
+def get_owners_of_booking(db: Session, idBooking: str, options: list = loader_profiles.BOOKING_OWNERS):
+    booking = get_booking_by_id(db, idBooking, options)
     if not booking:
         raise HTTPException(404, "Booking not found")
     
     return booking.owner_booking
         
-def get_place_of_booking(db: Session, idBooking: str):
-    booking = get_booking_by_id(db, idBooking)
+def get_place_of_booking(db: Session, idBooking: str, options: list = loader_profiles.BOOKING_PLACE):
+    booking = get_booking_by_id(db, idBooking, options)
     if not booking:
         raise HTTPException(404, "Booking not found")
     
@@ -66,9 +83,8 @@ def create_booking(db: Session, booking: BookingCreate, current_user: User):
     if not place_repo.get_place_by_id(db, booking.idPlace):
         raise HTTPException(status_code=404, detail="Place not found")
     
-    id_booking = ""
-    while not id_booking or get_booking_by_id(db, id_booking):
-        id_booking = f"BK{str(uuid.uuid4())[:4]}"
+    id_booking = id_allocator.next_id("BK")
+    schedule.check_booking(db, [current_user.idUser], id_booking, booking.date, booking.idPlace)
         
     # Tạo đối tượng Booking từ dữ liệu đầu vào
     db_booking = Booking(
@@ -78,59 +94,103 @@ def create_booking(db: Session, booking: BookingCreate, current_user: User):
         status=booking.status
     )
     
-    # Thêm booking vào database
-    db.add(db_booking)
-    db.commit()
-    db.refresh(db_booking)
-    
+    # Giữ chỗ, booking và DetailBooking trong cùng một transaction
+    if holds(booking.status):
+        inventory_repo.reserve(db, booking.idPlace, booking.date.date())
     
     detail_booking = DetailBooking(
         idBooking=id_booking,
         idUser=current_user.idUser
     )
     
+    db.add(db_booking)
     db.add(detail_booking)
     db.commit()
+    db.refresh(db_booking)
     
     return db_booking
 
-def update_booking(db: Session, id_booking: str, booking_update: BookingUpdate):
+def update_booking(db: Session, id_booking: str, booking_update: BookingUpdate, current_user: User):
     # Kiểm tra idPlace
     if not place_repo.get_place_by_id(db, booking_update.idPlace):
         raise HTTPException(status_code=404, detail="Place not found")
 
     # Cập nhật booking nếu kiểm tra thành công    
-    db_booking = db.query(Booking).filter(
-        Booking.idBooking == id_booking
-    ).first()
-    
-    if not db_booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
+    db_booking = _owned_booking(db, id_booking, current_user)
 
+    changes = booking_update.model_dump(exclude_unset=True)
+    schedule.check_booking(
+        db, schedule.booking_owners(db, id_booking), id_booking,
+        changes.get("date", db_booking.date), changes.get("idPlace", db_booking.idPlace)
+    )
+
+    # Chuyển chỗ đã giữ khi đổi ngày, địa điểm hoặc trạng thái
+    before = (db_booking.idPlace, db_booking.date.date() if db_booking.date else None, holds(db_booking.status))
+    
     # Cập nhật các trường
-    for key, value in booking_update.model_dump(exclude_unset=True).items():
+    for key, value in changes.items():
         setattr(db_booking, key, value)
+    
+    after = (db_booking.idPlace, db_booking.date.date() if db_booking.date else None, holds(db_booking.status))
+    if before != after:
+        if before[2] and before[1]:
+            inventory_repo.release(db, before[0], before[1])
+        if after[2] and after[1]:
+            inventory_repo.reserve(db, after[0], after[1])
         
     db.commit()
     db.refresh(db_booking)
     return db_booking
 
-def delete_booking(db: Session, id_booking: str):
+def delete_booking(db: Session, id_booking: str, current_user: User):
     # Xóa booking nếu kiểm tra thành công
-    db_booking = db.query(Booking).filter(
-        Booking.idBooking == id_booking
-    ).first()
-    
-    if not db_booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
+    db_booking = _owned_booking(db, id_booking, current_user)
     
+    if holds(db_booking.status) and db_booking.date:
+        inventory_repo.release(db, db_booking.idPlace, db_booking.date.date())
     db.delete(db_booking)
     db.commit()
     return db_booking
 
+# Pending -> success; the unit is already held
+def confirm_booking(db: Session, id_booking: str, current_user: User):
+    db_booking = _owned_booking(db, id_booking, current_user)
+    result = db.execute(
+        update(Booking).where(Booking.idBooking == id_booking, Booking.status == PENDING)
+        .values(status=SUCCESS).execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise HTTPException(409, "Booking is not pending")
+    
+    db.commit()
+    db.refresh(db_booking)
+    return db_booking
+
+# Cancel and give the unit back; the status guard makes a repeated release a no-op
+def release_booking(db: Session, id_booking: str, current_user: User):
+    db_booking = _owned_booking(db, id_booking, current_user)
+    result = db.execute(
+        update(Booking).where(Booking.idBooking == id_booking, Booking.status != FAILED)
+        .values(status=FAILED).execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1 and db_booking.date:
+        inventory_repo.release(db, db_booking.idPlace, db_booking.date.date())
+    
+    db.commit()
+    db.refresh(db_booking)
+    return db_booking
+
+def _owned_booking(db: Session, id_booking: str, current_user: User):
+    db_booking = db.query(Booking).join(DetailBooking, Booking.idBooking == DetailBooking.idBooking).filter(
+        Booking.idBooking == id_booking, DetailBooking.idUser == current_user.idUser
+    ).first()
+    if not db_booking:
+        raise HTTPException(404, "Booking not found")
+    return db_booking
+
 
-def get_bookings_by_user(db: Session, user_id: str):
+def get_bookings_by_user(db: Session, user_id: str, options: list = ()):
     """
     Lấy danh sách booking của một user cụ thể
     """
-    return db.query(Booking).join(Booking.owner_booking).filter(User.idUser == user_id).all()
\ No newline at end of file
+    return db.query(Booking).options(*options).join(Booking.owner_booking).filter(User.idUser == user_id).all()
\ No newline at end of file
@@ -1,43 +1,83 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, asc, and_, or_
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, asc, and_, or_, select, func, insert, update
 from typing import List, Optional, Dict, Any
-from API.models.conversation import Conversation, Message
-from API.schemas.conversation_schema import ConversationCreate, ConversationUpdate, MessageCreate
-from datetime import datetime
+from models.conversation import Conversation, Message
+from schemas.conversation_schema import ConversationCreate, ConversationUpdate, MessageCreate, MessageBatchItem
+from pagination import keyset_page, count_cache
+from cache import TTLCache
+from bisect import bisect_left
+from datetime import datetime, timedelta
+import os
+import uuid
 
-class ConversationRepository:
-    def __init__(self, db: Session):
+# Newest-message tail per conversation for context windows:
+# {"ids": [...oldest→newest], "prefix": [0, t1, t1+t2, ...], "complete": reached first message,
+#  "version": Conversation.message_version it was loaded at}
+# A hit is checked against message_version (one primary-key read), so writes from other workers are
+# seen right away; this worker's own writes extend the tail in place
+CONTEXT_CACHE_TOKENS = int(os.getenv("CONTEXT_CACHE_TOKENS", "32000"))
+context_cache = TTLCache(maxsize=10000, ttl=3600)
+
+# Bump message_version in the writing transaction; returns the new version, None without a conversation
+async def _bump_messages(db: AsyncSession, conversation_id: str, now: datetime):
+    return await db.scalar(
+        update(Conversation).where(Conversation.id == conversation_id)
+        .values(updated_at=now, message_version=Conversation.message_version + 1)
+        .returning(Conversation.message_version)
+        .execution_options(synchronize_session=False)
+    )
+
+# Extend the cached tail with this worker's write, or drop it if another write came in between
+def _extend_tail(conversation_id: str, version: int, rows):
+    tail = context_cache.get(conversation_id)
+    if tail is None:
+        return
+    if tail["version"] != version - 1:
+        context_cache.pop(conversation_id)
+        return
+    for id, token_count in rows:
+        tail["ids"].append(id)
+        tail["prefix"].append(tail["prefix"][-1] + token_count)
+    tail["version"] = version
+
+class AsyncConversationRepository:
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def create_conversation(self, conversation_data: ConversationCreate) -> Conversation:
+    async def create_conversation(self, conversation_data: ConversationCreate) -> Conversation:
         """Tạo cuộc trò chuyện mới"""
         conversation = Conversation(
             user_id=conversation_data.user_id,
             title=conversation_data.title,
-            metadata=conversation_data.metadata
+            meta=conversation_data.metadata
         )
         self.db.add(conversation)
-        self.db.commit()
-        self.db.refresh(conversation)
+        await self.db.commit()
+        await self.db.refresh(conversation)
+        count_cache.pop(("conversations", conversation.user_id))
         return conversation
 
-    def get_conversation_by_id(self, conversation_id: str, include_messages: bool = False) -> Optional[Conversation]:
+    async def get_conversation_by_id(self, conversation_id: str, include_messages: bool = False) -> Optional[Conversation]:
         """Lấy cuộc trò chuyện theo ID"""
-        query = self.db.query(Conversation)
+        query = select(Conversation).filter(Conversation.id == conversation_id)
         if include_messages:
-            query = query.options(joinedload(Conversation.messages))
-        return query.filter(Conversation.id == conversation_id).first()
+            query = query.options(selectinload(Conversation.messages))
+        result = await self.db.execute(query)
+        return result.scalars().first()
 
-    def get_conversations_by_user(
+    async def get_conversations_by_user(
         self, 
         user_id: str, 
         page: int = 1, 
         limit: int = 20,
         include_archived: bool = False,
-        search: Optional[str] = None
-    ) -> tuple[List[Conversation], int]:
-        """Lấy danh sách cuộc trò chuyện của user với phân trang"""
-        query = self.db.query(Conversation).filter(Conversation.user_id == user_id)
+        search: Optional[str] = None,
+        cursor: Optional[str] = None,
+        include_total: bool = True
+    ) -> tuple[List[Conversation], Optional[int]]:
+        """Lấy danh sách cuộc trò chuyện của user, phân trang theo cursor hoặc offset"""
+        query = select(Conversation).filter(Conversation.user_id == user_id)
         
         if not include_archived:
             query = query.filter(Conversation.is_archived == False)
@@ -45,100 +85,211 @@ class ConversationRepository:
         if search:
             query = query.filter(Conversation.title.ilike(f"%{search}%"))
         
-        # Đếm tổng số
-        total = query.count()
+        # Đếm tổng số (có cache); mọi bộ lọc của một user chung một key để xóa một lần
+        total = None
+        if include_total:
+            totals = count_cache.get(("conversations", user_id))
+            if totals is None:
+                totals = {}
+                count_cache.set(("conversations", user_id), totals)
+            total = totals.get((include_archived, search))
+            if total is None:
+                total = totals[(include_archived, search)] = await self.db.scalar(select(func.count()).select_from(query.subquery()))
         
-        # Phân trang và sắp xếp
-        conversations = query.order_by(desc(Conversation.updated_at))\
-                           .offset((page - 1) * limit)\
-                           .limit(limit)\
-                           .all()
+        # Phân trang và sắp xếp theo (updated_at, id)
+        result = await self.db.execute(keyset_page(
+            query, [Conversation.updated_at, Conversation.id], limit, (page - 1) * limit, cursor, descending=True
+        ))
         
-        return conversations, total
+        return result.scalars().all(), total
 
-    def update_conversation(self, conversation_id: str, update_data: ConversationUpdate) -> Optional[Conversation]:
+    async def update_conversation(self, conversation_id: str, update_data: ConversationUpdate) -> Optional[Conversation]:
         """Cập nhật cuộc trò chuyện"""
-        conversation = self.get_conversation_by_id(conversation_id)
+        conversation = await self.get_conversation_by_id(conversation_id)
         if not conversation:
             return None
         
         update_dict = update_data.dict(exclude_unset=True)
         for key, value in update_dict.items():
-            setattr(conversation, key, value)
+            setattr(conversation, "meta" if key == "metadata" else key, value)
         
         conversation.updated_at = datetime.utcnow()
-        self.db.commit()
-        self.db.refresh(conversation)
+        await self.db.commit()
+        await self.db.refresh(conversation)
+        count_cache.pop(("conversations", conversation.user_id))
         return conversation
 
-    def delete_conversation(self, conversation_id: str) -> bool:
+    async def delete_conversation(self, conversation_id: str) -> bool:
         """Xóa cuộc trò chuyện"""
-        conversation = self.get_conversation_by_id(conversation_id)
+        conversation = await self.get_conversation_by_id(conversation_id)
         if not conversation:
             return False
         
-        self.db.delete(conversation)
-        self.db.commit()
+        await self.db.delete(conversation)
+        await self.db.commit()
+        count_cache.pop(("conversations", conversation.user_id))
+        count_cache.pop(("messages", conversation_id))
+        context_cache.pop(conversation_id)
         return True
 
-    def archive_conversation(self, conversation_id: str) -> Optional[Conversation]:
+    async def archive_conversation(self, conversation_id: str) -> Optional[Conversation]:
         """Lưu trữ cuộc trò chuyện"""
-        return self.update_conversation(conversation_id, ConversationUpdate(is_archived=True))
+        return await self.update_conversation(conversation_id, ConversationUpdate(is_archived=True))
 
-class MessageRepository:
-    def __init__(self, db: Session):
+class AsyncMessageRepository:
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def create_message(self, message_data: MessageCreate) -> Message:
+    async def create_message(self, message_data: MessageCreate) -> Message:
         """Tạo tin nhắn mới"""
         message = Message(
             conversation_id=message_data.conversation_id,
             content=message_data.content,
             role=message_data.role,
-            metadata=message_data.metadata,
+            meta=message_data.metadata,
             token_count=message_data.token_count or 0
         )
         self.db.add(message)
         
         # Cập nhật thời gian updated_at của conversation
-        conversation = self.db.query(Conversation).filter(
-            Conversation.id == message_data.conversation_id
-        ).first()
-        if conversation:
-            conversation.updated_at = datetime.utcnow()
-        
-        self.db.commit()
-        self.db.refresh(message)
+        version = await _bump_messages(self.db, message_data.conversation_id, datetime.utcnow())
+        
+        await self.db.commit()
+        await self.db.refresh(message)
+        count_cache.pop(("messages", message.conversation_id))
+        if version is not None:
+            _extend_tail(message.conversation_id, version, [(message.id, message.token_count)])
         return message
 
-    def get_messages_by_conversation(
+    async def create_messages(self, conversation_id: str, items: List[MessageBatchItem]) -> Optional[List[str]]:
+        """Thêm nhiều tin nhắn trong một transaction, trả về danh sách id (None nếu không có conversation)"""
+        now = datetime.utcnow()
+        
+        # Cập nhật updated_at cũng là bước kiểm tra conversation tồn tại
+        version = await _bump_messages(self.db, conversation_id, now)
+        if version is None:
+            await self.db.rollback()
+            return None
+        
+        # Lệch 1µs mỗi tin nhắn để giữ đúng thứ tự theo (created_at, id)
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "conversation_id": conversation_id,
+                "content": item.content,
+                "role": item.role,
+                "created_at": now + timedelta(microseconds=i),
+                "meta": item.metadata,
+                "token_count": item.token_count or 0
+            }
+            for i, item in enumerate(items)
+        ]
+        await self.db.execute(insert(Message).values(rows))
+        await self.db.commit()
+        count_cache.pop(("messages", conversation_id))
+        _extend_tail(conversation_id, version, [(row["id"], row["token_count"]) for row in rows])
+        return [row["id"] for row in rows]
+
+    async def get_messages_by_conversation(
         self, 
         conversation_id: str,
         page: int = 1,
-        limit: int = 50
-    ) -> tuple[List[Message], int]:
-        """Lấy tin nhắn theo cuộc trò chuyện với phân trang"""
-        query = self.db.query(Message).filter(Message.conversation_id == conversation_id)
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        include_total: bool = True
+    ) -> tuple[List[Message], Optional[int]]:
+        """Lấy tin nhắn theo cuộc trò chuyện, phân trang theo cursor hoặc offset"""
+        query = select(Message).filter(Message.conversation_id == conversation_id)
         
-        total = query.count()
+        total = None
+        if include_total:
+            total = count_cache.get(("messages", conversation_id))
+            if total is None:
+                total = await self.db.scalar(select(func.count()).select_from(query.subquery()))
+                count_cache.set(("messages", conversation_id), total)
         
-        messages = query.order_by(asc(Message.created_at))\
-                       .offset((page - 1) * limit)\
-                       .limit(limit)\
-                       .all()
+        result = await self.db.execute(keyset_page(
+            query, [Message.created_at, Message.id], limit, (page - 1) * limit, cursor
+        ))
         
-        return messages, total
+        return result.scalars().all(), total
+
+    async def _load_tail(self, conversation_id: str, min_tokens: int, version: int) -> dict:
+        """Đi ngược từ tin nhắn mới nhất (index conversation_id, created_at DESC) đến khi đủ token"""
+        ids, counts, total = [], [], 0
+        cursor = None
+        while True:
+            query = select(Message.id, Message.created_at, Message.token_count)\
+                .filter(Message.conversation_id == conversation_id)\
+                .order_by(desc(Message.created_at), desc(Message.id))\
+                .limit(200)
+            if cursor:
+                query = query.filter(or_(
+                    Message.created_at < cursor[0],
+                    and_(Message.created_at == cursor[0], Message.id < cursor[1])
+                ))
+            rows = (await self.db.execute(query)).all()
+            
+            for row in rows:
+                ids.append(row.id)
+                counts.append(row.token_count)
+                total += row.token_count
+            
+            if len(rows) < 200:
+                complete = True
+                break
+            if total > min_tokens:
+                complete = False
+                break
+            cursor = (rows[-1].created_at, rows[-1].id)
+        
+        ids.reverse()
+        prefix = [0]
+        for count in reversed(counts):
+            prefix.append(prefix[-1] + count)
+        
+        tail = {"ids": ids, "prefix": prefix, "complete": complete, "version": version}
+        context_cache.set(conversation_id, tail)
+        return tail
+
+    async def get_context(self, conversation_id: str, max_tokens: int) -> Optional[List[Message]]:
+        """Lấy các tin nhắn mới nhất vừa với max_tokens, theo thứ tự thời gian"""
+        # Read before the messages: a write in between only makes the next hit reload
+        version = await self.db.scalar(select(Conversation.message_version).filter(Conversation.id == conversation_id))
+        if version is None:
+            return None
+        
+        tail = context_cache.get(conversation_id)
+        if tail is None or tail["version"] != version:
+            tail = await self._load_tail(conversation_id, max(max_tokens, CONTEXT_CACHE_TOKENS), version)
+        elif not tail["complete"] and tail["prefix"][-1] <= max_tokens:
+            tail = await self._load_tail(conversation_id, max_tokens, version)
+        
+        # Tin nhắn đầu tiên i sao cho tổng token từ i đến mới nhất <= max_tokens
+        total = tail["prefix"][-1]
+        start = bisect_left(tail["prefix"], total - max_tokens)
+        ids = tail["ids"][start:]
+        if not ids:
+            return []
+        
+        result = await self.db.execute(
+            select(Message).filter(Message.id.in_(ids)).order_by(asc(Message.created_at), asc(Message.id))
+        )
+        return result.scalars().all()
 
-    def get_message_by_id(self, message_id: str) -> Optional[Message]:
+    async def get_message_by_id(self, message_id: str) -> Optional[Message]:
         """Lấy tin nhắn theo ID"""
-        return self.db.query(Message).filter(Message.id == message_id).first()
+        return await self.db.get(Message, message_id)
 
-    def delete_message(self, message_id: str) -> bool:
+    async def delete_message(self, message_id: str) -> bool:
         """Xóa tin nhắn"""
-        message = self.get_message_by_id(message_id)
+        message = await self.get_message_by_id(message_id)
         if not message:
             return False
         
-        self.db.delete(message)
-        self.db.commit()
+        await self.db.delete(message)
+        await _bump_messages(self.db, message.conversation_id, datetime.utcnow())
+        await self.db.commit()
+        count_cache.pop(("messages", message.conversation_id))
+        context_cache.pop(message.conversation_id)
         return True
@@ -1,13 +1,26 @@
 from sqlalchemy.orm import Session 
 from models.detail_information import DetailInformation
+from models.place import Place
 from schemas.detail_information_schema import DetailCreate, DetailUpdate
-import uuid
+from id_allocator import id_allocator
+from http_cache import bump
 from repositories import place_repo, trip_repo
 from fastapi import HTTPException
 from datetime import datetime, timedelta
+from pagination import keyset_page
+from route_optimizer import distance_matrix, optimize_route, route_length, schedule as timetable
+from intervals import detail_period
+import schedule
+import numpy as np
 
-def get_details(db: Session, skip: int, limit: int):
-    return db.query(DetailInformation).order_by(DetailInformation.idDetail).offset(skip).limit(limit).all()
+def get_details(db: Session, skip: int, limit: int, cursor: str = None):
+    return keyset_page(db.query(DetailInformation), [DetailInformation.idDetail], limit, skip, cursor).all()
+
+def get_details_in_range(db: Session, mode: str, start: datetime, end: datetime, idTrip: str = None, limit: int = 100):
+    base_query = db.query(DetailInformation)
+    if idTrip:
+        base_query = base_query.filter(DetailInformation.idTrip == idTrip)
+    return detail_period.query(db, mode, start, end, base=base_query, limit=limit)
 
 # Get detail information by id
 def get_detail_information_by_id(db: Session, id: str):
@@ -41,9 +54,8 @@ def post_detail_information(db: Session, detail: DetailCreate):
     if not trip_repo.get_trip_by_id(db, detail.idTrip):
         raise HTTPException(404, "Trip not found")
     
-    idDetail = ""
-    while not idDetail or get_detail_information_by_id(db, idDetail):
-        idDetail = f"DI{str(uuid.uuid4())[:4]}"
+    idDetail = id_allocator.next_id("DI")
+    schedule.check_detail(db, idDetail, detail.idTrip, detail.startTime, detail.endTime, detail.idPlace)
     
     new_detail = DetailInformation(
         idDetail = idDetail,
@@ -55,6 +67,7 @@ def post_detail_information(db: Session, detail: DetailCreate):
     )
     
     db.add(new_detail)
+    bump(db, "details")
     db.commit()
     db.refresh(new_detail)
     return new_detail
@@ -70,14 +83,74 @@ def update_detail_information(db: Session, id: str, detail: DetailUpdate):
     db_detail = get_detail_information_by_id(db, id)
     if not db_detail:
         raise HTTPException(404, "Detail information not found")
+    
+    changes = detail.model_dump(exclude_unset=True)
+    schedule.check_detail(
+        db, id, changes.get("idTrip", db_detail.idTrip),
+        changes.get("startTime", db_detail.startTime), changes.get("endTime", db_detail.endTime),
+        changes.get("idPlace", db_detail.idPlace)
+    )
      
-    for key, value in detail.model_dump(exclude_unset=True).items():
+    for key, value in changes.items():
         setattr(db_detail, key, value)
+    bump(db, "details")
     
     db.commit()
     db.refresh(db_detail)
     return db_detail
 
+# Reorder the stops of a trip by travel distance and re-time them; fixed stops keep their startTime
+def optimize_trip(db: Session, idTrip: str, fixed: list = (), speed: float = 30):
+    trip = trip_repo.get_trip_by_id(db, idTrip)
+    if not trip:
+        raise HTTPException(404, "Trip not found")
+    
+    rows = db.query(DetailInformation, Place.latitude, Place.longitude)\
+        .join(Place, Place.idPlace == DetailInformation.idPlace)\
+        .filter(DetailInformation.idTrip == idTrip)\
+        .order_by(DetailInformation.startTime, DetailInformation.idDetail).all()
+    if not rows:
+        raise HTTPException(404, "Trip has no places")
+    
+    if any(lat is None or lon is None for _, lat, lon in rows):
+        raise HTTPException(400, "Every place of the trip needs coordinates")
+    
+    details = [detail for detail, _, _ in rows]
+    if set(fixed) - {detail.idDetail for detail in details}:
+        raise HTTPException(400, "Fixed stops must belong to the trip")
+    
+    # Minutes from the first stop, which stays where it is
+    origin = details[0].startTime or trip.startDate
+    durations = np.array([
+        (detail.endTime - detail.startTime).total_seconds() / 60 if detail.startTime and detail.endTime else 0.0
+        for detail in details
+    ])
+    fixed_starts = np.array([
+        (detail.startTime - origin).total_seconds() / 60 if detail.idDetail in fixed and detail.startTime else np.nan
+        for detail in details
+    ])
+    
+    dist = distance_matrix([lat for _, lat, _ in rows], [lon for _, _, lon in rows])
+    travel = dist / speed * 60
+    order = optimize_route(dist, travel, durations, fixed_starts if fixed else None)
+    starts, late = timetable(order, travel, durations, fixed_starts)
+    
+    for position, stop in enumerate(order):
+        detail = details[stop]
+        detail.startTime = origin + timedelta(seconds=round(starts[position] * 60))
+        detail.endTime = detail.startTime + timedelta(seconds=round(durations[stop] * 60))
+    bump(db, "details")
+    
+    db.commit()
+    
+    return {
+        "idTrip": idTrip,
+        "distanceBefore": route_length(dist, list(range(len(details)))),
+        "distanceAfter": route_length(dist, order),
+        "lateMinutes": late,
+        "details": [details[stop] for stop in order]
+    }
+
 # Delete detail information
 def delete_detail_information(db: Session, id: str):
     # Check if IDDetail exists
@@ -86,5 +159,6 @@ def delete_detail_information(db: Session, id: str):
         raise HTTPException(404, "Detail information not found")
     
     db.delete(db_detail)
+    bump(db, "details")
     db.commit()
     return db_detail
@@ -0,0 +1,75 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from models.place_inventory import PlaceInventory
+from fastapi import HTTPException
+from datetime import date, timedelta
+import os
+
+BOOKING_DEFAULT_CAPACITY = int(os.getenv("BOOKING_DEFAULT_CAPACITY", "100"))
+MAX_AVAILABILITY_DAYS = 366
+
+# Create the day's row with the default capacity if it is missing; a concurrent insert wins
+def _ensure_day(db: Session, idPlace: str, day: date):
+    if db.get(PlaceInventory, (idPlace, day)) is not None:
+        return
+    try:
+        with db.begin_nested():
+            db.add(PlaceInventory(idPlace=idPlace, day=day, capacity=BOOKING_DEFAULT_CAPACITY, reserved=0))
+    except IntegrityError:
+        pass
+
+# Take count units in the caller's transaction. The conditional UPDATE locks the row and
+# re-checks capacity, so concurrent reservations can't oversell; nothing is committed here.
+def reserve(db: Session, idPlace: str, day: date, count: int = 1):
+    _ensure_day(db, idPlace, day)
+    result = db.execute(
+        update(PlaceInventory)
+        .where(PlaceInventory.idPlace == idPlace, PlaceInventory.day == day,
+               PlaceInventory.reserved + count <= PlaceInventory.capacity)
+        .values(reserved=PlaceInventory.reserved + count)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise HTTPException(409, "Place is fully booked on this day")
+
+def release(db: Session, idPlace: str, day: date, count: int = 1):
+    db.execute(
+        update(PlaceInventory)
+        .where(PlaceInventory.idPlace == idPlace, PlaceInventory.day == day, PlaceInventory.reserved >= count)
+        .values(reserved=PlaceInventory.reserved - count)
+        .execution_options(synchronize_session=False)
+    )
+
+def get_availability(db: Session, idPlace: str, start: date, end: date):
+    if end < start or (end - start).days >= MAX_AVAILABILITY_DAYS:
+        raise HTTPException(400, f"end must be within {MAX_AVAILABILITY_DAYS} days after start")
+
+    rows = {
+        row.day: row for row in db.query(PlaceInventory).filter(
+            PlaceInventory.idPlace == idPlace, PlaceInventory.day >= start, PlaceInventory.day <= end
+        )
+    }
+    result = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        row = rows.get(day)
+        capacity, reserved = (row.capacity, row.reserved) if row else (BOOKING_DEFAULT_CAPACITY, 0)
+        result.append({"day": day, "capacity": capacity, "reserved": reserved, "available": max(capacity - reserved, 0)})
+    return result
+
+# Capacity can't drop below what is already reserved; checked in the UPDATE, like reserve
+def set_capacity(db: Session, idPlace: str, day: date, capacity: int):
+    _ensure_day(db, idPlace, day)
+    result = db.execute(
+        update(PlaceInventory)
+        .where(PlaceInventory.idPlace == idPlace, PlaceInventory.day == day, PlaceInventory.reserved <= capacity)
+        .values(capacity=capacity)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        raise HTTPException(409, "Capacity is below the units already reserved on this day")
+    db.commit()
+    row = db.get(PlaceInventory, (idPlace, day), populate_existing=True)
+    return {"day": day, "capacity": row.capacity, "reserved": row.reserved, "available": max(row.capacity - row.reserved, 0)}
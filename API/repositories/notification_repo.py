@@ -1,13 +1,22 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 from models.notification import Notification
-from schemas.notification_schema import NotificationUpdate, NotificationCreate
+from schemas.notification_schema import NotificationUpdate, NotificationCreate, NotificationResponse
+from notification_hub import notification_hub
 from repositories import user_repo
-import uuid
+from id_allocator import id_allocator
 from fastapi import HTTPException
+from pagination import keyset_page
+from cache import TTLCache
+import os
+
+# Unread badge count per user, kept in step with every write below
+UNREAD_COUNT_TTL = int(os.getenv("UNREAD_COUNT_TTL", "300"))
+unread_counts = TTLCache(maxsize=100000, ttl=UNREAD_COUNT_TTL)
 
 # Get all notifications
-def get_notifications(db: Session, skip: int, limit: int):
-    return db.query(Notification).order_by(Notification.idNotf).offset(skip).limit(limit).all()
+def get_notifications(db: Session, skip: int, limit: int, cursor: str = None):
+    return keyset_page(db.query(Notification), [Notification.idNotf], limit, skip, cursor).all()
 
 # Get notification by id
 def get_notification_by_id(db: Session, idNotf: str):
@@ -19,6 +28,10 @@ def get_notification_by_user(db: Session, idUser: str, skip: int, limit: int):
         raise HTTPException(404, "User not found")
     return db.query(Notification).filter(Notification.idUser == idUser).order_by(Notification.idNotf).offset(skip).limit(limit).all()
 
+# Get every notification of a user, without paging
+def get_notifications_of_user(db: Session, idUser: str):
+    return db.query(Notification).filter(Notification.idUser == idUser).order_by(Notification.idNotf).all()
+
 def get_unread_notifications(db: Session, user_id: str, skip: int, limit: int):
     if user_repo.get_user_by(db, "idUser", user_id) is None:
         raise HTTPException(404, "User not found")
@@ -26,20 +39,30 @@ def get_unread_notifications(db: Session, user_id: str, skip: int, limit: int):
         Notification.idUser == user_id,
         Notification.isRead == False).order_by(Notification.idNotf).offset(skip).limit(limit).all()
     
+# Count unread notifications of a user
+def count_unread_notifications(db: Session, idUser: str):
+    count = unread_counts.get(idUser)
+    if count is None:
+        count = db.query(func.count(Notification.idNotf)).filter(
+            Notification.idUser == idUser,
+            Notification.isRead == False).scalar()
+        unread_counts.set(idUser, count)
+    return count
+
 # Post a new notification
 def create_notification(db: Session, notification: NotificationCreate):
     user = user_repo.get_user_by(db, "idUser", notification.idUser)
     if not user:
         raise HTTPException(404, "User not found")
     
-    idNotify = ""
-    while not idNotify or get_notification_by_id(db, idNotify):
-        idNotify = f"NTF{str(uuid.uuid4())[:3]}"
+    idNotify = id_allocator.next_id("NT")
 
     db_notification = Notification(idNotf = idNotify, idUser = notification.idUser, content = notification.content, isRead = False)
     db.add(db_notification)
     db.commit()
     db.refresh(db_notification)
+    unread_counts.incr(notification.idUser)
+    notification_hub.publish(notification.idUser, NotificationResponse.model_validate(db_notification).model_dump())
 
     return db_notification
 
@@ -49,28 +72,29 @@ def update_notification(db: Session, idNotify: str, notification: NotificationUp
     if not db_notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     
+    was_read = db_notification.isRead
     for key, value in notification.model_dump(exclude_unset=True).items():
         setattr(db_notification, key, value)
     
     db.commit()
     db.refresh(db_notification)
+    if bool(was_read) != bool(db_notification.isRead):
+        unread_counts.incr(db_notification.idUser, -1 if db_notification.isRead else 1)
     return db_notification
 
-# Mark all notifications as read by user
+# Mark all notifications as read by user, returns the number of rows updated
 def mark_all_notifications_as_read(db: Session, idUser: str):
-    db_notifications = get_notification_by_user(db=db, idUser=idUser)
-    if db_notifications == []:
-        raise HTTPException(404, "Notification not found")
-
-    for db_notification in db_notifications:
-        db_notification.isRead = True
-    
-    db.commit()
+    if user_repo.get_user_by(db, "idUser", idUser) is None:
+        raise HTTPException(404, "User not found")
     
-    for db_notification in db_notifications:
-        db.refresh(db_notification)
+    updated = db.query(Notification).filter(
+        Notification.idUser == idUser,
+        Notification.isRead == False
+    ).update({Notification.isRead: True}, synchronize_session=False)
     
-    return db_notifications
+    db.commit()
+    unread_counts.set(idUser, 0)
+    return updated
 
 # Delete a notification
 def delete_notification(db: Session, idNotify: str):
@@ -81,16 +105,19 @@ def delete_notification(db: Session, idNotify: str):
     
     db.delete(db_notification)
     db.commit()
+    if not db_notification.isRead:
+        unread_counts.incr(db_notification.idUser, -1)
     return db_notification
 
-# Delete all notifications by user
+# Delete all notifications by user, returns the number of rows deleted
 def delete_notifications_by_user(db: Session, idUser: str):
-    db_notifications = get_notification_by_user(db=db, idUser=idUser)
-    if db_notifications == []:
-        raise HTTPException(404, "Notification not found")
+    if user_repo.get_user_by(db, "idUser", idUser) is None:
+        raise HTTPException(404, "User not found")
+    
+    deleted = db.query(Notification).filter(
+        Notification.idUser == idUser
+    ).delete(synchronize_session=False)
     
-    for db_notification in db_notifications:
-        db.delete(db_notification)
-
     db.commit()
-    return db_notifications
\ No newline at end of file
+    unread_counts.set(idUser, 0)
+    return deleted
\ No newline at end of file
@@ -1,15 +1,24 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import or_, and_, func, cast, Numeric
 from models.place import Place
+from models.place_inventory import PlaceInventory
 from schemas.place_schema import PlaceCreate, PlaceUpdate
 from fastapi import HTTPException
-import uuid
+from decimal import Decimal
+from search import fold_text, escape_like, place_search_text, place_index
+from geo import encode_cell, cover_bbox, circle_bbox, haversine_km, cluster_index
+from pagination import keyset_page
+from id_allocator import id_allocator
+from http_cache import bump
+import loader_profiles
+import heapq
 
-def get_places(db: Session, skip: int, limit: int):
-    return db.query(Place).order_by(Place.idPlace).offset(skip).limit(limit).all()
+def get_places(db: Session, skip: int, limit: int, cursor: str = None, options: list = ()):
+    return keyset_page(db.query(Place).options(*options), [Place.idPlace], limit, skip, cursor).all()
 
 # Get place by id
-def get_place_by_id(db: Session, id: str):
-    return db.query(Place).filter(Place.idPlace == id).first()
+def get_place_by_id(db: Session, id: str, options: list = ()):
+    return db.query(Place).options(*options).filter(Place.idPlace == id).first()
 
 def get_place_by(db: Session, select: str, lookup: str):
     if select == "name":
@@ -27,44 +36,170 @@ def get_place_by(db: Session, select: str, lookup: str):
     else:
         raise HTTPException(400, "Bad Request")
 
-def get_bookings_of_place(db: Session, idPlace: str):
-    place = get_place_by_id(db, idPlace)
+def get_bookings_of_place(db: Session, idPlace: str, options: list = loader_profiles.PLACE_BOOKINGS):
+    place = get_place_by_id(db, idPlace, options)
     if not place:
         raise HTTPException(404, "Place not found")
     
     return place.books
 
-def get_trips_contain_place(db: Session, idPlace: str):
-    place = get_place_by_id(db, idPlace)
+def get_trips_contain_place(db: Session, idPlace: str, options: list = loader_profiles.PLACE_TRIPS):
+    place = get_place_by_id(db, idPlace, options)
     if not place:
         raise HTTPException(404, "Place not found")
     
     return place.trip_belong
 
-def search_places(db: Session, query: str, place_type: int = None, min_rating: int = None):
-    from sqlalchemy import or_
+# [rank, idPlace] cursor of the ranked place queries, 400 when it is anything else
+def ranked_cursor(after):
+    if after is None:
+        return None
+    if not isinstance(after, list) or len(after) != 2 or not isinstance(after[1], str) or not isinstance(after[0], (int, float, str)) or isinstance(after[0], bool):
+        raise HTTPException(400, "Invalid cursor")
+    try:
+        rank = Decimal(str(after[0]))
+    except ArithmeticError:
+        raise HTTPException(400, "Invalid cursor")
+    if not rank.is_finite():
+        raise HTTPException(400, "Invalid cursor")
+    return rank, after[1]
 
+# Search places, ranked by relevance; returns (places, next_cursor)
+def search_places(db: Session, query: str, place_type: int = None, min_rating: int = None, limit: int = 20, after: list = None):
+    after = ranked_cursor(after)
+    if db.bind.dialect.name == "postgresql":
+        return search_places_trigram(db, query, place_type, min_rating, limit, after)
+    
+    if not place_index.loaded:
+        place_index.build(db.query(Place).options(load_only(
+            Place.idPlace, Place.name, Place.city, Place.province, Place.country, Place.address, Place.type, Place.rating
+        )).all())
+    
+    hits = place_index.search(query, place_type, min_rating, limit, (float(after[0]), after[1]) if after else None)
+    if not hits:
+        return [], None
+    
+    places = {place.idPlace: place for place in db.query(Place).filter(Place.idPlace.in_([idPlace for _, idPlace in hits])).all()}
+    next_cursor = list(hits[-1]) if len(hits) == limit else None
+    return [places[idPlace] for _, idPlace in hits if idPlace in places], next_cursor
+
+def search_places_trigram(db: Session, query: str, place_type: int, min_rating: int, limit: int, after: tuple):
+    folded = fold_text(query)
+    score = cast(func.word_similarity(folded, Place.searchText), Numeric(6, 5))
+    
+    # Both operators are served by the gin_trgm_ops index
     filters = [or_(
-        Place.name.ilike(f"%{query}%"),
-        Place.city.ilike(f"%{query}%"),
-        Place.country.ilike(f"%{query}%"),
-        Place.province.ilike(f"%{query}%"),
-        Place.address.ilike(f"%{query}%")
+        Place.searchText.ilike(f"%{escape_like(folded)}%", escape="\\"),
+        Place.searchText.op("%>")(folded)
     )]
-
+    
     if place_type is not None:
         filters.append(Place.type == place_type)
     
     if min_rating is not None:
         filters.append(Place.rating >= min_rating)
     
-    return db.query(Place).filter(*filters).all()
+    if after:
+        last_score, last_id = after
+        filters.append(or_(score < last_score, and_(score == last_score, Place.idPlace > last_id)))
+    
+    rows = db.query(Place, score).filter(*filters).order_by(score.desc(), Place.idPlace).limit(limit).all()
+    next_cursor = [str(rows[-1][1]), rows[-1][0].idPlace] if len(rows) == limit else None
+    return [place for place, _ in rows], next_cursor
+
+def place_cell(place: Place):
+    if place.latitude is None or place.longitude is None:
+        return None
+    return encode_cell(place.latitude, place.longitude)
+
+# (distance, idPlace) of places within reach_km of (lat, lon), optionally clipped to a bbox
+def places_within(db: Session, lat: float, lon: float, reach_km: float, bbox: tuple = None):
+    min_lat, min_lon, max_lat, max_lon = circle_bbox(lat, lon, reach_km)
+    if bbox:
+        min_lat, min_lon = max(min_lat, bbox[0]), max(min_lon, bbox[1])
+        max_lat, max_lon = min(max_lat, bbox[2]), min(max_lon, bbox[3])
+        if min_lat > max_lat or min_lon > max_lon:
+            return []
+    
+    # Index range scans over the covering cells, then an exact box and distance check
+    cells = [and_(Place.geoCell >= start, Place.geoCell < end) for start, end in cover_bbox(min_lat, min_lon, max_lat, max_lon)]
+    rows = db.query(Place.idPlace, Place.latitude, Place.longitude).filter(
+        or_(*cells),
+        Place.latitude.between(min_lat, max_lat),
+        Place.longitude.between(min_lon, max_lon)
+    ).all()
+    
+    hits = []
+    for idPlace, place_lat, place_lon in rows:
+        distance = haversine_km(lat, lon, place_lat, place_lon)
+        if distance <= reach_km:
+            hits.append((distance, idPlace))
+    return hits
+
+# Places within radius_km of (lat, lon), nearest first; returns (places, next_cursor)
+def get_places_nearby(db: Session, lat: float, lon: float, radius_km: float, limit: int = 20, after: list = None, bbox: tuple = None):
+    after = ranked_cursor(after)
+    if after:
+        after = (float(after[0]), after[1])
+    
+    # Grow the search circle from the cursor until a full page is found
+    step = radius_km / 16
+    while True:
+        reach = min(radius_km, (after[0] if after else 0.0) + step)
+        hits = [hit for hit in places_within(db, lat, lon, reach, bbox) if after is None or hit > after]
+        if len(hits) >= limit or reach >= radius_km:
+            break
+        step *= 2
+    
+    hits = heapq.nsmallest(limit, hits)
+    if not hits:
+        return [], None
+    
+    places = {place.idPlace: place for place in db.query(Place).filter(Place.idPlace.in_([idPlace for _, idPlace in hits])).all()}
+    for distance, idPlace in hits:
+        places[idPlace].distance = distance
+    
+    next_cursor = list(hits[-1]) if len(hits) == limit else None
+    return [places[idPlace] for _, idPlace in hits if idPlace in places], next_cursor
+
+# Places inside a viewport, nearest to its center first
+def get_places_in_bbox(db: Session, min_lat: float, min_lon: float, max_lat: float, max_lon: float, limit: int = 20, after: list = None):
+    lat, lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+    radius_km = max(haversine_km(lat, lon, corner_lat, corner_lon) for corner_lat in (min_lat, max_lat) for corner_lon in (min_lon, max_lon))
+    return get_places_nearby(db, lat, lon, radius_km, limit, after, (min_lat, min_lon, max_lat, max_lon))
+
+# Marker clusters for a map viewport, with top-rated representatives
+def get_place_clusters(db: Session, min_lat: float, min_lon: float, max_lat: float, max_lon: float, zoom: int):
+    if not cluster_index.loaded:
+        cluster_index.build(db.query(Place.idPlace, Place.latitude, Place.longitude, Place.rating).filter(
+            Place.latitude.isnot(None), Place.longitude.isnot(None)
+        ).yield_per(10000))
+    
+    level, clusters = cluster_index.clusters(min_lat, min_lon, max_lat, max_lon, zoom)
+    ids = [idPlace for *_, top in clusters for idPlace in top]
+    places = {place.idPlace: place for place in db.query(Place).filter(Place.idPlace.in_(ids)).all()} if ids else {}
+    
+    return {
+        "zoom": zoom,
+        "level": level,
+        "clusters": [
+            {"latitude": lat, "longitude": lon, "count": count, "places": [places[idPlace] for idPlace in top if idPlace in places]}
+            for lat, lon, count, top in clusters
+        ]
+    }
+
+# Fill searchText for rows written before it existed
+def reindex_places(db: Session):
+    places = db.query(Place).filter(Place.searchText.is_(None)).all()
+    for place in places:
+        place.searchText = place_search_text(place)
+    
+    db.commit()
+    return len(places)
 
 # Post place
 def post_place(db: Session, place: PlaceCreate):
-    idPlace = ""
-    while not idPlace or get_place_by_id(db, idPlace):
-        idPlace = f"PL{str(uuid.uuid4())[:4]}"
+    idPlace = id_allocator.next_id("PL")
     
     new_place = Place(
         idPlace = idPlace,
@@ -76,12 +211,22 @@ def post_place(db: Session, place: PlaceCreate):
         description = place.description,
         image = place.image,
         rating = place.rating,
-        type = place.type
+        type = place.type,
+        latitude = place.latitude,
+        longitude = place.longitude
     )
+    new_place.searchText = place_search_text(new_place)
+    new_place.geoCell = place_cell(new_place)
     
     db.add(new_place)
+    bump(db, "places")
     db.commit()
     db.refresh(new_place)
+    
+    if place_index.loaded:
+        place_index.add(new_place)
+    if cluster_index.loaded:
+        cluster_index.add(new_place)
     return new_place
 
 # Update place
@@ -93,9 +238,17 @@ def update_place(db: Session, id: str, place: PlaceUpdate):
     
     for key, value in place.model_dump(exclude_unset=True).items():
         setattr(db_place, key, value)
+    db_place.searchText = place_search_text(db_place)
+    db_place.geoCell = place_cell(db_place)
+    bump(db, "places")
     
     db.commit()
     db.refresh(db_place)
+    
+    if place_index.loaded:
+        place_index.add(db_place)
+    if cluster_index.loaded:
+        cluster_index.add(db_place)
     return db_place
 
 def delete_place(db: Session, idPlace: str):
@@ -103,6 +256,11 @@ def delete_place(db: Session, idPlace: str):
     if not db_place:
        raise HTTPException(status_code=404, detail="Place not found")
     
+    db.query(PlaceInventory).filter(PlaceInventory.idPlace == idPlace).delete(synchronize_session=False)
     db.delete(db_place)
+    bump(db, "places")
     db.commit()
+    
+    place_index.remove(idPlace)
+    cluster_index.remove(idPlace)
     return db_place
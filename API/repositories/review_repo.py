@@ -1,17 +1,114 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import update, func, case
+from sqlalchemy.exc import IntegrityError
 from models.review import Review
+from models.trip_rating import TripRating
+from models.detail_information import DetailInformation
+from models.place import Place
 from schemas.review_schema import ReviewCreate
 from fastapi import HTTPException
 from repositories import user_repo
 from repositories import trip_repo
-import uuid
+from pagination import keyset_page
+from id_allocator import id_allocator
+from http_cache import bump
+from leaderboard import trip_leaderboard, trip_score, LEADERBOARD_SIZE, LEADERBOARD_TTL
+from cache import TTLCache
 
-def get_reviews(db: Session, skip: int, limit: int):
-    return db.query(Review).order_by(Review.idReview).offset(skip).limit(limit).all()
+BEST_REVIEWS = 5
+best_reviews = TTLCache(maxsize=1, ttl=LEADERBOARD_TTL)  # "best" -> top BEST_REVIEWS reviews, best first
 
-#lấy top reviews (lọc bởi rating)
+def get_reviews(db: Session, skip: int, limit: int, cursor: str = None):
+    return keyset_page(db.query(Review), [Review.idReview], limit, skip, cursor).all()
+
+#lấy top reviews (lọc bởi rating), giữ trong bộ nhớ
 def get_best_reviews(db: Session):
-    return db.query(Review).order_by(Review.rating.desc()).limit(5).all()
+    reviews = best_reviews.get("best")
+    if reviews is None:
+        reviews = [
+            {"idReview": r.idReview, "idTrip": r.idTrip, "idUser": r.idUser, "comment": r.comment, "rating": r.rating}
+            for r in db.query(Review).order_by(Review.rating.desc(), Review.idReview).limit(BEST_REVIEWS)
+        ]
+        best_reviews.set("best", reviews)
+    return reviews
+
+def _star(rating: int):
+    return min(max(rating, 1), 5)
+
+# Add (sign=1) or remove (sign=-1) one review in the trip's aggregate, in the caller's transaction
+def _apply_rating(db: Session, idTrip: str, rating: int, sign: int):
+    if sign > 0 and db.get(TripRating, idTrip) is None:
+        try:
+            with db.begin_nested():
+                db.add(TripRating(idTrip=idTrip, reviewCount=0, ratingSum=0, star1=0, star2=0, star3=0, star4=0, star5=0))
+        except IntegrityError:
+            pass  # Created by a concurrent review
+
+    star = f"star{_star(rating)}"
+    db.execute(
+        update(TripRating).where(TripRating.idTrip == idTrip).values({
+            TripRating.reviewCount: TripRating.reviewCount + sign,
+            TripRating.ratingSum: TripRating.ratingSum + sign * rating,
+            getattr(TripRating, star): getattr(TripRating, star) + sign
+        }).execution_options(synchronize_session=False)
+    )
+
+# Push the committed aggregate of a trip into the leaderboard
+def _refresh_trip(db: Session, idTrip: str):
+    if not trip_leaderboard.loaded:
+        return
+    rating = db.get(TripRating, idTrip, populate_existing=True)
+    trip_leaderboard.update(idTrip, rating.reviewCount if rating else 0, rating.ratingSum if rating else 0)
+
+def _load_leaderboard(db: Session):
+    trip_leaderboard.build(
+        db.query(TripRating.idTrip, TripRating.reviewCount, TripRating.ratingSum).filter(TripRating.reviewCount > 0).all(),
+        db.query(DetailInformation.idTrip, Place.province).join(Place, Place.idPlace == DetailInformation.idPlace).distinct().all()
+    )
+
+def rating_response(idTrip: str, rating: TripRating = None):
+    count, total = (rating.reviewCount, rating.ratingSum) if rating else (0, 0)
+    return {
+        "idTrip": idTrip,
+        "reviewCount": count,
+        "average": total / count if count else None,
+        "score": trip_score(count, total),
+        "histogram": [getattr(rating, f"star{i}") if rating else 0 for i in range(1, 6)]
+    }
+
+# Aggregate of one trip (trip cards): a primary key lookup
+def get_trip_rating(db: Session, idTrip: str):
+    rating = db.get(TripRating, idTrip)
+    if rating is None and trip_repo.get_trip_by_id(db, idTrip) is None:
+        raise HTTPException(404, "Trip not found")
+    return rating_response(idTrip, rating)
+
+# Best trips overall or in a province, from the in-memory leaderboard
+def get_top_trips(db: Session, province: str = None, limit: int = 10):
+    if not trip_leaderboard.loaded:
+        _load_leaderboard(db)
+    return [
+        {"idTrip": idTrip, "reviewCount": count, "average": total / count, "score": score}
+        for idTrip, count, total, score in trip_leaderboard.top(province, min(limit, LEADERBOARD_SIZE))
+    ]
+
+# Recompute TripRatings from Reviews, e.g. after importing reviews directly into the table
+def rebuild_trip_ratings(db: Session):
+    star = case((Review.rating <= 1, 1), (Review.rating >= 5, 5), else_=Review.rating)
+    rows = db.query(
+        Review.idTrip, func.count(Review.idReview), func.coalesce(func.sum(Review.rating), 0),
+        *[func.sum(case((star == i, 1), else_=0)) for i in range(1, 6)]
+    ).filter(Review.rating.isnot(None)).group_by(Review.idTrip).all()
+
+    db.query(TripRating).delete(synchronize_session=False)
+    db.add_all(
+        TripRating(idTrip=idTrip, reviewCount=count, ratingSum=total, star1=s1, star2=s2, star3=s3, star4=s4, star5=s5)
+        for idTrip, count, total, s1, s2, s3, s4, s5 in rows
+    )
+    db.commit()
+    _load_leaderboard(db)
+    best_reviews.clear()
+    return {"trips": len(rows)}
 
 #Get a review by id
 def get_review_by_id(db: Session, idReview: str):
@@ -34,15 +131,20 @@ def create_review(db: Session, review: ReviewCreate):
     if trip_repo.get_trip_by_id(db, review.idTrip) is None:
         raise HTTPException(404, "Trip not found")
     
-    idReview = ""
-    while not idReview or get_review_by_id(db, idReview):
-        idReview =  f"RV{str(uuid.uuid4())[:4]}"
+    idReview = id_allocator.next_id("RV")
 
     db_review = Review(idReview = idReview, idTrip = review.idTrip, idUser = review.idUser, comment = review.comment, rating = review.rating)
     
     db.add(db_review)
+    _apply_rating(db, review.idTrip, review.rating, 1)
+    bump(db, "reviews")
     db.commit()
     db.refresh(db_review)
+    
+    _refresh_trip(db, review.idTrip)
+    cached = best_reviews.get("best")
+    if cached is not None and (len(cached) < BEST_REVIEWS or db_review.rating >= cached[-1]["rating"]):
+        best_reviews.pop("best")
     return db_review
 
 #xóa
@@ -51,6 +153,15 @@ def delete_review(db: Session, review_id: str):
     if not review:
         raise HTTPException(404, "Review not found")
     
+    idTrip, rating = review.idTrip, review.rating
     db.delete(review)
+    if rating is not None:
+        _apply_rating(db, idTrip, rating, -1)
+    bump(db, "reviews")
     db.commit()
+    
+    _refresh_trip(db, idTrip)
+    cached = best_reviews.get("best")
+    if cached is not None and any(r["idReview"] == review_id for r in cached):
+        best_reviews.pop("best")
     return review
@@ -4,6 +4,7 @@ from schemas.trip_member_schema import TripMemberCreate
 from repositories import user_repo
 from repositories import trip_repo
 from fastapi import HTTPException
+import schedule
 
 # Get all trip_memnbers
 def get_trip_members(db: Session):
@@ -28,11 +29,14 @@ def create_trip_member(db: Session, trip_member: TripMemberCreate):
     if user_repo.get_user_by(db, "idUser", trip_member.idUser) is None:
         raise HTTPException(404, "User not found")
     # Check if the trip exists
-    if trip_repo.get_trip_by_id(db, trip_member.idTrip) is None:
+    trip = trip_repo.get_trip_by_id(db, trip_member.idTrip)
+    if trip is None:
         raise HTTPException(404, "Trip not found")
     # Check if the trip_member already exists
     if get_trip_member_by_user_trip(db, trip_member.idUser, trip_member.idTrip):
         raise HTTPException(422, "Trip member already exists")
+    # Check the trip against the user's other trips, bookings and stops
+    schedule.check_trip_member(db, trip_member.idUser, trip)
     
     db_trip_member = TripMember(idUser=trip_member.idUser, idTrip=trip_member.idTrip)
     db.add(db_trip_member)
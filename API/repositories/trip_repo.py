@@ -1,22 +1,32 @@
 from sqlalchemy.orm import Session
 from models.trip import Trip
+from models.trip_rating import TripRating
 from schemas.trip_schema import TripCreate, TripUpdate
 from datetime import datetime, timedelta
 from fastapi import HTTPException
-import uuid
+from id_allocator import id_allocator
+from http_cache import bump
+from intervals import trip_period
+from leaderboard import trip_leaderboard
+import schedule
+import loader_profiles
 
 #tìm trong start_date -> end_date và theo keyword
-def get_trips(db: Session, start_date: datetime = None, end_date: datetime = None, keyword: str = None):
-    query = db.query(Trip)
+def get_trips(db: Session, start_date: datetime = None, end_date: datetime = None, keyword: str = None, options: list = ()):
+    query = db.query(Trip).options(*options)
     if start_date and end_date:
-        query = query.filter(Trip.startDate >= start_date, Trip.endDate <= end_date).all()
+        query = query.filter(Trip.startDate >= start_date, Trip.endDate <= end_date)
     if keyword:
-        query = query.filter(Trip.name.ilike(f"%{keyword}%")).all()
+        query = query.filter(Trip.name.ilike(f"%{keyword}%"))
     return query.all()
 
+# Trips overlapping / within [start, end] or active at start (mode "active", start == end)
+def get_trips_in_range(db: Session, mode: str, start: datetime, end: datetime, limit: int = 100):
+    return trip_period.query(db, mode, start, end, limit=limit)
+
 # Get a trip by id
-def get_trip_by_id(db: Session, idTrip: str):
-    return db.query(Trip).filter(Trip.idTrip == idTrip).first()
+def get_trip_by_id(db: Session, idTrip: str, options: list = ()):
+    return db.query(Trip).options(*options).filter(Trip.idTrip == idTrip).first()
 
 # Get a trip by
 def get_trip_by(db: Session, select: str, lookup: str):
@@ -35,22 +45,22 @@ def get_trip_by(db: Session, select: str, lookup: str):
     else:
         raise HTTPException(status_code=400, detail="Bad Request")
     
-def get_members_of_trip(db: Session, idTrip: str):
-    trip = get_trip_by_id(db, idTrip)
+def get_members_of_trip(db: Session, idTrip: str, options: list = loader_profiles.TRIP_MEMBERS):
+    trip = get_trip_by_id(db, idTrip, options)
     if not trip:
         raise HTTPException(404, "Trip not found")
     
     return trip.members
 
-def get_users_reviewed_trip(db: Session, idTrip: str):
-    trip = get_trip_by_id(db, idTrip)
+def get_users_reviewed_trip(db: Session, idTrip: str, options: list = loader_profiles.TRIP_REVIEWERS):
+    trip = get_trip_by_id(db, idTrip, options)
     if not trip:
         raise HTTPException(404, "Trip not found")
     
     return trip.reviewed_by
 
-def get_places_of_trip(db: Session, idTrip: str):
-    trip = get_trip_by_id(db, idTrip)
+def get_places_of_trip(db: Session, idTrip: str, options: list = loader_profiles.TRIP_PLACES):
+    trip = get_trip_by_id(db, idTrip, options)
     if not trip:
         raise HTTPException(404, "Trip not found")
     
@@ -58,13 +68,12 @@ def get_places_of_trip(db: Session, idTrip: str):
 
 #tạo mới trip
 def create_trip(db: Session, trip: TripCreate):
-    idTrip = ""
-    while not idTrip or get_trip_by_id(db, idTrip):
-        idTrip =  f"TR{str(uuid.uuid4())[:4]}"
+    idTrip = id_allocator.next_id("TR")
 
     db_trip = Trip(idTrip = idTrip, name = trip.name, startDate = trip.startDate, endDate = trip.endDate)
     
     db.add(db_trip)
+    bump(db, "trips")
     db.commit()
     db.refresh(db_trip)
     return db_trip
@@ -75,8 +84,13 @@ def update_trip(db: Session, trip_id: str, trip_update: TripUpdate):
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     
-    for key, value in trip_update.model_dump(exclude_unset=True).items():
+    changes = trip_update.model_dump(exclude_unset=True)
+    if "startDate" in changes or "endDate" in changes:
+        schedule.check_trip(db, trip_id, changes.get("startDate", trip.startDate), changes.get("endDate", trip.endDate))
+    
+    for key, value in changes.items():
         setattr(trip, key, value)
+    bump(db, "trips")
     
     db.commit()
     db.refresh(trip)
@@ -88,6 +102,11 @@ def delete_trip(db: Session, trip_id: str):
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     
+    db.query(TripRating).filter(TripRating.idTrip == trip_id).delete(synchronize_session=False)
     db.delete(trip)
+    # Its stops and reviews go with it
+    bump(db, "trips", "details", "reviews")
     db.commit()
+    if trip_leaderboard.loaded:
+        trip_leaderboard.update(trip_id, 0, 0)
     return trip
\ No newline at end of file
@@ -1,18 +1,28 @@
 from sqlalchemy.orm import Session
 from models.user import User
+from models.review import Review
+from models.trip_rating import TripRating
 from schemas.user_schema import UserCreate, UserUpdate
 from fastapi import HTTPException
-from sqlalchemy import or_
-import uuid
+from sqlalchemy import or_, select, update
+from datetime import datetime, timedelta
+from id_allocator import id_allocator
+from http_cache import bump
+from blob_store import put_avatar, fetch_avatar, legacy_avatar_url
+from leaderboard import trip_leaderboard
+from repositories import review_repo
+import loader_profiles
+import requests
+import schedule
 
 # Get all users
-def get_users(db: Session):
-    return db.query(User)
+def get_users(db: Session, options: list = ()):
+    return db.query(User).options(*options)
 
 # Get a user by
-def get_user_by(db: Session, select: str, lookup: str):
+def get_user_by(db: Session, select: str, lookup: str, options: list = ()):
     if select == "idUser":
-        return db.query(User).filter(User.idUser == lookup).first()
+        return db.query(User).options(*options).filter(User.idUser == lookup).first()
     elif select == "username":
         return db.query(User).filter(User.username == lookup).first()
     elif select == "email":
@@ -22,38 +32,63 @@ def get_user_by(db: Session, select: str, lookup: str):
     else:
         raise HTTPException(status_code=400, detail="Bad Request")
     
+# The User behind an authenticated principal (a Token row), 401 when the account has none
+def get_user_of(db: Session, principal):
+    user = get_user_by(db, "username", principal.username)
+    if user is None:
+        raise HTTPException(status_code=401, detail="No user for this account")
+    return user
+
 # Get trips of user
-def get_trips_of_user(db: Session, idUser: str):
-    user = get_user_by(db, "idUser", idUser)
+def get_trips_of_user(db: Session, idUser: str, options: list = loader_profiles.USER_TRIPS):
+    user = get_user_by(db, "idUser", idUser, options)
     if not user:
         raise HTTPException(404, "User not found")
     
     return user.trips
 
 # Get bookings of user
-def get_bookings_of_user(db: Session, idUser: str):
-    user = get_user_by(db, "idUser", idUser)
+def get_bookings_of_user(db: Session, idUser: str, options: list = loader_profiles.USER_BOOKINGS):
+    user = get_user_by(db, "idUser", idUser, options)
     if not user:
         raise HTTPException(404, "User not found")
     
     return user.bookings
 
-def get_friend_requests_of_user(db: Session, idUser: str):
-    user = get_user_by(db, "idUser", idUser)
+# Trips, bookings and trip stops of a user overlapping one month
+def get_calendar(db: Session, idUser: str, year: int, month: int):
+    if not get_user_by(db, "idUser", idUser):
+        raise HTTPException(404, "User not found")
+
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1) - timedelta(microseconds=1)
+
+    rows = db.execute(schedule.commitments(db, idUser, start, end)).all()
+    return [dict(row._mapping) for row in rows]
+
+# Overlapping pairs in a user's schedule
+def get_conflicts(db: Session, idUser: str):
+    if not get_user_by(db, "idUser", idUser):
+        raise HTTPException(404, "User not found")
+
+    return [{"first": first, "second": second} for first, second in schedule.get_conflicts(db, idUser)]
+
+def get_friend_requests_of_user(db: Session, idUser: str, options: list = loader_profiles.USER_FRIEND_REQUESTS_OF):
+    user = get_user_by(db, "idUser", idUser, options)
     if not user:
         raise HTTPException(404, "User not found")
     
     return user.sent_friends
 
-def get_friend_requests_to_user(db: Session, idUser: str):
-    user = get_user_by(db, "idUser", idUser)
+def get_friend_requests_to_user(db: Session, idUser: str, options: list = loader_profiles.USER_FRIEND_REQUESTS_TO):
+    user = get_user_by(db, "idUser", idUser, options)
     if not user:
         raise HTTPException(404, "User not found")
     
     return user.received_friends
 
-def get_reviewed_trips_of_user(db: Session, idUser: str):
-    user = get_user_by(db, "idUser", idUser)
+def get_reviewed_trips_of_user(db: Session, idUser: str, options: list = loader_profiles.USER_REVIEWED_TRIPS):
+    user = get_user_by(db, "idUser", idUser, options)
     if not user:
         raise HTTPException(404, "User not found")
     
@@ -68,11 +103,9 @@ def create_user(db: Session, user: UserCreate):
         raise HTTPException(status_code=422, detail="User already exists")
     
     # If the user does not exist, create a new user    
-    idUser = ""
-    while not idUser or get_user_by(db, "idUser", idUser):
-        idUser =  f"US{str(uuid.uuid4())[:4]}"
+    idUser = id_allocator.next_id("US")
     
-    db_user = User(idUser=idUser, name=user.name, username=user.username, password=user.password, gender=user.gender, email=user.email, phoneNumber=user.phoneNumber, avatar=user.avatar, theme=0, language=0)
+    db_user = User(idUser=idUser, name=user.name, username=user.username, password=user.password, gender=user.gender, email=user.email, phoneNumber=user.phoneNumber, theme=0, language=0)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
@@ -108,6 +141,68 @@ def delete_user(db: Session, idUser: str):
     if not db_user:
        raise HTTPException(status_code=404, detail="User not found")
     
+    # Cascades to the user's trips, the trips they reviewed and their reviews: drop the
+    # aggregates of those trips and take the user's other reviews out of theirs, as delete_trip does
+    trips = {trip.idTrip for trip in [*db_user.trips, *db_user.reviewed]}
+    reviews = db.query(Review.idTrip, Review.rating).filter(Review.idUser == idUser, Review.rating.isnot(None)).all()
+    db.query(TripRating).filter(TripRating.idTrip.in_(trips)).delete(synchronize_session=False)
+    for idTrip, rating in reviews:
+        if idTrip not in trips:
+            review_repo._apply_rating(db, idTrip, rating, -1)
+    
     db.delete(db_user)
+    bump(db, "trips", "details", "reviews")
     db.commit()
-    return db_user
\ No newline at end of file
+    
+    if trip_leaderboard.loaded:
+        for idTrip in trips:
+            trip_leaderboard.update(idTrip, 0, 0)
+    for idTrip in {idTrip for idTrip, _ in reviews} - trips:
+        review_repo._refresh_trip(db, idTrip)
+    review_repo.best_reviews.pop("best")
+    return db_user
+
+# Avatar bytes -> blob store digest, 400 when it isn't an accepted image
+def store_avatar(data: bytes):
+    try:
+        return put_avatar(data)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+# Replace (data) or remove (None) a user's avatar; the blob stays, other users may share it
+def set_avatar(db: Session, idUser: str, data: bytes = None):
+    db_user = get_user_by(db, "idUser", idUser)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    db_user.avatarHash = store_avatar(data) if data is not None else None
+    db_user.avatarLink = None
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+# Move avatars left in Users.avatar into the blob store, batch by batch. Image bytes are
+# stored as is; URLs are downloaded, and kept (still served) when the download fails
+def migrate_avatars(db: Session, batch: int = 100):
+    moved, kept, failed = 0, [], []
+    while True:
+        skipped = kept + failed
+        rows = db.execute(
+            select(User.idUser, User.avatarLink)
+            .where(User.avatarLink.isnot(None), User.idUser.notin_(skipped) if skipped else True)
+            .order_by(User.idUser).limit(batch)
+        ).all()
+        if not rows:
+            break
+        
+        for idUser, avatar in rows:
+            link = legacy_avatar_url(avatar)
+            try:
+                avatarHash = put_avatar(fetch_avatar(link) if link else bytes(avatar))
+            except (ValueError, requests.RequestException):
+                (kept if link else failed).append(idUser)  # failed: neither image nor URL, left for a look by hand
+                continue
+            db.execute(update(User).where(User.idUser == idUser).values(avatarHash=avatarHash, avatarLink=None))
+            moved += 1
+        db.commit()
+    return {"moved": moved, "kept": kept, "failed": failed}
@@ -0,0 +1,185 @@
+from functools import partial
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+EPS = 1e-9
+
+# Pairwise great-circle distances (km)
+def distance_matrix(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    a = (np.sin((lat[:, None] - lat[None, :]) / 2) ** 2
+         + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin((lon[:, None] - lon[None, :]) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def route_length(dist, order):
+    order = np.asarray(order)
+    return float(dist[order[:-1], order[1:]].sum())
+
+def nearest_neighbour(dist, start: int = 0):
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    order = [start]
+    visited[start] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[order[-1]])
+        order.append(int(row.argmin()))
+        visited[order[-1]] = True
+    return order
+
+# Nearest neighbour that only detours to a free stop when the next fixed stop is still reachable on time
+def timed_nearest_neighbour(dist, travel, durations, fixed_starts):
+    n = len(dist)
+    free = np.isnan(fixed_starts)
+    free[0] = False
+    anchors = sorted((i for i in range(1, n) if not free[i]), key=lambda i: fixed_starts[i], reverse=True)
+    order = [0]
+    t = 0.0 if free[0] or np.isnan(fixed_starts[0]) else fixed_starts[0]
+    t += durations[0]
+
+    while free.any() or anchors:
+        current = order[-1]
+        reach = np.where(free, dist[current], np.inf)
+        if anchors:
+            target = anchors[-1]
+            finish = t + travel[current] + durations + travel[:, target]
+            reach[finish > fixed_starts[target]] = np.inf
+        stop = int(reach.argmin())
+
+        if reach[stop] == np.inf:
+            stop = anchors.pop()
+            t = max(t + travel[current, stop], fixed_starts[stop])
+        else:
+            free[stop] = False
+            t += travel[current, stop]
+        t = max(t, fixed_starts[stop]) if not np.isnan(fixed_starts[stop]) else t
+        t += durations[stop]
+        order.append(stop)
+    return order
+
+# Minutes from the first stop: sequential arrival, fixed stops keep their start.
+# Returns (starts, lateness) where lateness sums arrivals after a fixed start.
+def schedule(order, travel, durations, fixed_starts):
+    order = np.asarray(order)
+    fixed = fixed_starts[order]
+    anchor = ~np.isnan(fixed)
+    positions = np.arange(len(order))
+
+    # Time runs on from the latest fixed stop (or the first stop) before each position
+    elapsed = np.concatenate([[0.0], np.cumsum(durations[order[:-1]] + travel[order[:-1], order[1:]])])
+    base = np.where(anchor, fixed, 0.0)
+    last = np.maximum.accumulate(np.where(anchor, positions, 0))
+    before = np.concatenate([[0], last[:-1]])
+    arrive = base[before] + elapsed - elapsed[before]
+
+    late = anchor.copy()
+    late[0] = False
+    lateness = float(np.maximum(arrive[late] - fixed[late], 0.0).sum())
+    starts = np.where(anchor, fixed, arrive)
+    starts[0] = base[0]
+    return starts, lateness
+
+# Indices of the k smallest entries, smallest first
+def _smallest(values, k: int):
+    flat = values.ravel()
+    if k == 1:
+        return [int(flat.argmin())]
+    k = min(k, flat.size)
+    picked = np.argpartition(flat, k - 1)[:k]
+    return picked[np.argsort(flat[picked])]
+
+# Candidate routes of the best 2-opt moves, most improving first
+def _two_opt(dx, route, tries: int, lower):
+    n = len(route) - 1
+    a, b = route[:-1], route[1:]
+    ab = dx[a, b]
+    delta = dx[np.ix_(a, a)] + dx[np.ix_(b, b)] - ab[:, None] - ab[None, :]
+    delta[lower] = 0.0
+
+    for flat in _smallest(delta, tries):
+        i, j = divmod(int(flat), n)
+        if delta[i, j] >= -EPS:
+            break
+        candidate = route.copy()
+        candidate[i + 1:j + 1] = candidate[i + 1:j + 1][::-1]
+        yield candidate
+
+# Candidate routes of the best Or-opt moves (segments of 1-3 stops, optionally reversed)
+def _or_opt(dx, route, tries: int, masks: dict):
+    n = len(route) - 1
+    u, v = route[:-1], route[1:]
+    uv = dx[u, v]
+
+    # into[p, k]: edge k -> stop at position p, out[p, k]: stop at position p -> end of edge k
+    into = dx[np.ix_(route, u)]
+    out = dx[np.ix_(route, v)]
+
+    moves = []
+    for length in (1, 2, 3):
+        s = np.arange(1, n - length + 1)
+        if not len(s):
+            continue
+        p, first, last, q = route[s - 1], route[s], route[s + length - 1], route[s + length]
+        gain = dx[p, first] + dx[last, q] - dx[p, q]
+        forward = into[s] + out[s + length - 1] - uv
+        backward = into[s + length - 1] + out[s] - uv
+        delta = np.minimum(forward, backward) - gain[:, None]
+        delta[masks[length]] = np.inf
+        for flat in _smallest(delta, tries):
+            row, edge = divmod(int(flat), n)
+            if delta[row, edge] >= -EPS:
+                break
+            moves.append((delta[row, edge], length, int(s[row]), edge, backward[row, edge] < forward[row, edge]))
+
+    for _, length, start, edge, reverse in sorted(moves)[:tries]:
+        segment = route[start:start + length]
+        rest = np.concatenate([route[:start], route[start + length:]])
+        at = edge + 1 if edge < start else edge - length + 1
+        yield np.concatenate([rest[:at], segment[::-1] if reverse else segment, rest[at:]])
+
+# Near-optimal open route from stop 0 through every stop, starting from the best of
+# nearest neighbour, the current order (0..n-1) and, with fixed stops, timed nearest neighbour.
+# With fixed_starts (minutes, NaN when free) a move is only taken if it does not add lateness.
+def optimize_route(dist, travel=None, durations=None, fixed_starts=None, max_rounds: int = 10000):
+    n = len(dist)
+    if n < 3:
+        return list(range(n))
+
+    penalty = None
+    starts = [nearest_neighbour(dist), list(range(n))]
+    if fixed_starts is not None and not np.isnan(fixed_starts[1:]).all():
+        penalty = lambda order: schedule(order, travel, durations, fixed_starts)[1]
+        starts.append(timed_nearest_neighbour(dist, travel, durations, fixed_starts))
+
+    # Open path as a tour through a dummy stop at zero distance from all others
+    dx = np.zeros((n + 1, n + 1))
+    dx[:n, :n] = dist
+    tries = 1 if penalty is None else 8
+
+    # Edges touching a segment are not insertion points for it
+    edges = np.arange(n)
+    masks = {}
+    for length in (1, 2, 3):
+        s = np.arange(1, n - length + 1)
+        masks[length] = (edges[None, :] >= s[:, None] - 1) & (edges[None, :] <= s[:, None] + length - 1)
+    moves = (partial(_two_opt, lower=np.tril_indices(n, 1)), partial(_or_opt, masks=masks))
+
+    def rank(route):
+        return (penalty(route[:-1]) if penalty else 0.0, route_length(dx, route))
+
+    route = min((np.array(order + [n]) for order in starts), key=rank)
+    current = rank(route)[0]
+
+    # 2-opt until it stalls, Or-opt only to get it moving again
+    for _ in range(max_rounds):
+        for move in moves:
+            accepted = next((candidate for candidate in move(dx, route, tries)
+                             if (penalty(candidate[:-1]) if penalty else 0.0) <= current + EPS), None)
+            if accepted is not None:
+                route = accepted
+                current = penalty(route[:-1]) if penalty else 0.0
+                break
+        else:
+            break
+
+    return [int(stop) for stop in route[:-1]]
@@ -0,0 +1,218 @@
+from threading import Lock
+from datetime import datetime
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, union_all, literal, null, cast, String, func, event, inspect
+from sqlalchemy.orm import Session
+from cache import TTLCache
+from intervals import IntervalIndex, trip_period, booking_period, detail_period
+from models.trip import Trip
+from models.trip_member import TripMember
+from models.booking import Booking
+from models.detail_booking import DetailBooking
+from models.detail_information import DetailInformation
+from models.place import Place
+from models.user import User
+import os
+
+SCHEDULE_CACHE_SIZE = int(os.getenv("SCHEDULE_CACHE_SIZE", "10000"))
+SCHEDULE_CACHE_TTL = int(os.getenv("SCHEDULE_CACHE_TTL", "300"))
+SCHEDULE_CONFLICTS_ENFORCE = os.getenv("SCHEDULE_CONFLICTS_ENFORCE", "true").lower() in ("1", "true", "yes")
+
+# A user's trips (TripMembers), bookings (DetailBookings) and stops of their trips as one
+# UNION ALL query, optionally only those overlapping [start, end]
+def commitments(db: Session, idUser: str, start: datetime = None, end: datetime = None):
+    def in_range(period):
+        return period.filter(db, "overlap", start, end) if start is not None else True
+
+    trips = select(
+        literal("trip").label("kind"), Trip.idTrip.label("id"), Trip.name.label("title"),
+        trip_period.start.label("start"), trip_period.end.label("end"),
+        Trip.idTrip.label("idTrip"), cast(null(), String).label("idPlace")
+    ).join(TripMember, TripMember.idTrip == Trip.idTrip).where(
+        TripMember.idUser == idUser, in_range(trip_period)
+    )
+    bookings = select(
+        literal("booking"), Booking.idBooking, Place.name,
+        booking_period.start, booking_period.end,
+        cast(null(), String), Booking.idPlace
+    ).join(DetailBooking, DetailBooking.idBooking == Booking.idBooking).outerjoin(Place, Place.idPlace == Booking.idPlace).where(
+        DetailBooking.idUser == idUser, in_range(booking_period)
+    )
+    details = select(
+        literal("detail"), DetailInformation.idDetail, func.coalesce(Place.name, DetailInformation.note),
+        detail_period.start, detail_period.end,
+        DetailInformation.idTrip, DetailInformation.idPlace
+    ).join(TripMember, TripMember.idTrip == DetailInformation.idTrip).outerjoin(Place, Place.idPlace == DetailInformation.idPlace).where(
+        TripMember.idUser == idUser, in_range(detail_period)
+    )
+
+    calendar = union_all(trips, bookings, details).subquery()
+    return select(calendar).order_by(calendar.c.start, calendar.c.kind, calendar.c.id)
+
+def entry(kind: str, id: str, start: datetime, end: datetime = None, idTrip: str = None, idPlace: str = None, title: str = None):
+    return {"kind": kind, "id": id, "title": title, "start": start, "end": end or start, "idTrip": idTrip, "idPlace": idPlace}
+
+# Trips only clash with trips; stops and bookings clash with each other,
+# except a booking at the place of the stop it belongs to
+def group(item: dict):
+    return "trip" if item["kind"] == "trip" else "activity"
+
+def clashes(a: dict, b: dict):
+    if (a["kind"], a["id"]) == (b["kind"], b["id"]) or group(a) != group(b):
+        return False
+    if a["kind"] != b["kind"] and a["idPlace"] is not None and a["idPlace"] == b["idPlace"]:
+        return False
+    return True
+
+# One user's commitments in an interval index per group
+class UserSchedule:
+    def __init__(self, items: list):
+        self.items = {}
+        self.indexes = {"trip": IntervalIndex(), "activity": IntervalIndex()}
+        spans = {"trip": [], "activity": []}
+        for item in items:
+            key = (item["kind"], item["id"])
+            self.items[key] = item
+            spans[group(item)].append((key, item["start"], item["end"]))
+        for name, index in self.indexes.items():
+            index.build(spans[name])
+
+    # Commitments clashing with item, O(log n + overlaps)
+    def overlapping(self, item: dict):
+        keys = self.indexes[group(item)].search("overlap", item["start"], item["end"])
+        return [self.items[key] for key in keys if clashes(item, self.items[key])]
+
+    # Every clashing pair once, in order of the first one's start
+    def conflicts(self):
+        pairs = []
+        for key, item in self.items.items():
+            pairs += [(item, other) for other in self.overlapping(item) if key < (other["kind"], other["id"])]
+        pairs.sort(key=lambda pair: (pair[0]["start"], pair[0]["kind"], pair[0]["id"]))
+        return pairs
+
+# Per-user schedules, dropped after a commit touches one of their trips, bookings or stops
+class ScheduleIndex:
+    def __init__(self, maxsize: int = SCHEDULE_CACHE_SIZE, ttl: int = SCHEDULE_CACHE_TTL):
+        self.schedules = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.trip_users = TTLCache(maxsize=maxsize * 10, ttl=ttl)     # idTrip -> users whose schedule has it
+        self.booking_users = TTLCache(maxsize=maxsize * 10, ttl=ttl)  # idBooking -> users whose schedule has it
+        self._lock = Lock()
+        self._generation = 0
+
+    def get(self, db: Session, idUser: str):
+        schedule = self.schedules.get(idUser)
+        if schedule is not None:
+            return schedule
+
+        generation = self._generation
+        items = [dict(row._mapping) for row in db.execute(commitments(db, idUser)).all()]
+        schedule = UserSchedule(items)
+        with self._lock:
+            # Something was invalidated while loading: use it once, don't cache it
+            if generation != self._generation:
+                return schedule
+            for item in items:
+                users = self.booking_users if item["kind"] == "booking" else self.trip_users
+                key = item["id"] if item["kind"] == "booking" else item["idTrip"]
+                owners = users.get(key)
+                if owners is None:
+                    owners = set()
+                    users.set(key, owners)
+                owners.add(idUser)
+            self.schedules.set(idUser, schedule)
+        return schedule
+
+    def invalidate(self, idUsers=(), idTrips=(), idBookings=()):
+        with self._lock:
+            self._generation += 1
+            users = set(idUsers)
+            for idTrip in idTrips:
+                users |= self.trip_users.pop(idTrip, set())
+            for idBooking in idBookings:
+                users |= self.booking_users.pop(idBooking, set())
+        for idUser in users:
+            self.schedules.pop(idUser)
+
+schedule_index = ScheduleIndex()
+
+# Changed rows -> which cached schedules they can affect
+def _affected(obj):
+    if isinstance(obj, (TripMember, DetailBooking)):
+        return {"idUsers": [obj.idUser]}
+    if isinstance(obj, Trip):
+        return {"idTrips": [obj.idTrip]}
+    if isinstance(obj, Booking):
+        return {"idBookings": [obj.idBooking]}
+    if isinstance(obj, DetailInformation):
+        history = inspect(obj).attrs.idTrip.history
+        return {"idTrips": [obj.idTrip, *history.deleted]}
+    return None
+
+@event.listens_for(Session, "after_flush")
+def collect_schedule_changes(session, flush_context):
+    changes = session.info.setdefault("schedule_changes", [])
+    for obj in session.new | session.dirty | session.deleted:
+        affected = _affected(obj)
+        if affected:
+            changes.append(affected)
+
+@event.listens_for(Session, "after_commit")
+def apply_schedule_changes(session):
+    for affected in session.info.pop("schedule_changes", []):
+        schedule_index.invalidate(**affected)
+
+@event.listens_for(Session, "after_soft_rollback")
+def discard_schedule_changes(session, previous_transaction):
+    session.info.pop("schedule_changes", None)
+
+def get_conflicts(db: Session, idUser: str):
+    return schedule_index.get(db, idUser).conflicts()
+
+# Pre-write validation: 409 with the clashing commitments when items overlap any user's schedule.
+# Runs in the caller's write transaction against the database, not the per-worker schedule_index,
+# so commitments written by other workers count. The users' rows stay locked (SELECT ... FOR UPDATE)
+# until the caller commits, so two writers for the same user can't both pass; SQLite has no row
+# locks and serializes writers at commit instead
+def check(db: Session, idUsers, items: list):
+    if not SCHEDULE_CONFLICTS_ENFORCE or not items:
+        return
+
+    idUsers = sorted(set(idUsers))
+    db.query(User.idUser).filter(User.idUser.in_(idUsers)).order_by(User.idUser).with_for_update().all()
+
+    start, end = min(item["start"] for item in items), max(item["end"] for item in items)
+    conflicts = []
+    for idUser in idUsers:
+        schedule = UserSchedule([dict(row._mapping) for row in db.execute(commitments(db, idUser, start, end)).all()])
+        for item in items:
+            conflicts += [{"idUser": idUser, **other} for other in schedule.overlapping(item)]
+    if conflicts:
+        raise HTTPException(409, jsonable_encoder({"message": "Schedule conflict", "conflicts": conflicts}))
+
+def trip_members(db: Session, idTrip: str):
+    return [idUser for idUser, in db.query(TripMember.idUser).filter(TripMember.idTrip == idTrip)]
+
+def booking_owners(db: Session, idBooking: str):
+    return [idUser for idUser, in db.query(DetailBooking.idUser).filter(DetailBooking.idBooking == idBooking)]
+
+# Joining a trip brings its dates and its stops into the user's schedule
+def check_trip_member(db: Session, idUser: str, trip):
+    items = [entry("trip", trip.idTrip, *trip_period.span(trip), idTrip=trip.idTrip)]
+    items += [
+        entry("detail", detail.idDetail, *detail_period.span(detail), idTrip=detail.idTrip, idPlace=detail.idPlace)
+        for detail in db.query(DetailInformation).filter(DetailInformation.idTrip == trip.idTrip)
+        if detail.startTime is not None
+    ]
+    check(db, [idUser], items)
+
+def check_trip(db: Session, idTrip: str, startDate: datetime, endDate: datetime = None):
+    check(db, trip_members(db, idTrip), [entry("trip", idTrip, startDate, endDate, idTrip=idTrip)])
+
+def check_booking(db: Session, idUsers, idBooking: str, date: datetime, idPlace: str = None):
+    if date is not None:
+        check(db, idUsers, [entry("booking", idBooking, date, idPlace=idPlace)])
+
+def check_detail(db: Session, idDetail: str, idTrip: str, startTime: datetime, endTime: datetime = None, idPlace: str = None):
+    if startTime is not None:
+        check(db, trip_members(db, idTrip), [entry("detail", idDetail, startTime, endTime, idTrip=idTrip, idPlace=idPlace)])
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
 
 class AIRecommendationBase(BaseModel):
     input: str
@@ -15,3 +16,24 @@ class AIRecCreate(AIRecommendationBase):
 
 class AIRecUpdate(AIRecommendationBase):
     pass
+
+# Trip generation request sent by the frontend (generate_trip.ts)
+class AIRequest(BaseModel):
+    departure: str
+    destination: str
+    people: int = Field(..., ge=1)
+    days: int = Field(..., ge=1, le=30)
+    time: str
+    money: str
+    transportation: Optional[str] = None
+    travelStyle: Optional[str] = None
+    interests: Optional[list[str]] = None
+    accommodation: Optional[str] = None
+
+class TripJobResponse(BaseModel):
+    jobId: str
+    idUser: str
+    status: str
+    idAIRec: Optional[str] = None
+    output: str = ""
+    error: Optional[str] = None
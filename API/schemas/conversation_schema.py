@@ -19,7 +19,7 @@ class ConversationResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     is_archived: bool
-    metadata: Optional[Dict[str, Any]]
+    metadata: Optional[Dict[str, Any]] = Field(None, validation_alias="meta")
 
     class Config:
         from_attributes = True
@@ -27,17 +27,30 @@ class ConversationResponse(BaseModel):
 class MessageCreate(BaseModel):
     conversation_id: str = Field(..., description="ID của cuộc trò chuyện")
     content: str = Field(..., min_length=1, description="Nội dung tin nhắn")
-    role: str = Field(..., regex="^(user|assistant)$", description="Vai trò: user hoặc assistant")
+    role: str = Field(..., pattern="^(user|assistant)$", description="Vai trò: user hoặc assistant")
     metadata: Optional[Dict[str, Any]] = Field(None, description="Metadata bổ sung")
     token_count: Optional[int] = Field(0, ge=0, description="Số lượng token")
 
+class MessageBatchItem(BaseModel):
+    content: str = Field(..., min_length=1, description="Nội dung tin nhắn")
+    role: str = Field(..., pattern="^(user|assistant)$", description="Vai trò: user hoặc assistant")
+    metadata: Optional[Dict[str, Any]] = Field(None, description="Metadata bổ sung")
+    token_count: Optional[int] = Field(0, ge=0, description="Số lượng token")
+
+class MessageBatchCreate(BaseModel):
+    messages: List[MessageBatchItem] = Field(..., min_length=1, max_length=100, description="Danh sách tin nhắn theo thứ tự")
+
+class MessageBatchResponse(BaseModel):
+    conversation_id: str
+    ids: List[str]
+
 class MessageResponse(BaseModel):
     id: str
     conversation_id: str
     content: str
     role: str
     created_at: datetime
-    metadata: Optional[Dict[str, Any]]
+    metadata: Optional[Dict[str, Any]] = Field(None, validation_alias="meta")
     token_count: int
 
     class Config:
@@ -46,10 +59,26 @@ class MessageResponse(BaseModel):
 class ConversationWithMessages(ConversationResponse):
     messages: List[MessageResponse] = []
 
+class ConversationContextResponse(BaseModel):
+    conversation_id: str
+    max_tokens: int
+    total_tokens: int
+    messages: List[MessageResponse]
+
+class MessageListResponse(BaseModel):
+    messages: List[MessageResponse]
+    total: Optional[int] = None
+    page: int
+    limit: int
+    has_next: bool
+    has_prev: bool
+    next_cursor: Optional[str] = None
+
 class ConversationListResponse(BaseModel):
     conversations: List[ConversationResponse]
-    total: int
+    total: Optional[int] = None
     page: int
     limit: int
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None
@@ -16,4 +16,8 @@ class NotificationCreate(NotificationBase):
 
 class NotificationUpdate(NotificationBase):
     content: Optional[str] = None
-    isRead: bool
\ No newline at end of file
+    isRead: bool
+
+class NotificationBulkResult(BaseModel):
+    idUser: str
+    affected: int
\ No newline at end of file
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
+from datetime import date
 
 class PlaceBase(BaseModel):
     name: str
@@ -11,12 +12,39 @@ class PlaceBase(BaseModel):
     image: str
     rating: int
     type: int
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 class PlaceResponse(PlaceBase):
     idPlace: str
 
     class Config:
         from_attributes = True
+
+class PlaceDistanceResponse(PlaceResponse):
+    distance: float  # km
+
+class PlaceCluster(BaseModel):
+    latitude: float   # centroid
+    longitude: float
+    count: int
+    places: list[PlaceResponse]  # top-rated representatives
+
+class PlaceClusterResponse(BaseModel):
+    zoom: int
+    level: int
+    clusters: list[PlaceCluster]
+
+class PlaceAvailability(BaseModel):
+    day: date
+    capacity: int
+    reserved: int  # pending and confirmed bookings
+    available: int
+
+class PlaceCapacityUpdate(BaseModel):
+    day: date
+    capacity: int = Field(ge=0)
+
 class PlaceCreate(PlaceBase):
     description: Optional[str]
     image: Optional[str]
@@ -31,3 +59,5 @@ class PlaceUpdate(PlaceBase):
     image: Optional[str] = None
     rating: Optional[int] = None
     type: Optional[int] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
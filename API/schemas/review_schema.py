@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
 class ReviewBase(BaseModel):
@@ -14,6 +14,7 @@ class ReviewResponse(ReviewBase):
         from_attributes = True
 class ReviewCreate(ReviewBase):
     comment: Optional[str] = None
+    rating: int = Field(ge=1, le=5)
 
 class ReviewUpdate(ReviewBase):
     comment: Optional[str] = None
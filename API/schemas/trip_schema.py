@@ -1,6 +1,7 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
+from schemas.detail_information_schema import DetailResponse
 
 class TripBase(BaseModel):
     name: str
@@ -19,4 +20,28 @@ class TripCreate(TripBase):
 class TripUpdate(TripBase):
     name: Optional[str] = None
     startDate: Optional[datetime] = None
-    endDate: Optional[datetime] = None
\ No newline at end of file
+    endDate: Optional[datetime] = None
+
+class TripOptimize(BaseModel):
+    fixed: list[str] = []  # idDetail of stops that must keep their startTime
+    speed: float = Field(30, gt=0, le=200)  # km/h, for travel time between stops
+
+class TripOptimizeResponse(BaseModel):
+    idTrip: str
+    distanceBefore: float  # km
+    distanceAfter: float
+    lateMinutes: float  # total arrival delay at fixed stops, 0 when every window holds
+    details: list[DetailResponse]
+
+class TripRatingResponse(BaseModel):
+    idTrip: str
+    reviewCount: int
+    average: Optional[float] = None
+    score: float  # Bayesian average used for ranking
+    histogram: list[int]  # reviews with 1..5 stars
+
+class TopTripResponse(BaseModel):
+    idTrip: str
+    reviewCount: int
+    average: float
+    score: float
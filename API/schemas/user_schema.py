@@ -1,5 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, computed_field
 from typing import Optional
+from datetime import datetime
+from blob_store import avatar_url, legacy_avatar_url
 
 class UserBase(BaseModel):
     name: str
@@ -7,19 +9,26 @@ class UserBase(BaseModel):
     gender: int
     email: str
     phoneNumber: Optional[str] = None
-    avatar: Optional[bytes] = None
     theme: int = 0
     language: int = 0
 
 class UserResponse(UserBase):
     idUser: str
+    avatarHash: Optional[str] = None
+    avatarLink: Optional[bytes] = Field(None, exclude=True)
+    
+    # URL of the image (AVATAR_URL_PREFIX + hash, served by GET /avatars/{digest}),
+    # else the URL a not yet migrated row still holds
+    @computed_field
+    @property
+    def avatar(self) -> Optional[str]:
+        return avatar_url(self.avatarHash) or legacy_avatar_url(self.avatarLink)
     
     class Config:
         from_attributes = True
 
 class UserCreate(UserBase):
     gender: Optional[int] = None
-    avatar: Optional[bytes] = None
     language: Optional[int] = None
     password: str
 
@@ -29,7 +38,21 @@ class UserUpdate(UserBase):
     email: Optional[str] = None
     phoneNumber: Optional[str] = None
     gender: Optional[int] = None
-    avatar: Optional[bytes] = None
     theme: Optional[int] = None
     language: Optional[int] = None
-    password: Optional[str] = None
\ No newline at end of file
+    password: Optional[str] = None
+
+# One entry of GET /users/{idUser}/calendar; kind is trip, booking or detail
+class CalendarEntry(BaseModel):
+    kind: str
+    id: str
+    title: Optional[str] = None
+    start: datetime
+    end: datetime
+    idTrip: Optional[str] = None
+    idPlace: Optional[str] = None
+
+# Two commitments of a user that overlap
+class ScheduleConflict(BaseModel):
+    first: CalendarEntry
+    second: CalendarEntry
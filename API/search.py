@@ -0,0 +1,144 @@
+from bisect import bisect_left, insort
+from threading import Lock
+import heapq
+import os
+import re
+import time
+import unicodedata
+
+PLACE_INDEX_TTL = int(os.getenv("PLACE_INDEX_TTL", "300"))
+
+# Field weights used to rank place matches
+PLACE_FIELDS = {
+    "name": 4,
+    "city": 3,
+    "province": 3,
+    "country": 2,
+    "address": 1
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Lowercase and strip Vietnamese diacritics ("Đà Lạt" -> "da lat")
+def fold_text(text: str | None):
+    if not text:
+        return ""
+    text = text.replace("đ", "d").replace("Đ", "D")
+    text = unicodedata.normalize("NFD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+def tokenize(text: str | None):
+    return TOKEN_RE.findall(fold_text(text))
+
+# Folded text stored in Place.searchText
+def place_search_text(place):
+    return " ".join(fold_text(getattr(place, field)) for field in PLACE_FIELDS if getattr(place, field))
+
+# text as a literal inside a LIKE/ILIKE pattern with escape "\\"
+def escape_like(text: str):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+# In-process inverted index over places, used when the database has no trigram support
+class PlaceSearchIndex:
+    def __init__(self, ttl: int = PLACE_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = Lock()
+        self._built_at = None
+        self._postings = {}  # token -> {idPlace: weight}
+        self._tokens = []    # sorted tokens, for prefix lookups
+        self._docs = {}      # idPlace -> (tokens, type, rating)
+
+    # Rebuilt after ttl so writes from other workers show up
+    @property
+    def loaded(self):
+        return self._built_at is not None and time.time() - self._built_at < self.ttl
+
+    def build(self, places):
+        with self._lock:
+            self._postings.clear()
+            self._tokens.clear()
+            self._docs.clear()
+            for place in places:
+                self._add(place)
+            self._tokens = sorted(self._postings)
+            self._built_at = time.time()
+
+    def add(self, place):
+        with self._lock:
+            self._remove(place.idPlace)
+            for token in self._add(place):
+                if len(self._postings[token]) == 1:
+                    insort(self._tokens, token)
+
+    def remove(self, idPlace: str):
+        with self._lock:
+            self._remove(idPlace)
+
+    def _add(self, place):
+        weights = {}
+        for field, weight in PLACE_FIELDS.items():
+            for token in tokenize(getattr(place, field)):
+                weights[token] = max(weights.get(token, 0), weight)
+
+        for token, weight in weights.items():
+            self._postings.setdefault(token, {})[place.idPlace] = weight
+        self._docs[place.idPlace] = (tuple(weights), place.type, place.rating)
+        return weights
+
+    def _remove(self, idPlace: str):
+        doc = self._docs.pop(idPlace, None)
+        if doc is None:
+            return
+
+        for token in doc[0]:
+            posting = self._postings[token]
+            posting.pop(idPlace, None)
+            if not posting:
+                del self._postings[token]
+                del self._tokens[bisect_left(self._tokens, token)]
+
+    def _match(self, term: str):
+        # Postings of every token starting with term; exact token scores double
+        postings = []
+        i = bisect_left(self._tokens, term)
+        while i < len(self._tokens) and self._tokens[i].startswith(term):
+            token = self._tokens[i]
+            postings.append((self._postings[token], 2 if token == term else 1))
+            i += 1
+        return postings
+
+    # Return [(score, idPlace)] ranked by score desc, idPlace asc
+    def search(self, query: str, place_type: int = None, min_rating: int = None, limit: int = 20, after: tuple | None = None):
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            matches = [self._match(term) for term in terms]
+            if not all(matches):
+                return []
+
+            # Every term must match; intersect id sets before scoring anything
+            candidates = None
+            for postings in sorted(matches, key=lambda postings: sum(len(posting) for posting, _ in postings)):
+                ids = postings[0][0].keys() if len(postings) == 1 else set().union(*(posting.keys() for posting, _ in postings))
+                candidates = set(ids) if candidates is None else candidates.intersection(ids)
+                if not candidates:
+                    return []
+
+            hits = []
+            for idPlace in candidates:
+                _, type_, rating = self._docs[idPlace]
+                if place_type is not None and type_ != place_type:
+                    continue
+                if min_rating is not None and (rating is None or rating < min_rating):
+                    continue
+
+                score = sum(max(posting.get(idPlace, 0) * factor for posting, factor in postings) for postings in matches)
+                if after is not None and (-score, idPlace) <= (-after[0], after[1]):
+                    continue
+                hits.append((-score, idPlace))
+
+        return [(-score, idPlace) for score, idPlace in heapq.nsmallest(limit, hits)]
+
+place_index = PlaceSearchIndex()
@@ -0,0 +1,31 @@
+from functools import lru_cache
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard json module
+    orjson = None
+
+# JSON text of plain data; datetimes are ISO 8601, anything unknown goes through str
+def dumps(data) -> str:
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data, default=str, ensure_ascii=False, separators=(",", ":"))
+
+# Default response class for endpoints without a response_model (plain dicts, lists)
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+@lru_cache(maxsize=None)
+def list_adapter(schema):
+    return TypeAdapter(list[schema])
+
+# ORM rows -> JSON-ready dicts in one validation pass instead of model_validate per row
+def dump_many(schema, rows) -> list:
+    adapter = list_adapter(schema)
+    return adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
@@ -0,0 +1,57 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app imports its modules relative to API/ and reads its settings at import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+workdir = tempfile.mkdtemp(prefix="aitrip-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/app.db"
+os.environ["BLOB_STORE_DIR"] = os.path.join(workdir, "blobs")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ["QUERY_BUDGET_ENFORCE"] = "true"
+
+from datetime import timedelta
+from fastapi.testclient import TestClient
+from models.token import Token
+from models import conversation
+import auth
+import database
+import main
+
+database.Base.metadata.create_all(database.engine)
+conversation.Base.metadata.create_all(database.engine)
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+# Account row plus a signed access token for it, the bearer header a logged-in client sends.
+# The row is written directly so the tests don't depend on the installed bcrypt backend
+@pytest.fixture(scope="session")
+def login(client):
+    def login(username: str):
+        with database.sessionLocal() as db:
+            db.add(Token(username=username, hashed_password="!"))
+            db.commit()
+        return {"Authorization": f"Bearer {auth.create_access_token({'sub': username}, timedelta(minutes=30))}"}
+    return login
+
+# Account with a matching user profile, the normal case for a signed-in client
+@pytest.fixture(scope="session")
+def alice(client, login):
+    headers = login("alice")
+    response = client.post("/api/v1/users/", json={"name": "Alice", "username": "alice", "gender": 1, "email": "alice@example.com", "password": "secret"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return {"headers": headers, "user": response.json()}
+
+@pytest.fixture(scope="session")
+def place(client, alice):
+    response = client.post("/api/v1/places/", json={
+        "name": "Hồ Gươm", "country": "Việt Nam", "city": "Hà Nội", "province": "Hà Nội", "address": "Hoàn Kiếm",
+        "description": "Hồ nước ở trung tâm Hà Nội", "rating": 4, "type": 1, "image": "https://example.com/ho-guom.jpg"
+    }, headers=alice["headers"])
+    assert response.status_code == 200, response.text
+    return response.json()
@@ -0,0 +1,31 @@
+from datetime import timedelta
+import pytest
+from fastapi import HTTPException
+from controllers.auth_ctrl import get_current_user, principal_cache
+from models.token import Token
+import auth
+import database
+
+def test_principal_is_cached_until_its_token_row_changes():
+    with database.sessionLocal() as db:
+        db.add(Token(username="cached", hashed_password="!"))
+        db.commit()
+    token = auth.create_access_token({"sub": "cached"}, timedelta(minutes=5))
+
+    misses = principal_cache.misses
+    assert get_current_user(token).username == "cached"
+    hits = principal_cache.hits
+    assert get_current_user(token).username == "cached"
+    assert (principal_cache.misses, principal_cache.hits) == (misses + 1, hits + 1)
+
+    with database.sessionLocal() as db:
+        db.delete(db.query(Token).filter(Token.username == "cached").one())
+        db.commit()
+    with pytest.raises(HTTPException) as error:
+        get_current_user(token)
+    assert error.value.status_code == 401
+
+def test_bad_token_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        get_current_user("not-a-jwt")
+    assert error.value.status_code == 401
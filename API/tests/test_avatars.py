@@ -0,0 +1,65 @@
+import pytest
+import requests
+from models.user import User
+from repositories import user_repo
+import blob_store
+import database
+
+# 1x1 transparent GIF
+PIXEL = b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+
+def add_user(idUser: str, avatar: bytes):
+    with database.sessionLocal() as db:
+        db.add(User(idUser=idUser, name=idUser, username=idUser, password="x", gender=0, email=f"{idUser}@example.com", theme=0, language=0, avatarLink=avatar))
+        db.commit()
+
+def test_avatar_upload(client, alice):
+    idUser = alice["user"]["idUser"]
+    response = client.patch(f"/api/v1/users/{idUser}/avatar", files={"file": ("me.gif", PIXEL, "image/gif")}, headers=alice["headers"])
+    assert response.status_code == 200, response.text
+    avatar = response.json()["avatar"]
+    assert avatar == f"/api/v1/avatars/{response.json()['avatarHash']}"
+
+    image = client.get(avatar)
+    assert image.status_code == 200
+    assert image.content == PIXEL
+    assert client.get(avatar, headers={"If-None-Match": image.headers["etag"]}).status_code == 304
+
+    users = client.get("/api/v1/users/", params={"fields": "idUser,avatar"}, headers=alice["headers"]).json()
+    assert {"idUser": idUser, "avatar": avatar} in users
+
+    bad = client.put(f"/api/v1/users/{idUser}/avatar", files={"file": ("me.txt", b"hello", "text/plain")}, headers=alice["headers"])
+    assert bad.status_code == 400
+
+def test_legacy_avatar_url_is_served_until_migrated(client, alice, monkeypatch):
+    add_user("USL001", b"https://example.com/old.png")
+    add_user("USL002", b"https://example.com/gone.png")
+    add_user("USL003", PIXEL)
+    add_user("USL004", b"not an image")
+    user = client.get("/api/v1/users/idUser", params={"lookup": "USL001"}, headers=alice["headers"]).json()
+    assert user["avatar"] == "https://example.com/old.png"
+    assert "avatarLink" not in user
+    users = client.get("/api/v1/users/", params={"fields": "idUser,avatar"}, headers=alice["headers"]).json()
+    assert {"idUser": "USL001", "avatar": "https://example.com/old.png"} in users
+
+    def fetch(url):
+        if url.endswith("gone.png"):
+            raise requests.ConnectionError(url)
+        return PIXEL
+    monkeypatch.setattr(user_repo, "fetch_avatar", fetch)
+    report = client.post("/api/v1/internal/avatars/migrate", headers=alice["headers"]).json()
+    assert report["moved"] >= 2
+    assert report["kept"] == ["USL002"]
+    assert report["failed"] == ["USL004"]
+
+    avatars = {u["idUser"]: u["avatar"] for u in client.get("/api/v1/users/", headers=alice["headers"]).json()}
+    assert avatars["USL001"] == avatars["USL003"] and avatars["USL001"].startswith("/api/v1/avatars/")
+    assert avatars["USL002"] == "https://example.com/gone.png"
+    assert avatars["USL004"] is None
+
+def test_undecodable_image_is_stored_without_thumbnails(caplog):
+    pytest.importorskip("PIL")
+    data = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+    digest = blob_store.put_avatar(data)
+    assert blob_store.avatar_file(digest, 64)[0].endswith(digest)
+    assert f"No thumbnails for avatar {digest}" in caplog.text
@@ -0,0 +1,54 @@
+import pytest
+
+@pytest.fixture(scope="module")
+def bob(client, login):
+    headers = login("bob-bookings")
+    response = client.post("/api/v1/users/", json={"name": "Bob", "username": "bob-bookings", "gender": 1, "email": "bob-bookings@example.com", "phoneNumber": "0900000020", "password": "secret"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return {"headers": headers, "user": response.json()}
+
+def book(client, user, place, when: str):
+    response = client.post("/api/v1/bookings/", json={"idPlace": place["idPlace"], "date": when, "status": 0}, headers=user["headers"])
+    assert response.status_code == 200, response.text
+    return response.json()["idBooking"]
+
+def test_booking_lifecycle(client, alice, place):
+    headers = alice["headers"]
+    idBooking = book(client, alice, place, "2026-11-02T10:00:00")
+
+    assert client.post(f"/api/v1/bookings/{idBooking}/confirm", headers=headers).json()["status"] == 1
+    assert client.post(f"/api/v1/bookings/{idBooking}/confirm", headers=headers).status_code == 409
+    assert client.post(f"/api/v1/bookings/{idBooking}/release", headers=headers).json()["status"] == 2
+
+    assert idBooking in [b["idBooking"] for b in client.get("/api/v1/bookings/", headers=headers).json()]
+    response = client.get("/api/v1/bookings/range", params={"start": "2026-11-01T00:00:00", "end": "2026-11-03T00:00:00"}, headers=headers)
+    assert response.status_code == 200, response.text
+
+def test_account_without_user_is_unauthorized(client, login):
+    assert client.get("/api/v1/bookings/", headers=login("ghost-bookings")).status_code == 401
+
+def test_only_owner_updates_or_deletes(client, alice, bob, place):
+    idBooking = book(client, alice, place, "2026-12-01T10:00:00")
+    change = {"idPlace": place["idPlace"], "date": "2026-12-02T10:00:00", "status": 0}
+
+    assert client.put("/api/v1/bookings/", params={"idBooking": idBooking}, json=change, headers=bob["headers"]).status_code == 404
+    assert client.delete("/api/v1/bookings/", params={"id_booking": idBooking}, headers=bob["headers"]).status_code == 404
+
+    response = client.put("/api/v1/bookings/", params={"idBooking": idBooking}, json=change, headers=alice["headers"])
+    assert response.status_code == 200, response.text
+    assert client.delete("/api/v1/bookings/", params={"id_booking": idBooking}, headers=alice["headers"]).status_code == 200
+
+def test_capacity_is_enforced(client, alice, bob, place):
+    day = {"start": "2026-12-10", "end": "2026-12-10"}
+    response = client.put(f"/api/v1/places/{place['idPlace']}/capacity", json={"day": "2026-12-10", "capacity": 1}, headers=alice["headers"])
+    assert response.status_code == 200, response.text
+
+    book(client, alice, place, "2026-12-10T09:00:00")
+    response = client.post("/api/v1/bookings/", json={"idPlace": place["idPlace"], "date": "2026-12-10T15:00:00", "status": 0}, headers=bob["headers"])
+    assert response.status_code == 409, response.text
+
+    response = client.put(f"/api/v1/places/{place['idPlace']}/capacity", json={"day": "2026-12-10", "capacity": 0}, headers=alice["headers"])
+    assert response.status_code == 409, response.text
+    assert client.get(f"/api/v1/places/{place['idPlace']}/availability", params=day, headers=alice["headers"]).json()[0] == {
+        "day": "2026-12-10", "capacity": 1, "reserved": 1, "available": 0
+    }
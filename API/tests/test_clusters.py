@@ -0,0 +1,30 @@
+import database
+from geo import cluster_index
+from models.place import Place
+
+# Côn Đảo, away from every other test place
+BBOX = {"bbox": "106.4,8.5,106.8,8.9", "zoom": 10}
+
+def counts(client, alice):
+    response = client.get("/api/v1/places/clusters", params=BBOX, headers=alice["headers"])
+    assert response.status_code == 200, response.text
+    return sum(cluster["count"] for cluster in response.json()["clusters"])
+
+# Rows written by another worker show up once the index is past its ttl
+def test_clusters_rebuild_after_ttl(client, alice):
+    assert counts(client, alice) == 0
+    assert cluster_index.loaded
+
+    with database.sessionLocal() as db:
+        db.add(Place(idPlace="PCLUSTER", name="Bãi Đầm Trầu", city="Côn Đảo", province="Bà Rịa - Vũng Tàu", country="Việt Nam", address="Côn Sơn",
+                     description="Bãi biển", image="https://example.com/dam-trau.jpg", type=1, rating=5, latitude=8.7144, longitude=106.6280))
+        db.commit()
+    assert counts(client, alice) == 0
+
+    cluster_index._built_at -= cluster_index.ttl
+    assert counts(client, alice) == 1
+
+    with database.sessionLocal() as db:
+        db.query(Place).filter(Place.idPlace == "PCLUSTER").delete()
+        db.commit()
+    cluster_index.remove("PCLUSTER")
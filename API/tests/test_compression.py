@@ -0,0 +1,38 @@
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from compression import CompressionMiddleware, accepted_encodings
+from serialization import FastJSONResponse, dumps
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+@app.get("/big")
+def big():
+    return PlainTextResponse("x" * 1000)
+
+@app.get("/small")
+def small():
+    return PlainTextResponse("x")
+
+@app.get("/events")
+def events():
+    return StreamingResponse(iter(["data: " + "x" * 1000 + "\n\n"]), media_type="text/event-stream")
+
+client = TestClient(app)
+
+def test_accept_encoding_q_values():
+    assert accepted_encodings("gzip;q=0.5, br, identity;q=0") == {"gzip": 0.5, "br": 1.0, "identity": 0.0}
+
+def test_compresses_large_bodies_only():
+    assert client.get("/big", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "gzip;q=0"}).headers
+    assert client.get("/big", headers={"Accept-Encoding": "gzip"}).text == "x" * 1000
+
+def test_event_streams_are_not_compressed():
+    assert "content-encoding" not in client.get("/events", headers={"Accept-Encoding": "gzip"}).headers
+
+def test_json_rendering():
+    assert dumps({"a": [1, "é"]}) == '{"a":[1,"é"]}'
+    assert FastJSONResponse({"a": 1}).body == b'{"a":1}'
@@ -0,0 +1,34 @@
+from datetime import datetime
+import database
+from models.conversation import Conversation, Message
+from repositories.conversation_repo import context_cache
+
+def context(client, conversation_id: str, max_tokens: int = 100):
+    response = client.get(f"/api/v1/conversations/{conversation_id}/context", params={"max_tokens": max_tokens})
+    assert response.status_code == 200, response.text
+    return [m["content"] for m in response.json()["messages"]]
+
+def test_context_sees_writes_from_every_worker(client):
+    conversation = client.post("/api/v1/conversations/", json={"user_id": "US-ctx", "title": "Phú Quốc"}).json()
+    for content in ["một", "hai"]:
+        message = {"conversation_id": conversation["id"], "content": content, "role": "user", "token_count": 10}
+        assert client.post("/api/v1/messages/", json=message).status_code == 201
+    assert context(client, conversation["id"]) == ["một", "hai"]
+    assert context(client, conversation["id"], 15) == ["hai"]
+
+    # This worker's write extends the cached tail in place
+    message = {"conversation_id": conversation["id"], "content": "ba", "role": "user", "token_count": 10}
+    assert client.post("/api/v1/messages/", json=message).status_code == 201
+    assert len(context_cache.get(conversation["id"])["ids"]) == 3
+    assert context(client, conversation["id"]) == ["một", "hai", "ba"]
+
+    # Another worker's write only shows in the database; the version check picks it up
+    with database.engine.begin() as connection:
+        connection.execute(Message.__table__.insert().values(
+            id="msg-other-worker", conversation_id=conversation["id"], content="bốn", role="assistant", created_at=datetime.utcnow(), token_count=10
+        ))
+        connection.execute(Conversation.__table__.update().where(Conversation.id == conversation["id"]).values(message_version=Conversation.message_version + 1))
+    assert context(client, conversation["id"]) == ["một", "hai", "ba", "bốn"]
+
+    assert client.delete("/api/v1/messages/msg-other-worker").status_code == 204
+    assert context(client, conversation["id"]) == ["một", "hai", "ba"]
@@ -0,0 +1,26 @@
+def test_conversation_detail_keeps_metadata(client):
+    created = client.post("/api/v1/conversations/", json={"user_id": "US-conv", "title": "Đà Lạt", "metadata": {"a": 1}})
+    assert created.status_code == 201, created.text
+    conversation = created.json()
+    assert conversation["metadata"] == {"a": 1}
+
+    detail = client.get(f"/api/v1/conversations/{conversation['id']}")
+    assert detail.status_code == 200, detail.text
+    assert detail.json()["metadata"] == {"a": 1}
+    assert detail.json()["messages"] == []
+
+    without = client.get(f"/api/v1/conversations/{conversation['id']}", params={"include_messages": False})
+    assert without.json()["metadata"] == {"a": 1}
+
+    listed = client.get("/api/v1/conversations/user/US-conv").json()["conversations"]
+    assert [c["metadata"] for c in listed] == [{"a": 1}]
+
+def test_start_conversation(client):
+    response = client.post("/api/v1/messages/start-conversation", params={"user_id": "US-start", "title": "Huế", "first_message": "Xin chào"})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["conversation"]["user_id"] == "US-start"
+    assert body["first_message"]["content"] == "Xin chào"
+
+    detail = client.get(f"/api/v1/conversations/{body['conversation']['id']}").json()
+    assert [m["content"] for m in detail["messages"]] == ["Xin chào"]
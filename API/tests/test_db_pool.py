@@ -0,0 +1,24 @@
+from sqlalchemy import text
+from database import engine, get_db, pool_stats
+
+def session_from_get_db(use):
+    dependency = get_db()
+    db = next(dependency)
+    use(db)
+    dependency.close()
+
+# A request only takes a pooled connection once it touches the database, and that wait is recorded
+def test_checkout_is_lazy_and_timed():
+    before = pool_stats.snapshot(engine.pool)
+    session_from_get_db(lambda db: None)
+    idle = pool_stats.snapshot(engine.pool)
+    assert (idle["checkouts"], idle["wait_count"]) == (before["checkouts"], before["wait_count"])
+
+    session_from_get_db(lambda db: db.execute(text("SELECT 1")))
+    used = pool_stats.snapshot(engine.pool)
+    assert (used["checkouts"], used["wait_count"]) == (before["checkouts"] + 1, before["wait_count"] + 1)
+
+def test_pool_stats_endpoint(client, alice):
+    response = client.get("/api/v1/internal/db-pool", headers=alice["headers"])
+    assert response.status_code == 200, response.text
+    assert response.json()["wait_count"] >= 1
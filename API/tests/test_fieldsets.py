@@ -0,0 +1,16 @@
+def test_places_fields(client, alice, place):
+    response = client.get("/api/v1/places/all", params={"fields": "idPlace,name"}, headers=alice["headers"])
+    assert response.status_code == 200, response.text
+    assert {"idPlace": place["idPlace"], "name": place["name"]} in response.json()
+    assert all(set(item) == {"idPlace", "name"} for item in response.json())
+
+def test_users_fields_with_computed_avatar(client, alice):
+    response = client.get("/api/v1/users/", params={"fields": "idUser,avatar"}, headers=alice["headers"])
+    assert response.status_code == 200, response.text
+    assert alice["user"]["idUser"] in [item["idUser"] for item in response.json()]
+    assert all(set(item) == {"idUser", "avatar"} for item in response.json())
+
+def test_unknown_fields_are_rejected(client, alice):
+    response = client.get("/api/v1/places/all", params={"fields": "idPlace,nope"}, headers=alice["headers"])
+    assert response.status_code == 400
+    assert "nope" in response.json()["detail"]
@@ -0,0 +1,18 @@
+def test_places_revalidate_with_etag(client, alice, place):
+    first = client.get("/api/v1/places/all", headers=alice["headers"])
+    assert first.status_code == 200, first.text
+    assert "must-revalidate" in first.headers["cache-control"]
+    etag = first.headers["etag"]
+    assert client.get("/api/v1/places/all", headers={**alice["headers"], "If-None-Match": etag}).status_code == 304
+
+    # Any write to the catalog changes the version behind the ETag
+    created = client.post("/api/v1/places/", json={
+        "name": "Cầu Vàng", "country": "Việt Nam", "city": "Đà Nẵng", "province": "Đà Nẵng", "address": "Bà Nà",
+        "description": "Cầu trên núi", "rating": 5, "type": 1, "image": "https://example.com/cau-vang.jpg"
+    }, headers=alice["headers"]).json()
+    try:
+        again = client.get("/api/v1/places/all", headers={**alice["headers"], "If-None-Match": etag})
+        assert again.status_code == 200
+        assert again.headers["etag"] != etag
+    finally:
+        client.delete(f"/api/v1/places/{created['idPlace']}", headers=alice["headers"])
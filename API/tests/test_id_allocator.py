@@ -0,0 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import database
+from id_allocator import CAPACITY, IdAllocator, encode_id
+from models.id_sequence import IdSequence
+
+def test_encoding_is_unique_and_never_legacy_hex():
+    ids = [encode_id("PL", value) for value in (0, 1, 61, 62, CAPACITY - 1)]
+    assert ids == ["PLg000", "PLg001", "PLg00Z", "PLg010", "PLZZZZ"]
+    assert all(len(id) == 6 and id[2] not in "0123456789abcdef" for id in ids)
+
+# Separate allocators stand in for separate app processes sharing IdSequences
+def test_concurrent_allocators_never_share_a_block():
+    def allocate(_):
+        allocator = IdAllocator(block_size=7)
+        return [allocator.next_id("TX") for _ in range(700)]
+
+    with ThreadPoolExecutor(8) as pool:
+        ids = [id for batch in pool.map(allocate, range(8)) for id in batch]
+    assert len(set(ids)) == len(ids) == 5600
+
+def test_exhausted_prefix_raises():
+    with database.engine.begin() as connection:
+        connection.execute(IdSequence.__table__.insert().values(prefix="TZ", nextValue=CAPACITY))
+    with pytest.raises(RuntimeError):
+        IdAllocator().next_id("TZ")
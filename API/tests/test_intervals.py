@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event
+import database
+from intervals import booking_period
+from models.booking import Booking
+
+# Without range operators the candidates are loaded in 500-key batches, stopping at limit
+def test_period_query_stops_at_limit(place):
+    first = datetime(2031, 1, 1)
+    with database.engine.begin() as connection:
+        connection.execute(Booking.__table__.insert(), [
+            {"idBooking": f"BQ{i:04d}", "idPlace": place["idPlace"], "date": first + timedelta(hours=i), "status": "2"} for i in range(1200)
+        ])
+    booking_period.index._built_at = None
+
+    statements = []
+    def count(conn, cursor, statement, *args):
+        if 'FROM "Bookings"' in statement:
+            statements.append(statement)
+    try:
+        with database.sessionLocal() as db:
+            booking_period.query(db, "overlap", first, first + timedelta(days=60))
+            event.listen(database.engine, "before_cursor_execute", count)
+            rows = booking_period.query(db, "overlap", first + timedelta(hours=10), first + timedelta(days=60), limit=5)
+            event.remove(database.engine, "before_cursor_execute", count)
+        assert [row.idBooking for row in rows] == ["BQ0010", "BQ0011", "BQ0012", "BQ0013", "BQ0014"]
+        assert len(statements) == 1
+    finally:
+        with database.engine.begin() as connection:
+            connection.execute(Booking.__table__.delete().where(Booking.idBooking.like("BQ%")))
+        booking_period.index._built_at = None
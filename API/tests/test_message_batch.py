@@ -0,0 +1,17 @@
+def test_batch_appends_in_order(client):
+    conversation = client.post("/api/v1/conversations/", json={"user_id": "US-batch", "title": "Cần Thơ"}).json()
+    batch = {"messages": [{"content": f"m{i}", "role": "user" if i % 2 == 0 else "assistant", "token_count": i} for i in range(5)]}
+    response = client.post(f"/api/v1/conversations/{conversation['id']}/messages:batch", json=batch)
+    assert response.status_code == 201, response.text
+    ids = response.json()["ids"]
+    assert len(ids) == 5
+
+    page = client.get(f"/api/v1/messages/conversation/{conversation['id']}").json()
+    assert [m["id"] for m in page["messages"]] == ids
+    assert [m["content"] for m in page["messages"]] == [f"m{i}" for i in range(5)]
+    assert page["total"] == 5
+
+def test_batch_to_missing_conversation(client):
+    batch = {"messages": [{"content": "x", "role": "user"}]}
+    assert client.post("/api/v1/conversations/missing/messages:batch", json=batch).status_code == 404
+    assert client.post("/api/v1/conversations/missing/messages:batch", json={"messages": []}).status_code == 422
@@ -0,0 +1,34 @@
+import pytest
+from pagination import encode_cursor
+
+# Two places in Sa Pa, away from every other test place
+@pytest.fixture
+def sapa(client, alice):
+    places = []
+    for name, lat, lon in [("Fansipan", 22.3033, 103.7750), ("Cát Cát", 22.3290, 103.8310)]:
+        response = client.post("/api/v1/places/", json={
+            "name": name, "country": "Việt Nam", "city": "Sa Pa", "province": "Lào Cai", "address": "Sa Pa",
+            "description": name, "rating": 5, "type": 1, "image": "https://example.com/sapa.jpg", "latitude": lat, "longitude": lon
+        }, headers=alice["headers"])
+        assert response.status_code == 200, response.text
+        places.append(response.json())
+    yield places
+    for place in places:
+        client.delete(f"/api/v1/places/{place['idPlace']}", headers=alice["headers"])
+
+def test_nearby_pages_with_cursor(client, alice, sapa):
+    params = {"lat": 22.3364, "lon": 103.8438, "radius": 20, "limit": 1}
+    first = client.get("/api/v1/places/nearby", params=params, headers=alice["headers"])
+    assert first.status_code == 200, first.text
+    rest = client.get("/api/v1/places/nearby", params={**params, "cursor": first.headers["x-next-cursor"]}, headers=alice["headers"])
+    assert rest.status_code == 200, rest.text
+    assert [p["name"] for p in first.json() + rest.json()] == ["Cát Cát", "Fansipan"]
+
+@pytest.mark.parametrize("path, params", [
+    ("/api/v1/places/nearby", {"lat": 22.3364, "lon": 103.8438, "radius": 20}),
+    ("/api/v1/places/in-bbox", {"min_lat": 22.2, "min_lon": 103.7, "max_lat": 22.4, "max_lon": 103.9}),
+])
+def test_nearby_rejects_malformed_cursor(client, alice, sapa, path, params):
+    for cursor in [encode_cursor("far", "P1"), encode_cursor(1.5), encode_cursor(None, "P1"), "!!"]:
+        response = client.get(path, params={**params, "cursor": cursor}, headers=alice["headers"])
+        assert response.status_code == 400, (cursor, response.text)
@@ -0,0 +1,31 @@
+import asyncio
+from threading import Thread
+from notification_hub import InMemoryHub, stream_events
+
+def test_replay_after_last_event_id():
+    hub = InMemoryHub(buffer_size=2)
+    first = hub.publish("US1", {"n": 1})
+    hub.publish("US1", {"n": 2})
+    hub.publish("US1", {"n": 3})
+    assert [data for _, data in hub.replay("US1", first)] == [{"n": 2}, {"n": 3}]
+    assert hub.replay("US1", "otherhub-1") is None
+
+    # Evicted past the id: the client has to fall back to a full reload
+    hub.publish("US1", {"n": 4})
+    assert hub.replay("US1", first) is None
+
+# Worker threads publish, the stream's event loop receives
+def test_stream_receives_events_from_other_threads():
+    hub = InMemoryHub()
+
+    async def first_events():
+        stream = stream_events(hub, "US2", backlog=[{"n": 0}])
+        backlog = await stream.__anext__()
+        Thread(target=hub.publish, args=("US2", {"n": 1})).start()
+        live = await asyncio.wait_for(stream.__anext__(), 5)
+        await stream.aclose()
+        return backlog, live
+
+    backlog, live = asyncio.run(first_events())
+    assert '"n"' in backlog and "id: " not in backlog
+    assert live.startswith(f"id: {hub.id}-1\n") and '"n"' in live
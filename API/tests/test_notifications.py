@@ -0,0 +1,31 @@
+import pytest
+
+@pytest.fixture(scope="module")
+def nora(client, login):
+    headers = login("nora")
+    response = client.post("/api/v1/users/", json={"name": "Nora", "username": "nora", "gender": 0, "email": "nora@example.com", "phoneNumber": "0900000008", "password": "secret"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return {"headers": headers, "user": response.json()}
+
+def notify(client, user, content: str):
+    response = client.post("/api/v1/notifications/", json={"idUser": user["user"]["idUser"], "content": content}, headers=user["headers"])
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_mark_all_read_and_delete_all(client, nora):
+    idUser = nora["user"]["idUser"]
+    for i in range(3):
+        notify(client, nora, f"n{i}")
+
+    marked = client.put(f"/api/v1/notifications/mark-all/{idUser}", headers=nora["headers"])
+    assert marked.status_code == 200, marked.text
+    assert [n["isRead"] for n in marked.json()] == [True] * 3
+
+    notify(client, nora, "n3")
+    compact = client.put(f"/api/v1/notifications/mark-all/{idUser}", params={"compact": True}, headers=nora["headers"])
+    assert compact.json() == {"idUser": idUser, "affected": 1}
+
+    deleted = client.delete(f"/api/v1/notifications/delete-all/{idUser}", headers=nora["headers"])
+    assert deleted.status_code == 200, deleted.text
+    assert sorted(n["content"] for n in deleted.json()) == ["n0", "n1", "n2", "n3"]
+    assert client.delete(f"/api/v1/notifications/delete-all/{idUser}", params={"compact": True}, headers=nora["headers"]).status_code == 404
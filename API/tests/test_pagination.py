@@ -0,0 +1,27 @@
+from pagination import encode_cursor
+
+def test_conversations_page_by_cursor(client):
+    ids = {client.post("/api/v1/conversations/", json={"user_id": "US-page", "title": f"t{i}"}).json()["id"] for i in range(5)}
+    seen, cursor = [], None
+    while True:
+        page = client.get("/api/v1/conversations/user/US-page", params={"limit": 2, "include_total": False, **({"cursor": cursor} if cursor else {})}).json()
+        seen += [c["id"] for c in page["conversations"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) and set(seen) == ids
+
+def test_malformed_cursor_is_rejected(client, alice):
+    assert client.get("/api/v1/conversations/user/US-page", params={"cursor": "!!"}).status_code == 400
+    assert client.get("/api/v1/conversations/user/US-page", params={"cursor": encode_cursor("not a date", "x")}).status_code == 400
+    assert client.get("/api/v1/places/all", params={"cursor": encode_cursor(1, 2)}, headers=alice["headers"]).status_code == 400
+
+def test_archive_and_delete_update_totals(client):
+    ids = [client.post("/api/v1/conversations/", json={"user_id": "US-count", "title": f"t{i}"}).json()["id"] for i in range(3)]
+    assert client.get("/api/v1/conversations/user/US-count").json()["total"] == 3
+
+    assert client.patch(f"/api/v1/conversations/{ids[0]}/archive").status_code == 200
+    assert client.get("/api/v1/conversations/user/US-count").json()["total"] == 2
+    assert client.delete(f"/api/v1/conversations/{ids[1]}").status_code == 204
+    assert client.get("/api/v1/conversations/user/US-count").json()["total"] == 1
+    assert client.get("/api/v1/conversations/user/US-count", params={"include_archived": True}).json()["total"] == 2
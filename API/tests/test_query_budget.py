@@ -0,0 +1,11 @@
+# The Token lookup on a principal cache miss is not charged to the endpoint's query budget
+def test_query_budget_on_principal_cache_miss(client, alice, place, login):
+    booking = client.post("/api/v1/bookings/", json={"idPlace": place["idPlace"], "date": "2026-11-05T10:00:00", "status": 0}, headers=alice["headers"])
+    assert booking.status_code == 200, booking.text
+
+    headers = login("bob")
+    first = client.get(f"/api/v1/users/{alice['user']['idUser']}/bookings", headers=headers)
+    again = client.get(f"/api/v1/users/{alice['user']['idUser']}/bookings", headers=headers)
+    assert first.status_code == again.status_code == 200, first.text
+    assert booking.json()["idBooking"] in [b["idBooking"] for b in first.json()]
+    assert first.headers["x-query-count"] == again.headers["x-query-count"]
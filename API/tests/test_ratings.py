@@ -0,0 +1,31 @@
+def create_user(client, headers, username: str, phone: str):
+    response = client.post("/api/v1/users/", json={"name": username, "username": username, "gender": 0, "email": f"{username}@example.com", "phoneNumber": phone, "password": "secret"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["idUser"]
+
+def create_trip(client, headers, name: str):
+    response = client.post("/api/v1/trips/", json={"name": name, "startDate": "2026-12-01T00:00:00", "endDate": "2026-12-03T00:00:00"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["idTrip"]
+
+def review(client, headers, idTrip: str, idUser: str, rating: int):
+    response = client.post("/api/v1/reviews/", json={"idTrip": idTrip, "idUser": idUser, "comment": "", "rating": rating}, headers=headers)
+    assert response.status_code == 200, response.text
+
+def test_deleting_a_user_updates_ratings_and_top_trips(client, alice):
+    headers = alice["headers"]
+    carol, dave = create_user(client, headers, "carol", "0900000001"), create_user(client, headers, "dave", "0900000002")
+    reviewed, other = create_trip(client, headers, "Sa Pa"), create_trip(client, headers, "Mộc Châu")
+    review(client, headers, reviewed, carol, 5)
+    review(client, headers, other, dave, 4)
+    assert client.get(f"/api/v1/trips/{reviewed}/rating", headers=headers).json()["reviewCount"] == 1
+    top = {t["idTrip"] for t in client.get("/api/v1/trips/top", headers=headers).json()}
+    assert {reviewed, other} <= top
+
+    assert client.delete(f"/api/v1/users/{carol}", headers=headers).status_code == 200
+
+    # The reviewed trip went with carol (User.reviewed cascades), and with it its aggregate
+    assert client.get(f"/api/v1/trips/{reviewed}/rating", headers=headers).status_code == 404
+    top = {t["idTrip"] for t in client.get("/api/v1/trips/top", headers=headers).json()}
+    assert reviewed not in top and other in top
+    assert client.get(f"/api/v1/trips/{other}/rating", headers=headers).json()["reviewCount"] == 1
@@ -0,0 +1,18 @@
+import itertools
+import numpy as np
+from route_optimizer import distance_matrix, nearest_neighbour, optimize_route, route_length
+
+def test_stops_on_a_line_are_visited_in_order():
+    lat = [16.0, 16.4, 16.1, 16.3, 16.2]
+    dist = distance_matrix(lat, [108.0] * 5)
+    assert optimize_route(dist) == [0, 2, 4, 3, 1]
+
+def test_close_to_brute_force_and_never_worse_than_nearest_neighbour():
+    for seed in range(20):
+        rng = np.random.default_rng(seed)
+        dist = distance_matrix(16 + rng.random(8), 107 + rng.random(8))
+        route = optimize_route(dist)
+        assert route[0] == 0 and sorted(route) == list(range(8))
+
+        best = min(route_length(dist, [0, *rest]) for rest in itertools.permutations(range(1, 8)))
+        assert route_length(dist, route) <= min(1.1 * best, route_length(dist, nearest_neighbour(dist))) + 1e-9
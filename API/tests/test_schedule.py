@@ -0,0 +1,22 @@
+from datetime import datetime
+import database
+from models.booking import Booking
+from models.detail_booking import DetailBooking
+
+# A booking committed by another worker doesn't pass through this worker's session events,
+# so its cached schedule is stale; the write check must still see it
+def test_booking_conflict_written_by_another_worker(client, alice, place):
+    idUser = alice["user"]["idUser"]
+    assert client.get(f"/api/v1/users/{idUser}/conflicts", headers=alice["headers"]).status_code == 200
+
+    with database.engine.begin() as connection:
+        connection.execute(Booking.__table__.insert().values(idBooking="BKW2", idPlace=place["idPlace"], date=datetime(2027, 3, 1, 9), status="1"))
+        connection.execute(DetailBooking.__table__.insert().values(idUser=idUser, idBooking="BKW2"))
+
+    response = client.post("/api/v1/bookings/", json={"idPlace": place["idPlace"], "date": "2027-03-01T09:00:00", "status": 0}, headers=alice["headers"])
+    assert response.status_code == 409, response.text
+    assert [conflict["id"] for conflict in response.json()["detail"]["conflicts"]] == ["BKW2"]
+
+    with database.engine.begin() as connection:
+        connection.execute(DetailBooking.__table__.delete().where(DetailBooking.idBooking == "BKW2"))
+        connection.execute(Booking.__table__.delete().where(Booking.idBooking == "BKW2"))
@@ -0,0 +1,37 @@
+import database
+from models.place import Place
+from pagination import encode_cursor
+from search import place_index
+
+def test_search_pages_with_cursor(client, place):
+    first = client.get("/api/v1/search/", params={"query": "ho guom", "limit": 1})
+    assert first.status_code == 200, first.text
+    assert [p["idPlace"] for p in first.json()] == [place["idPlace"]]
+
+    rest = client.get("/api/v1/search/", params={"query": "ho guom", "cursor": first.headers["x-next-cursor"]})
+    assert rest.status_code == 200, rest.text
+    assert place["idPlace"] not in [p["idPlace"] for p in rest.json()]
+
+def test_search_rejects_malformed_cursor(client, place):
+    for cursor in [encode_cursor("x"), encode_cursor("nan", "P1"), encode_cursor(True, "P1"), encode_cursor(1, 2), encode_cursor({}, "P1")]:
+        response = client.get("/api/v1/search/", params={"query": "ho guom", "cursor": cursor})
+        assert response.status_code == 400, (cursor, response.text)
+
+# Rows written by another worker show up once the index is past its ttl
+def test_search_index_rebuilds_after_ttl(client, place):
+    client.get("/api/v1/search/", params={"query": "ho guom"})
+    assert place_index.loaded
+
+    with database.sessionLocal() as db:
+        db.add(Place(idPlace="PSEARCH", name="Chùa Một Cột", city="Hà Nội", province="Hà Nội", country="Việt Nam", address="Ba Đình",
+                     description="Chùa cổ", image="https://example.com/chua-mot-cot.jpg", type=1, rating=5))
+        db.commit()
+    assert client.get("/api/v1/search/", params={"query": "chua mot cot"}).json() == []
+
+    place_index._built_at -= place_index.ttl
+    assert [p["idPlace"] for p in client.get("/api/v1/search/", params={"query": "chua mot cot"}).json()] == ["PSEARCH"]
+
+    with database.sessionLocal() as db:
+        db.query(Place).filter(Place.idPlace == "PSEARCH").delete()
+        db.commit()
+    place_index.remove("PSEARCH")
@@ -0,0 +1,15 @@
+from trip_generator import budget_bucket, request_key
+
+def request(**changes):
+    return {"departure": "Hà Nội", "destination": "Đà Nẵng", "people": 2, "days": 3, "time": "2026-11-01", "money": "5 - 10 triệu", **changes}
+
+def test_budget_buckets():
+    assert budget_bucket("Dưới 5 triệu") == 0
+    assert budget_bucket("5 - 10 triệu") == budget_bucket("7tr") == 1
+    assert budget_bucket("Trên 50 triệu") == 4
+
+def test_equivalent_requests_share_a_key():
+    assert request_key(request()) == request_key(request(departure="  ha noi ", destination="ĐÀ NẴNG", money="7 triệu", time="2027-01-01"))
+    assert request_key(request(interests=["Biển", "ẩm thực"])) == request_key(request(interests=["am thuc", "bien", "Biển"]))
+    assert request_key(request()) != request_key(request(days=4))
+    assert request_key(request()) != request_key(request(money="Trên 50 triệu"))
@@ -0,0 +1,49 @@
+import time
+from threading import Event
+from trip_generator import trip_generator
+
+def wait_done(client, user, jobId: str):
+    for _ in range(50):
+        job = client.get(f"/api/v1/ai_recs/jobs/{jobId}", headers=user["headers"]).json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.1)
+    return job
+
+def test_generate_trip(client, alice):
+    request = {"departure": "Hà Nội", "destination": "Đà Nẵng", "people": 2, "days": 3, "time": "2026-11-01", "money": "5 triệu"}
+    response = client.post("/api/v1/ai_recs/generate-trip", json=request, headers=alice["headers"])
+    assert response.status_code == 202, response.text
+    job = response.json()
+    assert job["idUser"] == alice["user"]["idUser"]
+    assert response.headers["location"] == f"/api/v1/ai_recs/jobs/{job['jobId']}"
+
+    job = wait_done(client, alice, job["jobId"])
+    assert job["status"] == "done", job
+
+    with client.stream("GET", f"/api/v1/ai_recs/jobs/{job['jobId']}/stream", headers=alice["headers"]) as stream:
+        assert stream.status_code == 200
+        assert '"status":"done"' in stream.read().decode()
+
+def test_account_without_user_is_unauthorized(client, login):
+    request = {"departure": "Huế", "destination": "Hội An", "people": 1, "days": 1, "time": "2026-11-01", "money": "1 triệu"}
+    assert client.post("/api/v1/ai_recs/generate-trip", json=request, headers=login("ghost-trips")).status_code == 401
+
+# A cache hit answers before its AIRecommendation row is written
+def test_cache_hit_saves_off_the_request(client, alice, monkeypatch):
+    request = {"departure": "Huế", "destination": "Quảng Bình", "people": 3, "days": 2, "time": "2026-11-20", "money": "4 triệu"}
+    first = client.post("/api/v1/ai_recs/generate-trip", json=request, headers=alice["headers"]).json()
+    assert wait_done(client, alice, first["jobId"])["status"] == "done"
+
+    release = Event()
+    finish = trip_generator._finish
+    monkeypatch.setattr(trip_generator, "_finish", lambda jobs, output: (release.wait(5), finish(jobs, output)))
+
+    response = client.post("/api/v1/ai_recs/generate-trip", json=request, headers=alice["headers"])
+    assert response.status_code == 202, response.text
+    assert response.json()["status"] == "queued"
+
+    release.set()
+    job = wait_done(client, alice, response.json()["jobId"])
+    assert job["status"] == "done", job
+    assert job["idAIRec"] not in (None, first["idAIRec"])
@@ -0,0 +1,31 @@
+import pytest
+
+@pytest.fixture(scope="module")
+def ned(client, login):
+    headers = login("ned")
+    response = client.post("/api/v1/users/", json={"name": "Ned", "username": "ned", "gender": 1, "email": "ned@example.com", "phoneNumber": "0900000009", "password": "secret"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return {"headers": headers, "user": response.json()}
+
+def unread(client, user):
+    response = client.get(f"/api/v1/notifications/unread-count/{user['user']['idUser']}", headers=user["headers"])
+    assert response.status_code == 200, response.text
+    return response.json()["unread"]
+
+# The cached count follows creates, reads and deletes
+def test_unread_count_follows_writes(client, ned):
+    idUser = ned["user"]["idUser"]
+    assert unread(client, ned) == 0
+
+    created = [client.post("/api/v1/notifications/", json={"idUser": idUser, "content": f"n{i}"}, headers=ned["headers"]).json() for i in range(3)]
+    assert unread(client, ned) == 3
+
+    read = client.put(f"/api/v1/notifications/{created[0]['idNotf']}", json={"isRead": True}, headers=ned["headers"])
+    assert read.status_code == 200, read.text
+    assert unread(client, ned) == 2
+
+    assert client.delete(f"/api/v1/notifications/{created[1]['idNotf']}", headers=ned["headers"]).status_code == 200
+    assert unread(client, ned) == 1
+
+    client.put(f"/api/v1/notifications/mark-all/{idUser}", params={"compact": True}, headers=ned["headers"])
+    assert unread(client, ned) == 0
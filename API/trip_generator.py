@@ -0,0 +1,263 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from cache import TTLCache
+from notification_hub import InMemoryHub, format_event, NOTIFY_HEARTBEAT
+from schemas.ai_recommendation_schema import AIRecCreate
+from search import fold_text, tokenize
+from bisect import bisect_left, bisect_right
+from repositories import ai_recommendation_repo
+import database
+import asyncio
+import json
+import logging
+import os
+import re
+import requests
+import uuid
+
+TRIP_GEN_BACKEND = os.getenv("TRIP_GEN_BACKEND", "stub")
+TRIP_GEN_URL = os.getenv("TRIP_GEN_URL", "http://localhost:3000/api/chat")
+TRIP_GEN_TIMEOUT = int(os.getenv("TRIP_GEN_TIMEOUT", "120"))
+TRIP_GEN_WORKERS = int(os.getenv("TRIP_GEN_WORKERS", "4"))
+TRIP_GEN_QUEUE_SIZE = int(os.getenv("TRIP_GEN_QUEUE_SIZE", "100"))
+TRIP_GEN_JOB_TTL = int(os.getenv("TRIP_GEN_JOB_TTL", "3600"))
+TRIP_CACHE_SIZE = int(os.getenv("TRIP_CACHE_SIZE", "1000"))
+TRIP_CACHE_TTL = int(os.getenv("TRIP_CACHE_TTL", "86400"))
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("done", "failed")
+
+def build_prompt(request: dict):
+    lines = [
+        f"Lập lộ trình du lịch {request['days']} ngày từ {request['departure']} đến {request['destination']}",
+        f"cho {request['people']} người, khởi hành ngày {request['time']}, ngân sách {request['money']}."
+    ]
+    if request.get("transportation"):
+        lines.append(f"Phương tiện: {request['transportation']}.")
+    if request.get("travelStyle"):
+        lines.append(f"Phong cách du lịch: {request['travelStyle']}.")
+    if request.get("interests"):
+        lines.append(f"Sở thích: {', '.join(request['interests'])}.")
+    if request.get("accommodation"):
+        lines.append(f"Chỗ ở: {request['accommodation']}.")
+    lines.append("Trình bày theo từng ngày với địa điểm, thời gian và chi phí ước tính.")
+    return "\n".join(lines)
+
+# Offline backend for development: a day-by-day skeleton, streamed line by line
+class StubBackend:
+    def generate(self, prompt: str, request: dict):
+        interests = request.get("interests") or ["tham quan"]
+        yield f"Lộ trình {request['days']} ngày: {request['departure']} → {request['destination']}\n"
+        for day in range(1, request["days"] + 1):
+            activity = interests[(day - 1) % len(interests)]
+            yield f"Ngày {day}: {activity} tại {request['destination']}\n"
+
+# Chatbot service (Chatbot/server.js, POST /api/chat); answers in one piece
+class ChatbotBackend:
+    def __init__(self, url: str, timeout: int):
+        self.url = url
+        self.timeout = timeout
+
+    def generate(self, prompt: str, request: dict):
+        res = requests.post(self.url, json={"message": prompt}, timeout=self.timeout)
+        res.raise_for_status()
+        data = res.json()
+        if not data.get("success", True):
+            raise RuntimeError(data.get("error") or "Chatbot request failed")
+        yield data["response"]
+
+# Backend name -> factory; anything with generate(prompt, request) yielding text chunks works
+BACKENDS = {
+    "stub": StubBackend,
+    "chatbot": lambda: ChatbotBackend(TRIP_GEN_URL, TRIP_GEN_TIMEOUT)
+}
+
+class QueueFull(Exception):
+    pass
+
+# Canonical form of an AIRequest: requests that differ only in accents, case,
+# interest order or a nearby party size / budget share one generation
+PARTY_BUCKETS = [1, 2, 4, 8]
+BUDGET_BUCKETS = [5_000_000, 10_000_000, 20_000_000, 50_000_000]
+MONEY_UNITS = {"k": 1_000, "nghin": 1_000, "ngan": 1_000, "tr": 1_000_000, "trieu": 1_000_000, "m": 1_000_000, "ty": 1_000_000_000}
+MONEY_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(nghin|ngan|trieu|tr|ty|k|m)?")
+
+def party_bucket(people: int):
+    return bisect_left(PARTY_BUCKETS, people)
+
+# "Dưới 5 triệu" -> 0, "5 - 10 triệu" -> 1, "7tr" -> 1, "Trên 50 triệu" -> 4
+def budget_bucket(money: str):
+    text = fold_text(money)
+    amounts = []
+    unit = 1
+    for number, suffix in MONEY_RE.findall(text):
+        if suffix:
+            unit = MONEY_UNITS[suffix]
+        amounts.append(float(number.replace(",", ".")))
+    if not amounts:
+        return " ".join(tokenize(money))
+
+    amount = sum(amounts) / len(amounts) * unit
+    if "duoi" in text or "under" in text:
+        return bisect_left(BUDGET_BUCKETS, amount)
+    return bisect_right(BUDGET_BUCKETS, amount)
+
+def request_key(request: dict):
+    return (
+        " ".join(tokenize(request["departure"])),
+        " ".join(tokenize(request["destination"])),
+        request["days"],
+        party_bucket(request["people"]),
+        budget_bucket(request["money"]),
+        tuple(sorted({" ".join(tokenize(interest)) for interest in request.get("interests") or []} - {""}))
+    )
+
+# Internal job fields, hidden from API responses
+INTERNAL = ("seq", "key", "request", "followers")
+
+# Runs generations on a bounded pool so HTTP workers only enqueue and poll.
+# Finished outputs are cached per request_key, identical requests in flight share one generation.
+class TripGenerator:
+    def __init__(self, backend, workers: int = TRIP_GEN_WORKERS, queue_size: int = TRIP_GEN_QUEUE_SIZE):
+        self.backend = backend
+        self.workers = workers
+        self.queue_size = queue_size
+        self.pending = 0
+        self.shared = 0
+        self._executor = None
+        self._saver = None  # cache hits only write a row, kept apart from slow generations
+        self._lock = Lock()
+        self.jobs = TTLCache(maxsize=10000, ttl=TRIP_GEN_JOB_TTL)
+        self.cache = TTLCache(maxsize=TRIP_CACHE_SIZE, ttl=TRIP_CACHE_TTL)
+        self.inflight = {}  # request_key -> leader job
+        self.hub = InMemoryHub()
+
+    def _new_job(self, idUser: str, request: dict, key: tuple):
+        job = {"jobId": uuid.uuid4().hex, "idUser": idUser, "status": "queued", "idAIRec": None, "output": "", "error": None,
+               "seq": 0, "key": key, "request": request, "followers": []}
+        self.jobs.set(job["jobId"], job)
+        return job
+
+    def submit(self, idUser: str, request: dict):
+        key = request_key(request)
+
+        # Cache hit: only the user's own row is written, no generation; the write runs off the request too
+        output = self.cache.get(key)
+        if output is not None:
+            with self._lock:
+                if self._saver is None:
+                    self._saver = ThreadPoolExecutor(1, thread_name_prefix="trip-save")
+                job = self._new_job(idUser, request, key)
+            self._saver.submit(self._finish, [job], output)
+            return self.view(job)[0]
+
+        with self._lock:
+            leader = self.inflight.get(key)
+            if leader is not None:
+                job = self._new_job(idUser, request, key)
+                job["status"] = leader["status"]
+                job["output"] = leader["output"]
+                leader["followers"].append(job)
+                self.shared += 1
+            else:
+                if self.pending >= self.queue_size:
+                    raise QueueFull()
+                self.pending += 1
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="trip-gen")
+                job = self._new_job(idUser, request, key)
+                self.inflight[key] = job
+
+        if leader is None:
+            self._executor.submit(self._run, job)
+        return self.view(job)[0]
+
+    def get(self, jobId: str):
+        return self.jobs.get(jobId)
+
+    # Public fields of a job, taken under the lock so output and seq agree
+    def view(self, job: dict):
+        with self._lock:
+            return {key: value for key, value in job.items() if key not in INTERNAL}, job["seq"]
+
+    # Apply a change to the leader and everyone sharing its generation, then notify their streams
+    def _publish(self, job: dict, event: str, **changes):
+        with self._lock:
+            for target in [job, *job["followers"]]:
+                if "delta" in changes:
+                    target["output"] += changes["delta"]
+                target.update((key, value) for key, value in changes.items() if key != "delta")
+                data = changes if event == "delta" else {key: value for key, value in target.items() if key not in INTERNAL + ("output",)}
+                seq = self.hub.publish(target["jobId"], {"event": event, "data": data})
+                target["seq"] = int(seq.rpartition("-")[2])
+
+    # Persist one AIRecommendation per job and mark it done
+    def _finish(self, jobs: list, output: str):
+        db = database.sessionLocal()
+        try:
+            for job in jobs:
+                try:
+                    ai_rec = ai_recommendation_repo.create_aiRec(
+                        db,
+                        AIRecCreate(idUser=job["idUser"], input=json.dumps(job["request"], ensure_ascii=False)),
+                        output=output
+                    )
+                    self._publish(job, "status", status="done", idAIRec=ai_rec.idAIRec, output=output)
+                except Exception as e:
+                    db.rollback()
+                    logger.exception("Saving trip generation %s failed", job["jobId"])
+                    self._publish(job, "status", status="failed", error=getattr(e, "detail", None) or str(e))
+        finally:
+            db.close()
+
+    def _run(self, job: dict):
+        try:
+            self._publish(job, "status", status="running")
+            for chunk in self.backend.generate(build_prompt(job["request"]), job["request"]):
+                self._publish(job, "delta", delta=chunk)
+            self.cache.set(job["key"], job["output"])
+        except Exception as e:
+            logger.exception("Trip generation %s failed", job["jobId"])
+            self._publish(job, "status", status="failed", error=str(e))
+        finally:
+            # No one can join after this point
+            with self._lock:
+                self.inflight.pop(job["key"], None)
+                followers, job["followers"] = job["followers"], []
+                self.pending -= 1
+
+        if job["status"] != "failed":
+            self._finish([job, *followers], job["output"])
+
+    def stats(self):
+        with self._lock:
+            return {"cache": self.cache.stats(), "inflight": len(self.inflight), "pending": self.pending, "shared": self.shared}
+
+    # Server-Sent Events: a snapshot first, then deltas and status changes until the job finishes
+    async def stream(self, job: dict):
+        subscriber = self.hub.subscribe(job["jobId"])
+        try:
+            snapshot, last_seq = self.view(job)
+            yield format_event(snapshot, event="status")
+
+            while snapshot["status"] not in FINISHED:
+                # Slow client: end the stream, reconnecting gives a fresh snapshot
+                if subscriber.overflowed and subscriber.queue.empty():
+                    break
+                try:
+                    seq, message = await asyncio.wait_for(subscriber.queue.get(), NOTIFY_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+
+                # Already part of the snapshot
+                if seq <= last_seq:
+                    continue
+                yield format_event(message["data"], self.hub.event_id(seq), message["event"])
+                if message["event"] == "status":
+                    snapshot = message["data"]
+        finally:
+            self.hub.unsubscribe(job["jobId"], subscriber)
+
+trip_generator = TripGenerator(BACKENDS[TRIP_GEN_BACKEND]())
@@ -346,9 +346,7 @@ export default function ProfilePage({
               <Image
                 src={
                   userData?.avatar
-                    ? `https://aitripsystem-api.onrender.com/api/v1/proxy_image/?url=${encodeURIComponent(
-                        userData.avatar
-                      )}`
+                    ? new URL(userData.avatar, "https://aitripsystem-api.onrender.com").href
                     : "/images/profile.svg"
                 }
                 priority={true}
@@ -442,9 +440,7 @@ export default function ProfilePage({
                         previewAvatar
                           ? previewAvatar
                           : userData?.avatar
-                          ? `https://aitripsystem-api.onrender.com/api/v1/proxy_image/?url=${encodeURIComponent(
-                              userData.avatar
-                            )}`
+                          ? new URL(userData.avatar, "https://aitripsystem-api.onrender.com").href
                           : "/images/profile.svg"
                       }
                       width={96}
@@ -94,9 +94,7 @@ export default function ExplorePage() {
                 <Image
                   src={
                     user?.avatar
-                      ? `https://aitripsystem-api.onrender.com/api/v1/proxy_image/?url=${encodeURIComponent(
-                          user.avatar
-                        )}`
+                      ? new URL(user.avatar, "https://aitripsystem-api.onrender.com").href
                       : "/images/profile.svg"
                   }
                   fill
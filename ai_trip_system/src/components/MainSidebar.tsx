@@ -314,9 +314,7 @@ export default function MainSidebar({
             <Image
               src={
                 userData?.avatar
-                  ? `https://aitripsystem-api.onrender.com/api/v1/proxy_image/?url=${encodeURIComponent(
-                      userData.avatar
-                    )}`
+                  ? new URL(userData.avatar, "https://aitripsystem-api.onrender.com").href
                   : "/images/profile.svg"
               }
               fill
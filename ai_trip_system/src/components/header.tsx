@@ -547,9 +547,7 @@ const Header = () => {
                       <Image
                         src={
                           userData?.avatar
-                            ? `https://aitripsystem-api.onrender.com/api/v1/proxy_image/?url=${encodeURIComponent(
-                                userData.avatar
-                              )}`
+                            ? new URL(userData.avatar, "https://aitripsystem-api.onrender.com").href
                             : "profile.svg"
                         }
                         fill